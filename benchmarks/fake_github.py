@@ -0,0 +1,749 @@
+import argparse
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_ORG = "bench-org"
+DEFAULT_TEAM_NAME = "bench"
+DEFAULT_RATE_LIMIT = 1000000
+PER_PAGE = 30
+
+
+def git_blob_sha(content: bytes) -> str:
+    """Compute the git blob SHA of some bytes, as GitHub reports it in trees."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def _object_sha(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def reviewers_config(team_count: int) -> bytes:
+    """The REVIEWERS.yml every seeded repository has: all teams review and are required, team 0 is assigned."""
+    teams = ", ".join(f'"{{{{ team_name }}}}-{i}"' for i in range(team_count))
+    return (
+        "pull_requests:\n"
+        "  branches:\n"
+        "    main:\n"
+        f"      required_approvals: {min(2, team_count)}\n"
+        f"      required_teams: [{teams}]\n"
+        f"      review_teams: [{teams}]\n"
+        f'      assignees: ["{{{{ team_name }}}}-0"]\n'
+    ).encode("utf-8")
+
+
+class FakeOrganization:
+    """In-memory state of a synthetic organization: teams, repositories, git objects and pull requests.
+
+    Team i is "<team_name>-i" with members "t<i>-user<j>". Every repository has a main branch
+    holding REVIEWERS.yml and a README, and open PRs from feature branches with reviews cycling
+    through the members of all teams.
+    """
+
+    def __init__(
+        self,
+        org: str = DEFAULT_ORG,
+        team_name: str = DEFAULT_TEAM_NAME,
+        teams: int = 3,
+        members: int = 10,
+        repos: int = 5,
+        prs: int = 2,
+        reviews: int = 4,
+    ):
+        self.org = org
+        self.team_name = team_name
+        self.teams = {
+            f"{team_name}-{i}": [f"t{i}-user{j}" for j in range(members)] for i in range(max(1, teams))
+        }
+        reviewers = [login for team_members in self.teams.values() for login in team_members]
+        config = reviewers_config(len(self.teams))
+
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, List[Dict]] = {}
+        self.commits: Dict[str, Dict] = {}
+        self.repos: Dict[str, Dict] = {}
+        for r in range(repos):
+            name = f"repo-{r}"
+            root_tree = self.add_tree({}, {"REVIEWERS.yml": config, "README.md": f"# {name}\n".encode()})
+            root = self.add_commit(root_tree, [])
+            repo = {
+                "name": name,
+                "refs": {"main": root},
+                "variables": {"TEAM_NAME": team_name},
+                "pulls": {},
+                "statuses": {},
+            }
+            for n in range(1, prs + 1):
+                head = self.add_commit(
+                    self.add_tree(self.entries(root), {f"change-{n}.txt": f"change {n}\n".encode()}), [root]
+                )
+                repo["refs"][f"feature-{n}"] = head
+                states = ["APPROVED", "APPROVED", "COMMENTED", "CHANGES_REQUESTED"]
+                repo["pulls"][n] = {
+                    "number": n,
+                    "head": f"feature-{n}",
+                    "base": "main",
+                    "requested_teams": [],
+                    "assignees": [],
+                    "reviews": [
+                        (reviewers[(r * prs + n + k) % len(reviewers)], states[k % len(states)], head)
+                        for k in range(reviews)
+                    ],
+                }
+            self.repos[name] = repo
+        self.lock = threading.Lock()
+
+    def entries(self, commit_sha: str) -> Dict[str, str]:
+        """Map each path in a commit's tree to its blob SHA."""
+        return {entry["path"]: entry["sha"] for entry in self.trees[self.commits[commit_sha]["tree"]]}
+
+    def add_tree(self, entries: Dict[str, str], files: Dict[str, bytes]) -> str:
+        """Store a tree made of existing blob entries plus new file contents and return its SHA."""
+        entries = dict(entries)
+        for path, content in files.items():
+            sha = git_blob_sha(content)
+            self.blobs[sha] = content
+            entries[path] = sha
+        sha = _object_sha(sorted(entries.items()))
+        self.trees[sha] = [
+            {"path": path, "mode": "100644", "type": "blob", "sha": blob_sha, "size": len(self.blobs[blob_sha])}
+            for path, blob_sha in sorted(entries.items())
+        ]
+        return sha
+
+    def add_commit(self, tree_sha: str, parents: List[str], message: str = "Seed") -> str:
+        sha = _object_sha(tree_sha, parents, message, len(self.commits))
+        self.commits[sha] = {"tree": tree_sha, "parents": parents, "message": message}
+        return sha
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    """Local stand-in for the GitHub REST and GraphQL endpoints the scripts call.
+
+    Every request can be delayed by a fixed latency, and every throttle_every-th request is
+    answered with throttle_status and a Retry-After header instead (none when retry_after is 0),
+    or with a bare 502 server error when throttle_status is 502. Counts per route are
+    served at GET /_bench/stats; POST /_bench/reset reseeds the organization and the counts.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        seed: Dict,
+        latency: float = 0.0,
+        throttle_every: int = 0,
+        throttle_status: int = 403,
+        retry_after: float = 1.0,
+        rate_limit: int = DEFAULT_RATE_LIMIT,
+    ):
+        super().__init__(address, FakeGitHubHandler)
+        self.seed = seed
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.throttle_status = throttle_status
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.counter_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.counter_lock:
+            self.state = FakeOrganization(**self.seed)
+            self.requests = 0
+            self.throttled = 0
+            self.routes: Dict[str, int] = {}
+
+    def count(self, route: str) -> Tuple[bool, int]:
+        """Count a request and tell whether to throttle it, plus the rate-limit budget left."""
+        with self.counter_lock:
+            self.requests += 1
+            self.routes[route] = self.routes.get(route, 0) + 1
+            throttle = self.throttle_every > 0 and self.requests % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+            return throttle, max(0, self.rate_limit - self.requests)
+
+    def stats(self) -> Dict:
+        with self.counter_lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "routes": dict(sorted(self.routes.items(), key=lambda item: -item[1])),
+            }
+
+
+_ROUTES = []
+
+
+def route(verb: str, pattern: str):
+    """Register a handler method for a verb and a path pattern with {named} segments."""
+    # {name} matches one path segment, {name:*} the rest of the path
+    regex = re.sub(r"\{(\w+):\*\}", r"(?P<\1>.+)", pattern)
+    regex = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", regex) + "$")
+
+    def decorator(func):
+        _ROUTES.append((verb, regex, f"{verb} {pattern}", func))
+        return func
+
+    return decorator
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which Nagle's algorithm would hold back on keep-alive connections
+    disable_nagle_algorithm = True
+    server: FakeGitHubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def base(self) -> str:
+        return f"http://{self.headers.get('Host')}"
+
+    @property
+    def state(self) -> FakeOrganization:
+        return self.server.state
+
+    def _send(self, status: int, body=None, headers: Optional[Dict] = None, content_type="application/json"):
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            payload = json.dumps(body if body is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, verb: str):
+        url = urlparse(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        self.body = json.loads(raw) if raw else {}
+
+        if url.path == "/_bench/stats":
+            return self._send(200, self.server.stats())
+        if url.path == "/_bench/reset":
+            self.server.reset()
+            return self._send(200, {})
+
+        for route_verb, regex, name, func in _ROUTES:
+            match = regex.match(url.path) if route_verb == verb else None
+            if match:
+                break
+        else:
+            name, func, match = f"{verb} (unknown)", None, None
+
+        throttle, remaining = self.server.count(name)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        rate_headers = {
+            "X-RateLimit-Limit": str(self.server.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time()) + 3600),
+        }
+        if throttle and self.server.throttle_status == 502:
+            return self._send(502, {"message": "Server Error"}, rate_headers)
+        if throttle:
+            # Without Retry-After only the message tells a secondary limit from a permission error
+            if self.server.retry_after > 0:
+                rate_headers["Retry-After"] = str(int(self.server.retry_after))
+            message = "You have exceeded a secondary rate limit. Please wait a few minutes before you try again."
+            return self._send(self.server.throttle_status, {"message": message}, rate_headers)
+        if func is None:
+            return self._send(404, {"message": "Not Found"}, rate_headers)
+
+        with self.state.lock:
+            result = func(self, **{key: unquote(value) for key, value in match.groupdict().items()})
+        status, body = result[0], result[1]
+        headers = dict(rate_headers, **(result[2] if len(result) > 2 else {}))
+        content_type = "application/vnd.github.raw" if isinstance(body, bytes) else "application/json"
+        return self._send(status, body, headers, content_type)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    # Representations
+
+    def _repo(self, repo: str) -> Optional[Dict]:
+        return self.state.repos.get(repo)
+
+    def _repo_json(self, owner: str, repo: str) -> Dict:
+        full_name = f"{owner}/{repo}"
+        return {
+            "id": abs(hash(full_name)) % 10**8,
+            "name": repo,
+            "full_name": full_name,
+            "owner": {"login": owner, "type": "Organization"},
+            "default_branch": "main",
+            "archived": False,
+            "permissions": {"admin": True, "push": True, "pull": True},
+            "url": f"{self.base}/repos/{full_name}",
+        }
+
+    def _pull_json(self, owner: str, repo: str, pull: Dict) -> Dict:
+        refs = self.state.repos[repo]["refs"]
+        url = f"{self.base}/repos/{owner}/{repo}/pulls/{pull['number']}"
+        return {
+            "number": pull["number"],
+            "state": "open",
+            "merged_at": None,
+            "title": f"Change {pull['number']}",
+            "url": url,
+            "issue_url": f"{self.base}/repos/{owner}/{repo}/issues/{pull['number']}",
+            "head": {"ref": pull["head"], "sha": refs[pull["head"]], "repo": self._repo_json(owner, repo)},
+            "base": {"ref": pull["base"], "sha": refs[pull["base"]], "repo": self._repo_json(owner, repo)},
+            "requested_teams": [{"slug": slug, "name": slug} for slug in pull["requested_teams"]],
+            "assignees": [{"login": login} for login in pull["assignees"]],
+            "user": {"login": "bench-author"},
+        }
+
+    def _team_json(self, org: str, slug: str) -> Dict:
+        return {
+            "id": abs(hash(slug)) % 10**8,
+            "slug": slug,
+            "name": slug,
+            "url": f"{self.base}/orgs/{org}/teams/{slug}",
+            "members_url": f"{self.base}/orgs/{org}/teams/{slug}/members{{/member}}",
+        }
+
+    def _commit_json(self, owner: str, repo: str, sha: str) -> Dict:
+        commit = self.state.commits[sha]
+        url = f"{self.base}/repos/{owner}/{repo}/git/commits/{sha}"
+        return {
+            "sha": sha,
+            "url": url,
+            "message": commit["message"],
+            "tree": {"sha": commit["tree"], "url": f"{self.base}/repos/{owner}/{repo}/git/trees/{commit['tree']}"},
+            "parents": [{"sha": parent} for parent in commit["parents"]],
+        }
+
+    def _ref_json(self, owner: str, repo: str, branch: str) -> Dict:
+        return {
+            "ref": f"refs/heads/{branch}",
+            "url": f"{self.base}/repos/{owner}/{repo}/git/refs/heads/{branch}",
+            "object": {"sha": self.state.repos[repo]["refs"][branch], "type": "commit"},
+        }
+
+    def _page(self, items: List) -> Tuple[int, List, Dict]:
+        """Serve one page of a list, with a Link header to the next one."""
+        per_page = int(self.query.get("per_page", PER_PAGE))
+        page = int(self.query.get("page", 1))
+        headers = {}
+        if page * per_page < len(items):
+            query = dict(self.query, page=str(page + 1), per_page=str(per_page))
+            next_url = f"{self.base}{urlparse(self.path).path}?" + "&".join(f"{k}={v}" for k, v in query.items())
+            last_page = -(-len(items) // per_page)
+            last_url = next_url.replace(f"page={page + 1}", f"page={last_page}")
+            headers["Link"] = f'<{next_url}>; rel="next", <{last_url}>; rel="last"'
+        return 200, items[(page - 1) * per_page : page * per_page], headers
+
+    # Organizations and teams
+
+    @route("GET", "/orgs/{org}")
+    def get_org(self, org):
+        return 200, {"login": org, "id": 1, "url": f"{self.base}/orgs/{org}"}
+
+    @route("GET", "/orgs/{org}/repos")
+    def list_repos(self, org):
+        return self._page([self._repo_json(org, name) for name in self.state.repos])
+
+    @route("GET", "/orgs/{org}/teams/{slug}")
+    def get_team(self, org, slug):
+        if slug not in self.state.teams:
+            return 404, {"message": "Not Found"}
+        return 200, self._team_json(org, slug)
+
+    @route("GET", "/orgs/{org}/teams/{slug}/members")
+    def list_team_members(self, org, slug):
+        if slug not in self.state.teams:
+            return 404, {"message": "Not Found"}
+        return self._page([{"login": login, "id": i} for i, login in enumerate(self.state.teams[slug])])
+
+    @route("GET", "/orgs/{org}/teams/{slug}/memberships/{username}")
+    def get_team_membership(self, org, slug, username):
+        if username not in self.state.teams.get(slug, []):
+            return 404, {"message": "Not Found"}
+        url = f"{self.base}/orgs/{org}/teams/{slug}/memberships/{username}"
+        return 200, {"state": "active", "role": "member", "url": url}
+
+    # Repositories, variables and pull requests
+
+    @route("GET", "/repos/{owner}/{repo}")
+    def get_repo(self, owner, repo):
+        if self._repo(repo) is None:
+            return 404, {"message": "Not Found"}
+        return 200, self._repo_json(owner, repo)
+
+    @route("GET", "/repos/{owner}/{repo}/actions/variables/{name}")
+    def get_variable(self, owner, repo, name):
+        value = self._repo(repo)["variables"].get(name)
+        if value is None:
+            return 404, {"message": "Not Found"}
+        return 200, {"name": name, "value": value}
+
+    @route("POST", "/repos/{owner}/{repo}/actions/variables")
+    def create_variable(self, owner, repo):
+        variables = self._repo(repo)["variables"]
+        if self.body["name"] in variables:
+            return 409, {"message": "Already exists - Variable already exists"}
+        variables[self.body["name"]] = self.body["value"]
+        return 201, {}
+
+    @route("PATCH", "/repos/{owner}/{repo}/actions/variables/{name}")
+    def update_variable(self, owner, repo, name):
+        self._repo(repo)["variables"][name] = self.body["value"]
+        return 204, b""
+
+    @route("GET", "/repos/{owner}/{repo}/pulls")
+    def list_pulls(self, owner, repo):
+        pulls = [self._pull_json(owner, repo, pull) for pull in self._repo(repo)["pulls"].values()]
+        if "head" in self.query:
+            pulls = [pull for pull in pulls if f"{owner}:{pull['head']['ref']}" == self.query["head"]]
+        if "base" in self.query:
+            pulls = [pull for pull in pulls if pull["base"]["ref"] == self.query["base"]]
+        return self._page(pulls)
+
+    @route("POST", "/repos/{owner}/{repo}/pulls")
+    def create_pull(self, owner, repo):
+        pulls = self._repo(repo)["pulls"]
+        number = max(pulls, default=0) + 1
+        pulls[number] = {
+            "number": number,
+            "head": self.body["head"],
+            "base": self.body["base"],
+            "requested_teams": [],
+            "assignees": [],
+            "reviews": [],
+        }
+        return 201, self._pull_json(owner, repo, pulls[number])
+
+    @route("GET", "/repos/{owner}/{repo}/pulls/{number}")
+    def get_pull(self, owner, repo, number):
+        pull = self._repo(repo)["pulls"].get(int(number))
+        if pull is None:
+            return 404, {"message": "Not Found"}
+        return 200, self._pull_json(owner, repo, pull)
+
+    @route("GET", "/repos/{owner}/{repo}/pulls/{number}/reviews")
+    def list_reviews(self, owner, repo, number):
+        reviews = self._repo(repo)["pulls"][int(number)]["reviews"]
+        return self._page(
+            [
+                {"id": i + 1, "user": {"login": login}, "state": state, "commit_id": sha}
+                for i, (login, state, sha) in enumerate(reviews)
+            ]
+        )
+
+    @route("POST", "/repos/{owner}/{repo}/pulls/{number}/requested_reviewers")
+    def request_reviewers(self, owner, repo, number):
+        pull = self._repo(repo)["pulls"][int(number)]
+        unknown = [slug for slug in self.body.get("team_reviewers", []) if slug not in self.state.teams]
+        if unknown:
+            return 422, {"message": "Reviews may only be requested from collaborators."}
+        for slug in self.body.get("team_reviewers", []):
+            if slug not in pull["requested_teams"]:
+                pull["requested_teams"].append(slug)
+        return 201, self._pull_json(owner, repo, pull)
+
+    @route("POST", "/repos/{owner}/{repo}/issues/{number}/assignees")
+    def add_assignees(self, owner, repo, number):
+        pull = self._repo(repo)["pulls"][int(number)]
+        for login in self.body.get("assignees", []):
+            if login not in pull["assignees"]:
+                pull["assignees"].append(login)
+        issue = self._pull_json(owner, repo, pull)
+        issue["url"] = issue["issue_url"]
+        return 201, issue
+
+    @route("GET", "/repos/{owner}/{repo}/branches/{branch}")
+    def get_branch(self, owner, repo, branch):
+        sha = self._repo(repo)["refs"].get(branch)
+        if sha is None:
+            return 404, {"message": "Branch not found"}
+        url = f"{self.base}/repos/{owner}/{repo}/branches/{branch}"
+        return 200, {"name": branch, "commit": {"sha": sha}, "protected": True, "protection_url": f"{url}/protection"}
+
+    @route("GET", "/repos/{owner}/{repo}/branches/{branch}/protection")
+    def get_protection(self, owner, repo, branch):
+        url = f"{self.base}/repos/{owner}/{repo}/branches/{branch}/protection"
+        return 200, {
+            "url": url,
+            "required_pull_request_reviews": {
+                "url": f"{url}/required_pull_request_reviews",
+                "dismiss_stale_reviews": False,
+                "required_approving_review_count": 1,
+            },
+        }
+
+    @route("GET", "/repos/{owner}/{repo}/contents/{path:*}")
+    def get_contents(self, owner, repo, path):
+        refs = self._repo(repo)["refs"]
+        ref = self.query.get("ref", "main")
+        sha = refs.get(ref, ref)
+        if sha not in self.state.commits:
+            return 404, {"message": "No commit found for the ref"}
+        blob_sha = self.state.entries(sha).get(path)
+        if blob_sha is None:
+            return 404, {"message": "Not Found"}
+        content = self.state.blobs[blob_sha]
+        if "raw" in (self.headers.get("Accept") or ""):
+            return 200, content
+        return 200, {
+            "type": "file",
+            "encoding": "base64",
+            "name": path.rsplit("/", 1)[-1],
+            "path": path,
+            "sha": blob_sha,
+            "size": len(content),
+            "content": base64.b64encode(content).decode("ascii"),
+            "url": f"{self.base}/repos/{owner}/{repo}/contents/{path}",
+        }
+
+    # Commits and statuses
+
+    @route("GET", "/repos/{owner}/{repo}/commits/{sha}")
+    def get_commit(self, owner, repo, sha):
+        if sha not in self.state.commits:
+            return 404, {"message": "No commit found for SHA"}
+        return 200, {
+            "sha": sha,
+            "url": f"{self.base}/repos/{owner}/{repo}/commits/{sha}",
+            "commit": {"message": self.state.commits[sha]["message"]},
+        }
+
+    @route("GET", "/repos/{owner}/{repo}/commits/{sha}/status")
+    def get_combined_status(self, owner, repo, sha):
+        statuses = self._repo(repo)["statuses"].get(sha, {})
+        return 200, {
+            "sha": sha,
+            "state": "success" if statuses and all(state == "success" for state in statuses.values()) else "pending",
+            "statuses": [{"context": context, "state": state} for context, state in statuses.items()],
+            "total_count": len(statuses),
+        }
+
+    @route("POST", "/repos/{owner}/{repo}/statuses/{sha}")
+    def create_status(self, owner, repo, sha):
+        self._repo(repo)["statuses"].setdefault(sha, {})[self.body.get("context", "default")] = self.body["state"]
+        return 201, {"state": self.body["state"], "context": self.body.get("context", "default")}
+
+    # Git data
+
+    @route("GET", "/repos/{owner}/{repo}/git/ref/heads/{branch:*}")
+    def get_ref(self, owner, repo, branch):
+        if branch not in self._repo(repo)["refs"]:
+            return 404, {"message": "Not Found"}
+        return 200, self._ref_json(owner, repo, branch)
+
+    @route("POST", "/repos/{owner}/{repo}/git/refs")
+    def create_ref(self, owner, repo):
+        branch = self.body["ref"][len("refs/heads/") :]
+        refs = self._repo(repo)["refs"]
+        if branch in refs:
+            return 422, {"message": "Reference already exists"}
+        refs[branch] = self.body["sha"]
+        return 201, self._ref_json(owner, repo, branch)
+
+    @route("PATCH", "/repos/{owner}/{repo}/git/refs/heads/{branch:*}")
+    def update_ref(self, owner, repo, branch):
+        refs = self._repo(repo)["refs"]
+        if not self.body.get("force") and refs[branch] not in self.state.commits[self.body["sha"]]["parents"]:
+            return 422, {"message": "Update is not a fast forward"}
+        refs[branch] = self.body["sha"]
+        return 200, self._ref_json(owner, repo, branch)
+
+    @route("GET", "/repos/{owner}/{repo}/git/commits/{sha}")
+    def get_git_commit(self, owner, repo, sha):
+        if sha not in self.state.commits:
+            return 404, {"message": "Not Found"}
+        return 200, self._commit_json(owner, repo, sha)
+
+    @route("POST", "/repos/{owner}/{repo}/git/commits")
+    def create_git_commit(self, owner, repo):
+        sha = self.state.add_commit(self.body["tree"], self.body.get("parents", []), self.body["message"])
+        return 201, self._commit_json(owner, repo, sha)
+
+    @route("GET", "/repos/{owner}/{repo}/git/trees/{sha}")
+    def get_tree(self, owner, repo, sha):
+        refs = self._repo(repo)["refs"]
+        if sha == "HEAD":
+            sha = self.state.commits[refs["main"]]["tree"]
+        elif sha in refs:
+            sha = self.state.commits[refs[sha]]["tree"]
+        if sha not in self.state.trees:
+            return 404, {"message": "Not Found"}
+        return 200, {"sha": sha, "tree": self.state.trees[sha], "truncated": False}
+
+    @route("POST", "/repos/{owner}/{repo}/git/blobs")
+    def create_blob(self, owner, repo):
+        content = self.body["content"]
+        content = base64.b64decode(content) if self.body.get("encoding") == "base64" else content.encode("utf-8")
+        sha = git_blob_sha(content)
+        self.state.blobs[sha] = content
+        return 201, {"sha": sha, "url": f"{self.base}/repos/{owner}/{repo}/git/blobs/{sha}"}
+
+    @route("POST", "/repos/{owner}/{repo}/git/trees")
+    def create_tree(self, owner, repo):
+        base = self.body.get("base_tree")
+        entries = {entry["path"]: entry["sha"] for entry in self.state.trees.get(base, [])}
+        entries.update({element["path"]: element["sha"] for element in self.body["tree"] if "sha" in element})
+        files = {
+            element["path"]: element["content"].encode("utf-8") for element in self.body["tree"] if "content" in element
+        }
+        sha = self.state.add_tree(entries, files)
+        url = f"{self.base}/repos/{owner}/{repo}/git/trees/{sha}"
+        return 201, {"sha": sha, "tree": self.state.trees[sha], "url": url}
+
+    # GraphQL
+
+    @route("POST", "/graphql")
+    def graphql(self):
+        query, variables = self.body["query"], self.body.get("variables") or {}
+        if "pullRequest(" in query:
+            return 200, {"data": {"repository": {"pullRequest": self._graphql_pull_request(variables)}}}
+        if "teams(first:" in query:
+            # Seeded teams have no parent teams, so direct and all members are the same
+            slugs = sorted(self.state.teams)
+            start = int(variables.get("after") or 0)
+            nodes = [
+                {
+                    "slug": slug,
+                    "databaseId": slugs.index(slug) + 1,
+                    "parentTeam": None,
+                    "members": {
+                        "nodes": [{"login": login} for login in self.state.teams[slug][:100]],
+                        "pageInfo": {"hasNextPage": len(self.state.teams[slug]) > 100, "endCursor": "100"},
+                    },
+                }
+                for slug in slugs[start : start + 100]
+            ]
+            page_info = {"hasNextPage": start + 100 < len(slugs), "endCursor": str(start + 100)}
+            return 200, {"data": {"organization": {"teams": {"nodes": nodes, "pageInfo": page_info}}}}
+        if "organization(" in query:
+            organization = {}
+            i = 0
+            while f"slug{i}" in variables:
+                members = self.state.teams.get(variables[f"slug{i}"])
+                if members is None:
+                    organization[f"team{i}"] = None
+                else:
+                    start = int(variables.get(f"after{i}") or 0)
+                    page = members[start : start + 100]
+                    organization[f"team{i}"] = {
+                        "members": {
+                            "nodes": [{"login": login} for login in page],
+                            "pageInfo": {"hasNextPage": start + 100 < len(members), "endCursor": str(start + 100)},
+                        }
+                    }
+                i += 1
+            return 200, {"data": {"organization": organization}}
+        return 200, {"errors": [{"message": "Query not supported by the fake server"}]}
+
+    def _graphql_pull_request(self, variables: Dict) -> Optional[Dict]:
+        repo = self._repo(variables["name"])
+        pull = repo["pulls"].get(variables["number"]) if repo else None
+        if pull is None:
+            return None
+
+        latest = {}
+        for login, state, _ in pull["reviews"]:
+            if state in ("APPROVED", "CHANGES_REQUESTED"):
+                latest[login] = state
+        # Pages of 100 with the offset as cursor, the follow-up query only asks for the next page
+        start = int(variables.get("after") or 0)
+        page = list(latest.items())[start : start + 100]
+        reviews = {
+            "nodes": [{"state": state, "author": {"login": login}} for login, state in page],
+            "pageInfo": {"hasNextPage": start + 100 < len(latest), "endCursor": str(start + 100)},
+        }
+        if "configPath" not in variables:
+            return {"latestOpinionatedReviews": reviews}
+
+        def ref(branch: str) -> Dict:
+            blob_sha = self.state.entries(repo["refs"][branch]).get(variables["configPath"])
+            text = self.state.blobs[blob_sha].decode("utf-8") if blob_sha else None
+            return {"target": {"file": {"object": {"text": text}} if text is not None else None}}
+
+        head_sha = repo["refs"][pull["head"]]
+        status = repo["statuses"].get(head_sha, {}).get(variables["statusContext"])
+        base = ref(pull["base"])
+        base["branchProtectionRule"] = {"dismissesStaleReviews": False}
+        return {
+            "isCrossRepository": False,
+            "headRefName": pull["head"],
+            "headRefOid": head_sha,
+            "baseRefName": pull["base"],
+            "reviews": {"totalCount": len(pull["reviews"])},
+            "reviewRequests": {"nodes": [{"requestedReviewer": {"slug": slug}} for slug in pull["requested_teams"]]},
+            "assignees": {"nodes": [{"login": login} for login in pull["assignees"]]},
+            "commits": {"nodes": [{"commit": {"status": {"context": {"state": status.upper()} if status else None}}}]},
+            "latestOpinionatedReviews": reviews,
+            "headRef": ref(pull["head"]),
+            "baseRef": base,
+        }
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    """Add the organization shape and fault injection options shared with run_benchmarks.py."""
+    parser.add_argument("--teams", type=int, default=3, help="number of teams (default 3)")
+    parser.add_argument("--members", type=int, default=10, help="members per team (default 10)")
+    parser.add_argument("--repos", type=int, default=5, help="repositories in the organization (default 5)")
+    parser.add_argument("--prs", type=int, default=2, help="open pull requests per repository (default 2)")
+    parser.add_argument("--reviews", type=int, default=4, help="reviews per pull request (default 4)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response (default 0)")
+    parser.add_argument("--throttle-every", type=int, default=0, help="throttle every Nth request (default never)")
+    parser.add_argument(
+        "--throttle-status", type=int, default=403, choices=[403, 429, 502], help="status of throttled responses"
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=1.0, help="Retry-After of throttled responses, 0 to leave it out (default 1)"
+    )
+
+
+def server_from_arguments(args, port: int = 0) -> FakeGitHubServer:
+    """Create a server seeded from parsed command-line arguments."""
+    seed = {"teams": args.teams, "members": args.members, "repos": args.repos, "prs": args.prs, "reviews": args.reviews}
+    return FakeGitHubServer(
+        ("127.0.0.1", port),
+        seed,
+        latency=args.latency,
+        throttle_every=args.throttle_every,
+        throttle_status=args.throttle_status,
+        retry_after=args.retry_after,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic GitHub organization on localhost.")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on (default: any free port)")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_arguments(args, args.port)
+    print(f"Fake GitHub API listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
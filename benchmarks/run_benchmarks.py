@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+from fake_github import DEFAULT_ORG, DEFAULT_TEAM_NAME, add_seed_arguments
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), "scripts"))
+
+from github import Github  # noqa: E402
+
+from deploy_pr_workflow import deploy_workflow_and_config  # noqa: E402
+from github_transport import api_base_url, install_pooled_transport  # noqa: E402
+from membership_index import MembershipIndex  # noqa: E402
+from pr_batch_review import BatchReviewRunner, iter_open_pull_requests  # noqa: E402
+from pr_review_manager import PRReviewManager  # noqa: E402
+from rate_limit import governor_from_env  # noqa: E402
+from rollout_status import report_rollout_status, status_totals  # noqa: E402
+
+TOKEN = "bench-token"
+
+
+def review_pull_request(use_graphql: bool = False, batch_requests: bool = False) -> Callable:
+    """Scenario: PRReviewManager.process_pull_request on the first PR of the first repository."""
+
+    def run(args) -> str:
+        org = Github(TOKEN, base_url=api_base_url()).get_organization(DEFAULT_ORG)
+        manager = PRReviewManager(TOKEN, f"{DEFAULT_ORG}/repo-0", 1, use_graphql=use_graphql, batch_requests=batch_requests)
+        return manager.process_pull_request(1, org)
+
+    return run
+
+
+def review_pull_request_async(args) -> str:
+    """Scenario: the async engine on the first PR of the first repository."""
+    from async_review import run_async_review
+
+    return asyncio.run(run_async_review(TOKEN, f"{DEFAULT_ORG}/repo-0", 1, DEFAULT_ORG, hooks=[governor_from_env()]))
+
+
+def review_pull_request_lite(args) -> str:
+    """Scenario: the async engine on the standard library client the packaged review manager uses."""
+    from async_review import run_async_review
+    from rest_client import RestGitHub
+
+    hooks = [governor_from_env()]
+    repository = f"{DEFAULT_ORG}/repo-0"
+    return asyncio.run(run_async_review(TOKEN, repository, 1, DEFAULT_ORG, hooks=hooks, client_class=RestGitHub))
+
+
+def batch_review(args) -> str:
+    """Scenario: re-evaluate every open PR of the organization."""
+    runner = BatchReviewRunner(TOKEN, args.workers, MembershipIndex(), use_graphql=args.graphql)
+    runner.build_membership_index(DEFAULT_ORG)
+    results = runner.run(iter_open_pull_requests(runner.gh, DEFAULT_ORG))
+    errors = sum(1 for result in results if result["error"])
+    return f"{len(results)} PRs, {errors} errors"
+
+
+def rollout(engine: str) -> Callable:
+    """Scenario: deploy the workflow to every repository of the organization."""
+
+    def run(args) -> str:
+        repositories = ",".join(f"repo-{r}" for r in range(args.repos))
+        results = deploy_workflow_and_config(repositories, DEFAULT_TEAM_NAME, args.workers, engine=engine)
+        totals: Dict[str, int] = {}
+        for _, status, _ in results:
+            totals[status] = totals.get(status, 0) + 1
+        return ", ".join(f"{status}={count}" for status, count in sorted(totals.items()))
+
+    return run
+
+
+def rollout_status(args) -> str:
+    """Scenario: the read-only rollout status report of every repository of the organization."""
+    repositories = ",".join(f"repo-{r}" for r in range(args.repos))
+    statuses = report_rollout_status(repositories, DEFAULT_TEAM_NAME, args.workers, report_path=os.devnull)
+    return ", ".join(f"{state}={count}" for state, count in sorted(status_totals(statuses).items()))
+
+
+SCENARIOS = {
+    "review": review_pull_request(),
+    "review-graphql": review_pull_request(use_graphql=True),
+    "review-batched": review_pull_request(use_graphql=True, batch_requests=True),
+    "review-async": review_pull_request_async,
+    "review-lite": review_pull_request_lite,
+    "batch": batch_review,
+    "rollout": rollout("sync"),
+    "rollout-async": rollout("async"),
+    "status": rollout_status,
+}
+ASYNC_SCENARIOS = {"review-async", "rollout-async"}
+
+
+def start_server(args) -> subprocess.Popen:
+    """Start fake_github.py in its own process, so its memory is not measured, and point the scripts at it."""
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, "fake_github.py")]
+    for option in ("teams", "members", "repos", "prs", "reviews", "latency", "throttle_every", "throttle_status"):
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    command += ["--retry-after", str(args.retry_after)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = server.stdout.readline().strip().rsplit(" ", 1)[-1]
+    os.environ["GITHUB_API_URL"] = base_url
+    return server
+
+
+def server_call(path: str, method: str = "GET") -> Dict:
+    request = urllib.request.Request(f"{api_base_url()}{path}", method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_scenario(name: str, args) -> Dict:
+    """Run one scenario against a freshly seeded organization and measure it."""
+    server_call("/_bench/reset", "POST")
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        if args.verbose:
+            result = SCENARIOS[name](args)
+        else:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                result = SCENARIOS[name](args)
+    except Exception as e:
+        result = f"failed: {str(e)}"
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = server_call("/_bench/stats")
+    return {
+        "scenario": name,
+        "requests": stats["requests"],
+        "throttled": stats["throttled"],
+        "wall_seconds": elapsed,
+        "peak_memory_bytes": peak,
+        "result": str(result),
+        "routes": stats["routes"],
+    }
+
+
+def print_report(results: List[Dict], show_routes: bool):
+    """Print one row per scenario, and optionally the requests per route."""
+    width = max(len(result["scenario"]) for result in results)
+    print(f"\n{'scenario':<{width}}  {'requests':>8}  {'throttled':>9}  {'wall s':>7}  {'peak MB':>7}  result")
+    for result in results:
+        print(
+            f"{result['scenario']:<{width}}  {result['requests']:>8}  {result['throttled']:>9}  "
+            f"{result['wall_seconds']:>7.2f}  {result['peak_memory_bytes'] / 2**20:>7.1f}  {result['result']}"
+        )
+        if show_routes:
+            for route, count in result["routes"].items():
+                print(f"    {count:>6}  {route}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review and deployment scripts against a fake GitHub.")
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"comma-separated scenarios to run (default: all of {', '.join(SCENARIOS)})",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="max_workers of batch runs and rollouts (default 8)")
+    parser.add_argument("--graphql", action="store_true", help="use GraphQL reads in the batch scenario")
+    parser.add_argument("--routes", action="store_true", help="list the requests per API route")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the scripts")
+    parser.add_argument(
+        "--github-limits",
+        action="store_true",
+        help="pace requests by GitHub's secondary limits, which the fake server does not enforce",
+    )
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    from async_github import aiohttp
+
+    if aiohttp is None and ASYNC_SCENARIOS.intersection(names):
+        print("aiohttp is not installed, skipping the async scenarios")
+        names = [name for name in names if name not in ASYNC_SCENARIOS]
+
+    server = start_server(args)
+    os.environ.update(
+        GITHUB_TOKEN=TOKEN, GITHUB_REPOSITORY=f"{DEFAULT_ORG}/pr-review-process", TEAM_NAME=DEFAULT_TEAM_NAME
+    )
+    if not args.github_limits:
+        # Without GitHub's points and write budgets, wall times show the scripts rather than the pacing
+        os.environ.setdefault("GITHUB_POINTS_PER_MINUTE", str(10**9))
+        os.environ.setdefault("GITHUB_WRITES_PER_MINUTE", str(10**9))
+    # The same transport for every scenario, as batch runs and rollouts install it anyway
+    install_pooled_transport()
+    try:
+        print(
+            f"Seeded {args.repos} repositories with {args.prs} PRs each, {args.teams} teams of {args.members} "
+            f"members, {args.reviews} reviews per PR; latency {args.latency}s, "
+            f"throttling {'every ' + str(args.throttle_every) + ' requests' if args.throttle_every else 'off'}"
+        )
+        results = [run_scenario(name, args) for name in names]
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_report(results, args.routes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
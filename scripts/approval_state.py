@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+STATE_FORMAT_VERSION = 1
+
+
+class ApprovalStateStore:
+    """Approval tallies recorded per PR so review events can be applied incrementally.
+
+    Each entry records the head SHA and the requirements it was computed for, every
+    counted approver with the required teams they approve for, and the status that was
+    posted. Entries are kept in memory and, when a path is given, persisted as JSON so an
+    Actions cache step can carry them between workflow runs of the same PR. With max_entries,
+    only that many of the most recently used PRs are kept, for long-running processes.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "ApprovalStateStore":
+        """Load recorded approval state from disk, starting empty if it is missing or unreadable."""
+        store = cls(path)
+        if not os.path.exists(path):
+            print(f"Debug: No approval state at {path}, starting cold")
+            return store
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STATE_FORMAT_VERSION:
+                print(f"Debug: Ignoring approval state with unsupported version {data.get('version')}")
+                return store
+            store._entries = OrderedDict(data.get("pull_requests", {}))
+            print(f"Debug: Loaded approval state for {len(store._entries)} PRs from {path}")
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read approval state {path}: {str(e)}")
+        return store
+
+    @staticmethod
+    def _key(repository: str, pr_number: int) -> str:
+        return f"{repository}#{pr_number}"
+
+    def get(self, repository: str, pr_number: int) -> Optional[Dict]:
+        """Get a copy of the recorded state of a PR, or None."""
+        with self._lock:
+            key = self._key(repository, pr_number)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry, approvers={login: list(teams) for login, teams in entry["approvers"].items()})
+
+    def record(
+        self,
+        repository: str,
+        pr_number: int,
+        head_sha: str,
+        requirements: List,
+        approvers: Dict[str, List[str]],
+        status: str,
+    ):
+        """Replace the recorded state of a PR."""
+        with self._lock:
+            key = self._key(repository, pr_number)
+            self._entries[key] = {
+                "head_sha": head_sha,
+                "requirements": requirements,
+                "approvers": approvers,
+                "status": status,
+            }
+            self._entries.move_to_end(key)
+            while self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        """Write the recorded state back to disk if anything changed."""
+        if not self.path or not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            data = {"version": STATE_FORMAT_VERSION, "pull_requests": self._entries}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            self._dirty = False
+        os.replace(tmp_path, self.path)
+        print(f"Debug: Saved approval state for {len(self._entries)} PRs to {self.path}")
@@ -0,0 +1,289 @@
+import asyncio
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from github.GithubException import GithubException
+
+from async_github import AsyncGitHub
+from deploy_pr_workflow import FEATURE_BRANCH_NAME, REVIEWERS_PATH, deployment_pr_body
+from instrumentation import instrumented, operation
+
+
+@instrumented("get_team_name_variable")
+async def get_team_name_variable(client: AsyncGitHub, full_repo_name: str) -> Optional[str]:
+    """Get the current TEAM_NAME repository variable, or None if it is not set."""
+    try:
+        _, data = await client.request("GET", f"/repos/{full_repo_name}/actions/variables/TEAM_NAME")
+        return data.get("value")
+    except GithubException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+@instrumented("set_team_name_variable")
+async def set_team_name_variable(client: AsyncGitHub, full_repo_name: str, team_name: str):
+    """Set the TEAM_NAME repository variable, raising the errors left after the governor's retries."""
+    try:
+        await client.request(
+            "POST", f"/repos/{full_repo_name}/actions/variables", json={"name": "TEAM_NAME", "value": team_name}
+        )
+        print(f"Created TEAM_NAME variable with value '{team_name}' in {full_repo_name}")
+    except GithubException as e:
+        # If variable already exists (typically 409 or 422 error), update it
+        if e.status not in (409, 422) and "already exists" not in str(e).lower():
+            print(f"Failed to set TEAM_NAME variable in {full_repo_name}: {str(e)}")
+            raise
+        await client.request("PATCH", f"/repos/{full_repo_name}/actions/variables/TEAM_NAME", json={"value": team_name})
+        print(f"Updated TEAM_NAME variable to '{team_name}' in {full_repo_name}")
+
+
+@instrumented("get_repository")
+async def get_default_branch(client: AsyncGitHub, full_repo_name: str) -> str:
+    """Get the name of a repository's default branch."""
+    _, repo = await client.request("GET", f"/repos/{full_repo_name}")
+    return repo["default_branch"]
+
+
+@instrumented("is_up_to_date")
+async def is_up_to_date(client: AsyncGitHub, full_repo_name: str, bundle) -> bool:
+    """Check with a single tree read whether the default branch already has the deployed files."""
+    try:
+        _, tree = await client.request("GET", f"/repos/{full_repo_name}/git/trees/HEAD", params={"recursive": "1"})
+    except GithubException as e:
+        print(f"Could not read the default branch tree of {full_repo_name}: {str(e)}")
+        return False
+
+    target_shas = {element["path"]: element["sha"] for element in tree["tree"]}
+    if REVIEWERS_PATH not in target_shas:
+        return False
+    return all(target_shas.get(path) == bundle.blob_shas[path] for path in bundle.deployed_paths)
+
+
+async def _get_ref_sha(client: AsyncGitHub, full_repo_name: str, branch: str) -> Optional[str]:
+    """Get the commit a branch points to, or None when the branch does not exist."""
+    try:
+        _, ref = await client.request("GET", f"/repos/{full_repo_name}/git/ref/heads/{quote(branch)}")
+        return ref["object"]["sha"]
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        return None
+
+
+@instrumented("check_reviewers_file")
+async def reviewers_file_exists(
+    client: AsyncGitHub,
+    full_repo_name: str,
+    parent_tree_sha: str,
+    parent_sha: str,
+    default_branch: str,
+    default_sha: str,
+) -> bool:
+    """Check for REVIEWERS.yml on the commit being extended, then on the default branch."""
+    _, tree = await client.request("GET", f"/repos/{full_repo_name}/git/trees/{parent_tree_sha}")
+    if any(element["path"] == REVIEWERS_PATH for element in tree["tree"]):
+        return True
+    if parent_sha == default_sha:
+        return False
+    try:
+        await client.request(
+            "GET", f"/repos/{full_repo_name}/contents/{REVIEWERS_PATH}", params={"ref": default_branch}
+        )
+        return True
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        return False
+
+
+async def commit_deployment_files(
+    client: AsyncGitHub, full_repo_name: str, bundle, feature_branch_name: str, default_branch: str
+) -> Optional[str]:
+    """Async version of deploy_pr_workflow.commit_deployment_files, with the same single-commit guarantees."""
+    with operation("get_git_ref"):
+        default_sha, feature_sha = await asyncio.gather(
+            _get_ref_sha(client, full_repo_name, default_branch),
+            _get_ref_sha(client, full_repo_name, feature_branch_name),
+        )
+    if default_sha is None:
+        raise GithubException(404, {"message": f"Branch {default_branch} not found"}, None)
+    if feature_sha is not None:
+        print(f"Branch {feature_branch_name} already exists in {full_repo_name}")
+    parent_sha = feature_sha or default_sha
+    with operation("get_git_commit"):
+        _, parent_commit = await client.request("GET", f"/repos/{full_repo_name}/git/commits/{parent_sha}")
+    parent_tree_sha = parent_commit["tree"]["sha"]
+
+    paths = list(bundle.deployed_paths)
+    if await reviewers_file_exists(client, full_repo_name, parent_tree_sha, parent_sha, default_branch, default_sha):
+        print(f"REVIEWERS.yml already exists in {full_repo_name}, preserving it")
+    else:
+        paths.append(REVIEWERS_PATH)
+    # Tree entries can only carry text, so binary files are uploaded as blobs first
+    with operation("create_git_blob"):
+        await asyncio.gather(
+            *(
+                client.request(
+                    "POST",
+                    f"/repos/{full_repo_name}/git/blobs",
+                    json={"content": bundle.blob_content(path), "encoding": "base64"},
+                )
+                for path in bundle.BINARY_PATHS
+            )
+        )
+    elements = [
+        (
+            {"path": path, "mode": "100644", "type": "blob", "sha": bundle.blob_shas[path]}
+            if path in bundle.BINARY_PATHS
+            else {"path": path, "mode": "100644", "type": "blob", "content": bundle.files[path].decode("utf-8")}
+        )
+        for path in paths
+    ]
+
+    with operation("create_git_tree"):
+        _, tree = await client.request(
+            "POST", f"/repos/{full_repo_name}/git/trees", json={"base_tree": parent_tree_sha, "tree": elements}
+        )
+    if tree["sha"] == parent_tree_sha:
+        print(f"Deployment files are already up to date in {full_repo_name}")
+        return parent_sha if feature_sha is not None else None
+
+    with operation("create_git_commit"):
+        _, commit = await client.request(
+            "POST",
+            f"/repos/{full_repo_name}/git/commits",
+            json={"message": "Deploy Pull Request Approval Workflow", "tree": tree["sha"], "parents": [parent_sha]},
+        )
+    if feature_sha is None:
+        with operation("create_git_ref"):
+            await client.request(
+                "POST",
+                f"/repos/{full_repo_name}/git/refs",
+                json={"ref": f"refs/heads/{feature_branch_name}", "sha": commit["sha"]},
+            )
+        print(f"Created branch {feature_branch_name} at {commit['sha']} in {full_repo_name}")
+    else:
+        # Fast-forward only, so concurrent pushes to the branch are never overwritten
+        with operation("update_git_ref"):
+            await client.request(
+                "PATCH",
+                f"/repos/{full_repo_name}/git/refs/heads/{quote(feature_branch_name)}",
+                json={"sha": commit["sha"], "force": False},
+            )
+        print(f"Moved branch {feature_branch_name} to {commit['sha']} in {full_repo_name}")
+    return commit["sha"]
+
+
+@instrumented("create_pull")
+async def create_or_check_pr(
+    client: AsyncGitHub,
+    full_repo_name: str,
+    org_name: str,
+    feature_branch_name: str,
+    default_branch: str,
+    team_name: str,
+):
+    """Create a pull request if one doesn't exist."""
+    _, open_prs = await client.request(
+        "GET",
+        f"/repos/{full_repo_name}/pulls",
+        params={"state": "open", "head": f"{org_name}:{feature_branch_name}", "base": default_branch, "per_page": 1},
+    )
+    if not open_prs:
+        _, pr = await client.request(
+            "POST",
+            f"/repos/{full_repo_name}/pulls",
+            json={
+                "title": "Deploy Pull Request Approval Workflow",
+                "body": deployment_pr_body(team_name),
+                "head": feature_branch_name,
+                "base": default_branch,
+            },
+        )
+        print(f"Created PR #{pr['number']} in {full_repo_name}")
+    else:
+        print(f"PR already exists in {full_repo_name}")
+
+
+@instrumented("process_repository")
+async def process_repository(
+    client: AsyncGitHub, bundle, full_repo_name: str, team_name: str, org_name: str
+) -> Tuple[str, str]:
+    """Async version of deploy_pr_workflow.process_repository, returning the same (status, detail) tuple."""
+    try:
+        print(f"Processing repository: {full_repo_name} with team: {team_name}")
+
+        # Repositories that already run the current files only need their TEAM_NAME checked
+        up_to_date, current_team_name = await asyncio.gather(
+            is_up_to_date(client, full_repo_name, bundle),
+            get_team_name_variable(client, full_repo_name),
+            return_exceptions=True,
+        )
+        if isinstance(up_to_date, Exception):
+            raise up_to_date
+        if up_to_date:
+            if isinstance(current_team_name, Exception):
+                raise current_team_name
+            if current_team_name != team_name:
+                await set_team_name_variable(client, full_repo_name, team_name)
+            print(f"{full_repo_name} already has the current workflow and scripts, skipping")
+            return "unchanged", "default branch already has the current files"
+
+        # Set TEAM_NAME repository variable while the default branch is looked up
+        _, default_branch = await asyncio.gather(
+            set_team_name_variable(client, full_repo_name, team_name),
+            get_default_branch(client, full_repo_name),
+        )
+        feature_branch_name = FEATURE_BRANCH_NAME
+
+        # Commit all deployment files to the feature branch at once
+        head_sha = await commit_deployment_files(client, full_repo_name, bundle, feature_branch_name, default_branch)
+        if head_sha is None:
+            return "unchanged", f"{default_branch} already has the current files"
+
+        # Create or check for PR
+        await create_or_check_pr(client, full_repo_name, org_name, feature_branch_name, default_branch, team_name)
+
+        print(f"Successfully deployed to {full_repo_name}")
+        return "deployed", f"branch {feature_branch_name} at {head_sha[:7]}"
+    except Exception as e:
+        print(f"Failed to deploy to {full_repo_name}: {str(e)}")
+        return "failed", str(e)
+
+
+async def deploy_repositories_async(
+    token: str,
+    bundle,
+    repositories: Iterable[Tuple[str, str]],
+    org_name: str,
+    max_workers: int,
+    hooks=None,
+    on_result: Optional[Callable[[str, str, str, str], None]] = None,
+) -> List[Tuple[str, str, str]]:
+    """Deploy to every repository with at most max_workers repositories in progress at once.
+
+    repositories is consumed as repositories finish, and on_result, when given, is called
+    with (repository, team name, status, detail) as soon as each one is done.
+    """
+    in_progress = asyncio.Semaphore(max(1, max_workers))
+
+    # Each repository issues a couple of reads at once, so allow more requests than repositories
+    async with AsyncGitHub(token, max_concurrency=max(1, max_workers) * 2, hooks=hooks) as client:
+
+        async def deploy(full_repo_name: str, team_name: str):
+            try:
+                status, detail = await process_repository(client, bundle, full_repo_name, team_name, org_name)
+            finally:
+                in_progress.release()
+            if on_result is not None:
+                on_result(full_repo_name, team_name, status, detail)
+            return full_repo_name, status, detail
+
+        tasks = []
+        for full_repo_name, team_name in repositories:
+            await in_progress.acquire()
+            tasks.append(asyncio.ensure_future(deploy(full_repo_name, team_name)))
+        results = await asyncio.gather(*tasks)
+        print(f"Async engine made {client.request_count} API requests")
+    return list(results)
@@ -0,0 +1,151 @@
+import asyncio
+import re
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from rest_client import GithubException, api_base_url, last_page_number
+
+try:
+    import aiohttp
+except ImportError:  # Only needed by the async engine
+    aiohttp = None
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+_NEXT_LINK = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+
+class AsyncGitHub:
+    """Minimal asyncio client for the GitHub REST and GraphQL endpoints the scripts use.
+
+    All requests share one keep-alive connection pool and a semaphore bounding how many are
+    in flight. Errors are raised as PyGithub's GithubException, so callers handle status
+    codes exactly like on the synchronous path. Transport hooks (see github_transport) see
+    every request, with before_request run off the event loop since it may sleep.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        hooks: Optional[List] = None,
+    ):
+        if aiohttp is None:
+            raise RuntimeError("The async engine requires aiohttp, install it with 'pip install aiohttp'")
+        self.base_url = (base_url or api_base_url()).rstrip("/")
+        # GitHub Enterprise Server serves GraphQL at /api/graphql next to /api/v3
+        self.graphql_url = (
+            self.base_url[: -len("/v3")] if self.base_url.endswith("/v3") else self.base_url
+        ) + "/graphql"
+        self.hooks = list(hooks or [])
+        # A hook with retry_delay, see rate_limit.RequestGovernor, decides which failed requests are sent again
+        self._governor = next((hook for hook in self.hooks if hasattr(hook, "retry_delay")), None)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=max_concurrency, keepalive_timeout=30),
+            headers={
+                "Authorization": f"token {token}",
+                "Accept": "application/vnd.github+json",
+                "User-Agent": "pr-review-process",
+            },
+        )
+        self.request_count = 0
+
+    async def __aenter__(self) -> "AsyncGitHub":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._session.close()
+
+    async def request(
+        self,
+        verb: str,
+        path: str,
+        params: Optional[Dict] = None,
+        json: Optional[Dict] = None,
+        accept: Optional[str] = None,
+    ) -> Tuple[Dict, object]:
+        """Send one request and return (headers, decoded body), raising GithubException on errors."""
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        headers = {"Accept": accept} if accept else None
+        query = json.get("query") if isinstance(json, dict) else None
+        governor = self._governor
+
+        attempt = 0
+        while True:
+            for hook in self.hooks:
+                await asyncio.to_thread(hook.before_request, verb, url)
+            try:
+                try:
+                    async with self._semaphore:
+                        self.request_count += 1
+                        async with self._session.request(
+                            verb, url, params=params, json=json, headers=headers
+                        ) as response:
+                            if response.content_type == "application/json":
+                                data = await response.json()
+                            else:
+                                data = await response.read()
+                            status, response_headers = response.status, response.headers
+                except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+                    delay = governor.retry_delay(verb, url, None, {}, attempt, query) if governor else None
+                    if delay is None:
+                        raise
+                else:
+                    for hook in self.hooks:
+                        hook.after_response(verb, url, status, response_headers)
+                    if status < 400 or governor is None:
+                        break
+                    delay = governor.retry_delay(verb, url, status, response_headers, attempt, query, data)
+                    if delay is None:
+                        break
+            except BaseException:
+                # Whatever cut the request short, it must not keep holding the circuit breaker's probe
+                if governor is not None:
+                    governor.abandon()
+                raise
+            print(f"Debug: Retrying {verb} {url} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if status >= 400:
+            raise GithubException(status, data if isinstance(data, dict) else None, dict(response_headers))
+        return dict(response_headers), data
+
+    async def paginate(self, path: str, params: Optional[Dict] = None) -> AsyncIterator:
+        """Yield every item of a paginated list endpoint, following Link headers."""
+        params = dict(params or {}, per_page=100)
+        url = path
+        while url:
+            headers, page = await self.request("GET", url, params=params)
+            for item in page:
+                yield item
+            match = _NEXT_LINK.search(headers.get("Link", ""))
+            # The next link already carries the query string
+            url, params = (match.group(1), None) if match else (None, None)
+
+    async def paginate_backwards(self, path: str, first_page: Optional[Tuple[Dict, List]] = None) -> AsyncIterator:
+        """Yield every item of a paginated list endpoint from the last one back, see RestGitHub.paginate_backwards."""
+        if first_page is None:
+            first_page = await self.request("GET", path, params={"per_page": 100})
+        headers, items = first_page
+        for page in range(last_page_number(headers.get("Link", "")), 1, -1):
+            _, page_items = await self.request("GET", path, params={"per_page": 100, "page": page})
+            for item in reversed(page_items):
+                yield item
+        for item in reversed(items):
+            yield item
+
+    async def get_list(self, path: str, params: Optional[Dict] = None) -> List:
+        """Collect every item of a paginated list endpoint."""
+        return [item async for item in self.paginate(path, params)]
+
+    async def graphql(self, query: str, variables: Dict) -> Dict:
+        """Run a GraphQL query and return its data."""
+        _, data = await self.request("POST", self.graphql_url, json={"query": query, "variables": variables})
+        if data.get("errors"):
+            raise GithubException(200, data, None)
+        return data["data"]
@@ -0,0 +1,364 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from async_github import AsyncGitHub
+from instrumentation import instrumented, operation
+from membership_index import MembershipIndex
+from rate_limit import is_transient
+from rest_client import GithubException
+from review_config import (
+    BranchPolicy,
+    CompiledConfigCache,
+    CompiledReviewConfig,
+    ConfigError,
+    ReviewTally,
+    compile_review_config,
+    meets_requirements,
+)
+
+ASSIGNEE_BATCH_SIZE = 10
+STATUS_CONTEXT = "pr-review-requirements"
+
+
+class AsyncPRReviewManager:
+    """asyncio counterpart of PRReviewManager.process_pull_request over the REST API.
+
+    Applies the same rules and prints the same messages, but issues independent reads
+    (branch protection, reviews, current status, team members) and writes (review
+    requests, assignee batches) concurrently on one pooled AsyncGitHub client.
+    """
+
+    def __init__(
+        self,
+        client: AsyncGitHub,
+        repository: str,
+        pr_number: int,
+        membership_index: Optional[MembershipIndex] = None,
+        team_name: Optional[str] = None,
+        compiled_configs: Optional[CompiledConfigCache] = None,
+    ):
+        self.client = client
+        self.repository = repository
+        self.pr_number = pr_number
+        self._reviews_path = f"/repos/{repository}/pulls/{pr_number}/reviews"
+        self.membership_index = membership_index
+        self.team_name = team_name if team_name is not None else os.environ.get("TEAM_NAME", "")
+        self.compiled_configs = compiled_configs
+        self._team_members: Dict[str, asyncio.Future] = {}
+        self.avoided_writes = 0
+
+    def _compile_config(self, content: bytes) -> CompiledReviewConfig:
+        if self.compiled_configs is not None:
+            return self.compiled_configs.get_or_compile(content, self.team_name)
+        return compile_review_config(content, self.team_name)
+
+    async def _get_config_at(self, ref: str) -> bytes:
+        _, content = await self.client.request(
+            "GET",
+            f"/repos/{self.repository}/contents/REVIEWERS.yml",
+            params={"ref": ref},
+            accept="application/vnd.github.raw",
+        )
+        return content
+
+    @instrumented("load_config")
+    async def _load_config(self, pr: Dict) -> CompiledReviewConfig:
+        """Load and compile REVIEWERS.yml from the PR's head branch, falling back to its base branch."""
+        head_ref, base_ref = pr["head"]["ref"], pr["base"]["ref"]
+        print(
+            f"Debug: Looking for REVIEWERS.yml in PR #{self.pr_number} head branch: {head_ref} "
+            f"(SHA: {pr['head']['sha']})"
+        )
+        # Ask for both at once; the base copy is only used when the head has none
+        head, base = await asyncio.gather(
+            self._get_config_at(head_ref), self._get_config_at(base_ref), return_exceptions=True
+        )
+        try:
+            if not isinstance(head, Exception):
+                print(f"Debug: Found REVIEWERS.yml in PR head branch {head_ref}")
+                return self._compile_config(head)
+            print(f"Debug: Could not find REVIEWERS.yml in PR head branch: {str(head)}")
+            if isinstance(base, Exception):
+                raise base
+            print(f"Debug: Found REVIEWERS.yml in base branch {base_ref}")
+            return self._compile_config(base)
+        except ConfigError as e:
+            print(f"Error: {str(e)}")
+            raise
+        except Exception as e:
+            print(f"Debug: Unexpected error while loading config - {str(e)}")
+            raise FileNotFoundError(f"Failed to load REVIEWERS.yml: {str(e)}") from e
+
+    @instrumented("check_branch_protection")
+    async def _check_branch_protection(self, branch_name: str) -> bool:
+        try:
+            _, protection = await self.client.request(
+                "GET", f"/repos/{self.repository}/branches/{quote(branch_name, safe='')}/protection"
+            )
+            return protection.get("required_pull_request_reviews", {}).get("dismiss_stale_reviews", False)
+        except Exception as e:
+            print(f"Warning: Could not check branch protection settings: {str(e)}")
+            return False
+
+    @instrumented("get_review_status")
+    async def _get_review_status(self, head_sha: str) -> Optional[str]:
+        _, combined = await self.client.request("GET", f"/repos/{self.repository}/commits/{head_sha}/status")
+        for status in combined.get("statuses", []):
+            if status["context"] == STATUS_CONTEXT:
+                return status["state"]
+        return None
+
+    @instrumented("get_team_members")
+    async def _fetch_team_members(self, team_slug: str, org_login: str) -> List[str]:
+        try:
+            members = [
+                member["login"] for member in await self.client.get_list(f"/orgs/{org_login}/teams/{team_slug}/members")
+            ]
+        except GithubException as e:
+            if e.status == 404:
+                print(f"Warning: Team {team_slug} not found")
+            else:
+                print(f"Warning: Error accessing team {team_slug}: {str(e)}")
+            return []
+        if self.membership_index is not None:
+            self.membership_index.set_members(team_slug, members)
+        if not members:
+            print(f"Warning: No members found in team {team_slug}")
+        return members
+
+    async def _get_team_members(self, team_slug: str, org_login: str) -> List[str]:
+        """Get a team's members, sharing one fetch between every coroutine asking for the same team."""
+        if self.membership_index is not None:
+            cached_members = self.membership_index.get_members(team_slug)
+            if cached_members is not None:
+                return cached_members
+        if team_slug not in self._team_members:
+            self._team_members[team_slug] = asyncio.ensure_future(self._fetch_team_members(team_slug, org_login))
+        return list(await self._team_members[team_slug])
+
+    async def _is_team_member(self, username: str, team_slug: str, org_login: str) -> bool:
+        if self.membership_index is not None:
+            is_member = self.membership_index.is_member(username, team_slug)
+            if is_member is not None:
+                return is_member
+        if team_slug in self._team_members or self.membership_index is not None:
+            return username in await self._get_team_members(team_slug, org_login)
+        try:
+            _, membership = await self.client.request(
+                "GET", f"/orgs/{org_login}/teams/{team_slug}/memberships/{username}"
+            )
+            return membership.get("state") == "active"
+        except GithubException as e:
+            if e.status != 404:
+                print(f"Warning: Error checking if user {username} is in team {team_slug}: {str(e)}")
+            return False
+
+    @instrumented("get_user_teams")
+    async def _approver_teams(self, reviewer_login: str, org_login: str, required_team_slugs: List[str]) -> List[str]:
+        checks = await asyncio.gather(
+            *(self._is_team_member(reviewer_login, team_slug, org_login) for team_slug in required_team_slugs)
+        )
+        user_team_slugs = [team_slug for team_slug, is_member in zip(required_team_slugs, checks) if is_member]
+        for team_slug in user_team_slugs:
+            print(f"Debug: User {reviewer_login} approval counts for team {team_slug}")
+        return user_team_slugs
+
+    @instrumented("check_required_reviews")
+    async def _check_required_reviews(
+        self, first_reviews_page: Tuple[Dict, List], branch_config: BranchPolicy, org_login: str
+    ) -> Tuple[bool, Dict[str, List[str]]]:
+        """Count each reviewer's latest opinion newest first, stopping reading once the requirements are met.
+
+        first_reviews_page is the (headers, reviews) of the first page; the other pages are
+        read from the last one back, so older pages are only requested while still needed.
+        """
+        tally = ReviewTally(branch_config.required_approvals, branch_config.required_team_slugs)
+        if tally.satisfied:
+            print("Debug: Branch requires no approvals, not reading reviews")
+        else:
+            reviews = self.client.paginate_backwards(self._reviews_path, first_reviews_page)
+            async for review in reviews:
+                reviewer_login = (review.get("user") or {}).get("login")
+                if not tally.observe(reviewer_login, review["state"]):
+                    continue
+                unsatisfied = tally.unsatisfied_team_slugs()
+                teams = await self._approver_teams(reviewer_login, org_login, unsatisfied) if unsatisfied else []
+                tally.add_approver(reviewer_login, teams)
+                if tally.satisfied:
+                    print(f"Debug: Requirements met after {len(tally.approvals)} approvals, not reading older reviews")
+                    await reviews.aclose()
+                    break
+        met = meets_requirements(tally.approvals, branch_config.required_approvals, tally.required_team_slugs)
+        return met, tally.approvals
+
+    async def _request_team_review(self, team_slugs: List[str]) -> bool:
+        try:
+            await self.client.request(
+                "POST",
+                f"/repos/{self.repository}/pulls/{self.pr_number}/requested_reviewers",
+                json={"team_reviewers": team_slugs},
+            )
+            return True
+        except GithubException as e:
+            if len(team_slugs) == 1:
+                print(f"Warning: Could not request review from team {team_slugs[0]}: {str(e)}")
+            else:
+                print(f"Debug: Batched review request failed, requesting teams one at a time: {str(e)}")
+            return False
+
+    @instrumented("create_review_request")
+    async def _request_team_reviews(self, team_slugs: List[str], requested_team_slugs: Set[str]):
+        already_requested = [team_slug for team_slug in team_slugs if team_slug in requested_team_slugs]
+        if already_requested:
+            print(f"Debug: Reviews already requested from teams: {', '.join(already_requested)}")
+            self.avoided_writes += len(already_requested)
+        team_slugs = [team_slug for team_slug in team_slugs if team_slug not in requested_team_slugs]
+        if not team_slugs:
+            return
+
+        # One call for every team, then each team on its own if GitHub rejected one of them
+        if len(team_slugs) > 1 and await self._request_team_review(team_slugs):
+            self.avoided_writes += len(team_slugs) - 1
+            requested = team_slugs
+        else:
+            results = await asyncio.gather(*(self._request_team_review([team_slug]) for team_slug in team_slugs))
+            requested = [team_slug for team_slug, ok in zip(team_slugs, results) if ok]
+        for team_slug in requested:
+            print(f"Successfully requested review from team: {team_slug}")
+
+    @instrumented("add_assignees")
+    async def _add_assignees(self, assignees: Set[str], current_assignees: Set[str]):
+        missing = sorted(assignees - current_assignees)
+        self.avoided_writes += -(-len(assignees) // ASSIGNEE_BATCH_SIZE) - -(-len(missing) // ASSIGNEE_BATCH_SIZE)
+        if not missing:
+            print("Debug: All assignees are already assigned")
+            return
+
+        async def add_batch(batch: List[str]):
+            await self.client.request(
+                "POST", f"/repos/{self.repository}/issues/{self.pr_number}/assignees", json={"assignees": batch}
+            )
+            print(f"Successfully added assignees: {', '.join(batch)}")
+
+        batches = [missing[i : i + ASSIGNEE_BATCH_SIZE] for i in range(0, len(missing), ASSIGNEE_BATCH_SIZE)]
+        results = await asyncio.gather(*(add_batch(batch) for batch in batches), return_exceptions=True)
+        for result in results:
+            if isinstance(result, GithubException):
+                print(f"Warning: Error adding assignees: {str(result)}")
+            elif isinstance(result, Exception):
+                raise result
+
+    @instrumented("create_status")
+    async def _post_review_status(self, head_sha: str, meets_requirements: bool, current_status: Optional[str]):
+        state = "success" if meets_requirements else "pending"
+        description = "All review requirements met" if meets_requirements else "Required reviews not yet met"
+        if current_status == state:
+            print(f"Debug: Status check is already {state}, not updating it")
+            self.avoided_writes += 1
+            return state
+        try:
+            await self.client.request(
+                "POST",
+                f"/repos/{self.repository}/statuses/{head_sha}",
+                json={
+                    "state": state,
+                    "target_url": "",
+                    "description": description,
+                    "context": STATUS_CONTEXT,
+                },
+            )
+        except GithubException as e:
+            if is_transient(e.status, e.headers, e.data):
+                # Still failing after the governor's retries; fail the run rather than leave a stale status
+                print(f"Error: Could not update status check: {str(e)}")
+                raise
+            print(f"Warning: Could not update status check: {str(e)}")
+        return state
+
+    @instrumented("process_pull_request")
+    async def process_pull_request(self, org_login: str) -> Optional[str]:
+        """Process the pull request according to the configuration, like PRReviewManager.process_pull_request."""
+        with operation("get_pull_request"):
+            _, pr = await self.client.request("GET", f"/repos/{self.repository}/pulls/{self.pr_number}")
+        config = await self._load_config(pr)
+
+        branch_name = pr["base"]["ref"]
+        print(f"Debug: Processing PR #{self.pr_number} targeting branch {branch_name}")
+        branch_config = config.match(branch_name)
+        if branch_config is None:
+            print(f"Debug: No matching configuration found for branch {branch_name}")
+            print(f"No configuration found for branch: {branch_name}")
+            return None
+        if branch_config.pattern == branch_name:
+            print(f"Debug: Found exact match configuration for branch {branch_name}")
+        else:
+            pattern = branch_config.pattern
+            print(f"Debug: Found pattern match configuration for branch {branch_name} using pattern {pattern}")
+        if not branch_config.configured:
+            print(f"No configuration found for branch: {branch_name}")
+            return None
+
+        review_teams = list(branch_config.review_team_slugs)
+        assignee_teams = list(branch_config.assignee_team_slugs)
+        head_sha = pr["head"]["sha"]
+
+        # Every read this run needs, at once
+        # Only the first page of reviews: it tells whether there are any, and the rest is read newest first
+        dismiss_stale_reviews, first_reviews_page, current_status, *member_lists = await asyncio.gather(
+            self._check_branch_protection(branch_name),
+            self.client.request("GET", self._reviews_path, params={"per_page": 100}),
+            self._get_review_status(head_sha),
+            *(self._get_team_members(team_slug, org_login) for team_slug in assignee_teams),
+        )
+        print(f"Debug: Dismiss stale reviews setting for branch {branch_name}: {dismiss_stale_reviews}")
+
+        writes = []
+        if dismiss_stale_reviews or not first_reviews_page[1]:
+            print("Debug: Requesting reviews since either no reviews exist or stale reviews are dismissed")
+            requested = {team["slug"] for team in pr.get("requested_teams", [])}
+            writes.append(self._request_team_reviews(review_teams, requested))
+        else:
+            print("Debug: Skipping review requests as reviews exist and stale reviews are not dismissed")
+
+        assignees = set()
+        for team_slug, team_members in zip(assignee_teams, member_lists):
+            if team_members:
+                assignees.update(team_members)
+                print(f"Found {len(team_members)} members in team {team_slug}")
+        if assignees:
+            writes.append(self._add_assignees(assignees, {user["login"] for user in pr.get("assignees", [])}))
+        else:
+            print("No valid assignees found to add to the PR")
+
+        # The review scan only reads, so it runs alongside the writes
+        *_, (meets_requirements, _) = await asyncio.gather(
+            *writes, self._check_required_reviews(first_reviews_page, branch_config, org_login)
+        )
+        state = await self._post_review_status(head_sha, meets_requirements, current_status)
+        print(f"Debug: Skipped {self.avoided_writes} redundant writes")
+        return state
+
+
+async def run_async_review(
+    github_token: str,
+    repository: str,
+    pr_number: int,
+    org_login: str,
+    membership_index: Optional[MembershipIndex] = None,
+    hooks: Optional[List] = None,
+    compiled_configs: Optional[CompiledConfigCache] = None,
+    client_class=AsyncGitHub,
+) -> Optional[str]:
+    """Evaluate one PR with the async engine, closing the client afterwards.
+
+    client_class is AsyncGitHub or rest_client.RestGitHub, which share one interface.
+    """
+    async with client_class(github_token, hooks=hooks) as client:
+        manager = AsyncPRReviewManager(
+            client, repository, pr_number, membership_index, compiled_configs=compiled_configs
+        )
+        state = await manager.process_pull_request(org_login)
+        print(f"Debug: Async engine made {client.request_count} API requests")
+        return state
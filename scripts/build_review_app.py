@@ -0,0 +1,78 @@
+import importlib.metadata
+import importlib.util
+import io
+import os
+import sys
+import zipfile
+from typing import Dict, Iterator, Tuple
+
+# Where the deployer puts the packaged review manager in target repositories
+APP_ARCHIVE_PATH = "scripts/pr-review.pyz"
+
+# Pure-Python dependencies vendored into the archive; their C speedups are optional and left out
+VENDORED_PACKAGES = {"yaml": "PyYAML"}
+
+APP_MAIN = b"from pr_review_app import main\n\nmain()\n"
+
+# Fixed metadata so the same sources always give a byte-identical archive, and so the same blob SHA
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_ZIP_FILE_MODE = 0o644 << 16
+_ZIP_UNIX_SYSTEM = 3
+
+
+def _iter_vendored_files() -> Iterator[Tuple[str, bytes]]:
+    """Yield (archive name, content) for the Python sources and license of every vendored package."""
+    for package, distribution in sorted(VENDORED_PACKAGES.items()):
+        spec = importlib.util.find_spec(package)
+        if spec is None or not spec.submodule_search_locations:
+            raise RuntimeError(
+                f"Building the packaged review manager requires {distribution}, "
+                f"install it with 'pip install {distribution}'"
+            )
+        package_dir = list(spec.submodule_search_locations)[0]
+        for name in sorted(os.listdir(package_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(package_dir, name), "rb") as f:
+                    yield f"{package}/{name}", f.read()
+
+        license_files = [
+            path for path in importlib.metadata.distribution(distribution).files or [] if "LICENSE" in path.name
+        ]
+        if license_files:
+            yield f"{package}/LICENSE", license_files[0].read_binary()
+
+
+def build_review_app(scripts: Dict[str, bytes]) -> bytes:
+    """Build the packaged review manager: a zipapp of the runtime scripts with PyYAML vendored.
+
+    scripts maps repository paths such as scripts/pr_review_manager.py to their content.
+    Entries are stored uncompressed and in a fixed order with fixed timestamps, so the
+    archive only changes when its sources do and imports need no decompression.
+    """
+    entries = {os.path.basename(path): content for path, content in scripts.items() if path.endswith(".py")}
+    entries["__main__.py"] = APP_MAIN
+    entries.update(_iter_vendored_files())
+
+    buffer = io.BytesIO()
+    buffer.write(b"#!/usr/bin/env python3\n")
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name in sorted(entries):
+            info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+            info.external_attr = _ZIP_FILE_MODE
+            info.create_system = _ZIP_UNIX_SYSTEM
+            archive.writestr(info, entries[name])
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    # Build from the local checkout, e.g. to try the packaged review manager before a rollout
+    from deploy_pr_workflow import RUNTIME_SCRIPT_PATHS, SOURCE_ROOT
+
+    output_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(SOURCE_ROOT, APP_ARCHIVE_PATH)
+    sources = {}
+    for path in RUNTIME_SCRIPT_PATHS:
+        with open(os.path.join(SOURCE_ROOT, path), "rb") as f:
+            sources[path] = f.read()
+    with open(output_path, "wb") as f:
+        f.write(build_review_app(sources))
+    print(f"Wrote the packaged review manager to {output_path}")
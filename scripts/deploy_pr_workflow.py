@@ -1,232 +1,261 @@
+import asyncio
+import base64
+import hashlib
 import os
-import random
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 
 from github import Github
 from github import GithubException
-
-
+from github import InputGitTreeElement
+
+from build_review_app import APP_ARCHIVE_PATH, build_review_app
+from github_transport import (
+    add_transport_hook,
+    api_base_url,
+    install_pooled_transport,
+    remove_transport_hook,
+    set_response_cache,
+)
+from http_cache import open_response_cache
+from instrumentation import instrumentation_from_env, instrumented, operation, report_from_env
+from rollout_journal import RolloutJournal
+from rollout_targets import (
+    ORG_QUERY_PREFIX,
+    TARGET_FILE_EXTENSIONS,
+    iter_org_repositories,
+    iter_targets_from_file,
+    parse_org_query,
+)
+
+WORKFLOW_PATH = ".github/workflows/Pull-Request-Approval-Workflow.yml"
+REVIEWERS_PATH = "REVIEWERS.yml"
+FEATURE_BRANCH_NAME = "feature/push_new_pr_update"
+
+# Scripts the approval workflow runs, deployed side by side into the target's scripts/ directory
+RUNTIME_SCRIPT_PATHS = [
+    "scripts/pr_review_manager.py",
+    "scripts/membership_index.py",
+    "scripts/graphql_loader.py",
+    "scripts/github_transport.py",
+    "scripts/review_config.py",
+    "scripts/approval_state.py",
+    "scripts/http_cache.py",
+    "scripts/instrumentation.py",
+    "scripts/async_github.py",
+    "scripts/async_review.py",
+    "scripts/rest_client.py",
+    "scripts/rate_limit.py",
+    "scripts/pr_review_app.py",
+]
+
+DEFAULT_MAX_WORKERS = 8
+
+# Root of the source checkout, which is where the deployed files are read from first
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@instrumented("set_team_name_variable")
 def set_team_name_variable(requester, full_repo_name, team_name):
-    """Set the TEAM_NAME repository variable."""
-    try:
-        url = f"https://api.github.com/repos/{full_repo_name}/actions/variables"
-        data = {"name": "TEAM_NAME", "value": team_name}
-
-        try:
-            requester.requestJson("POST", url, input=data)
-            print(f"Created TEAM_NAME variable with value '{team_name}' in {full_repo_name}")
-        except GithubException as e:
-            # If variable already exists (typically 422 error), update it
-            if e.status == 422 or "already exists" in str(e).lower():
-                url = f"https://api.github.com/repos/{full_repo_name}/actions/variables/TEAM_NAME"
-                requester.requestJson("PATCH", url, input={"value": team_name})
-                print(f"Updated TEAM_NAME variable to '{team_name}' in {full_repo_name}")
-            else:
-                print(f"Error creating TEAM_NAME variable: {str(e)}")
-    except Exception as var_error:
-        print(f"Failed to set TEAM_NAME variable in {full_repo_name}: {str(var_error)}")
+    """Set the TEAM_NAME repository variable.
 
+    Errors left after the governor's retries are raised, so the repository is reported as
+    failed and deployed again by the next run instead of running without its team name.
+    """
+    url = f"/repos/{full_repo_name}/actions/variables"
+    data = {"name": "TEAM_NAME", "value": team_name}
 
-def create_or_get_branch(target_repo, default_branch, feature_branch_name):
-    """Create or get feature branch with error handling."""
-    branch_created = False
-
-    # Check if branch exists
     try:
-        target_repo.get_branch(feature_branch_name)
-        print(f"Branch {feature_branch_name} already exists in {target_repo.full_name}")
-        return True, feature_branch_name
-    except GithubException as branch_error:
-        if branch_error.status != 404:
-            # Unexpected error
-            print(f"Error checking branch: {branch_error.data.get('message', str(branch_error))}")
-            return False, feature_branch_name
-
-    # Branch doesn't exist, create it
-    max_retries = 3
-    retry_count = 0
-    current_branch_name = feature_branch_name
-
-    while retry_count < max_retries and not branch_created:
-        try:
-            # Get the latest commit on default branch
-            try:
-                default_branch_ref = target_repo.get_git_ref(f"heads/{default_branch}")
-                base_sha = default_branch_ref.object.sha
-                print(f"Got base SHA {base_sha} from default branch reference")
-            except Exception as ref_error:
-                print(f"Couldn't get ref directly: {str(ref_error)}, trying commits API")
-                # Fallback to commits API
-                default_branch_commits = target_repo.get_commits(sha=default_branch, per_page=1)
-                if default_branch_commits.totalCount == 0:
-                    print(f"No commits found in {target_repo.full_name}'s {default_branch} branch")
-                    raise ValueError("No commits found in default branch") from ref_error
-
-                base_sha = default_branch_commits[0].sha
-
-            print(f"Creating branch {current_branch_name} from commit {base_sha} in {target_repo.full_name}")
-
-            # Generate a unique branch name to avoid conflicts
-            if retry_count > 0:
-                current_branch_name = f"{feature_branch_name}-{random.randint(1000, 9999)}"
-                print(f"Retry {retry_count}: Using unique branch name: {current_branch_name}")
-
-            # Create the branch
-            ref = f"refs/heads/{current_branch_name}"
-            target_repo.create_git_ref(ref=ref, sha=base_sha)
-            print(f"Successfully created branch {current_branch_name} in {target_repo.full_name}")
-            branch_created = True
-
-            # Small delay to ensure branch is available
-            time.sleep(3)
-
-        except GithubException as create_error:
-            error_message = str(create_error.data) if hasattr(create_error, "data") else str(create_error)
-
-            if create_error.status == 422 and "Reference already exists" in error_message:
-                print(f"Branch {current_branch_name} already exists in {target_repo.full_name}")
-                branch_created = True
-                break
-
-            if "Reference update failed" in error_message:
-                retry_count += 1
-                wait_time = 2 * retry_count  # Exponential backoff
-                print(f"Reference update failed. Retrying in {wait_time} seconds... ({retry_count}/{max_retries})")
-                print(f"Full error: {error_message}")
-                time.sleep(wait_time)
-            else:
-                print(f"Failed to create branch: {error_message}")
-                if retry_count < max_retries - 1:
-                    retry_count += 1
-                    wait_time = 2 * retry_count
-                    print(f"Retrying in {wait_time} seconds... ({retry_count}/{max_retries})")
-                    time.sleep(wait_time)
-                else:
-                    break
-
-        except Exception as general_error:
-            print(f"Unexpected error creating branch: {str(general_error)}")
-            if retry_count < max_retries - 1:
-                retry_count += 1
-                wait_time = 2 * retry_count
-                print(f"Retrying in {wait_time} seconds... ({retry_count}/{max_retries})")
-                time.sleep(wait_time)
+        requester.requestJsonAndCheck("POST", url, input=data)
+        print(f"Created TEAM_NAME variable with value '{team_name}' in {full_repo_name}")
+    except GithubException as e:
+        # If variable already exists (typically 409 or 422 error), update it
+        if e.status not in (409, 422) and "already exists" not in str(e).lower():
+            print(f"Failed to set TEAM_NAME variable in {full_repo_name}: {str(e)}")
+            raise
+        url = f"/repos/{full_repo_name}/actions/variables/TEAM_NAME"
+        requester.requestJsonAndCheck("PATCH", url, input={"value": team_name})
+        print(f"Updated TEAM_NAME variable to '{team_name}' in {full_repo_name}")
+
+
+@instrumented("get_team_name_variable")
+def get_team_name_variable(requester, full_repo_name):
+    """Get the current TEAM_NAME repository variable, or None if it is not set."""
+    url = f"/repos/{full_repo_name}/actions/variables/TEAM_NAME"
+    try:
+        _, data = requester.requestJsonAndCheck("GET", url)
+        return data.get("value")
+    except GithubException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def git_blob_sha(content):
+    """Compute the git blob SHA of some bytes, as GitHub reports it in trees."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class RolloutBundle:
+    """The files a rollout deploys, loaded once and shared read-only by every worker.
+
+    Files are read from the local checkout of the source repository when present and
+    fetched through the API otherwise, and the packaged review manager is built from
+    the runtime scripts. Their git blob SHAs are computed up front so each target only
+    needs to compare hashes.
+    """
+
+    # Files that are not UTF-8 text and are uploaded as base64 blobs
+    BINARY_PATHS = frozenset([APP_ARCHIVE_PATH])
+
+    def __init__(self, files):
+        self.files = MappingProxyType(dict(files))
+        self.blob_shas = MappingProxyType({path: git_blob_sha(content) for path, content in files.items()})
+        # Identifies this exact set of files, so journaled outcomes of another bundle are not trusted
+        self.fingerprint = hashlib.sha1(
+            "".join(f"{path}:{sha}\n" for path, sha in sorted(self.blob_shas.items())).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def load(cls, source_repo, source_root=SOURCE_ROOT):
+        """Load the workflow, runtime scripts and default REVIEWERS.yml for a rollout."""
+        files = {}
+        for path in [WORKFLOW_PATH] + RUNTIME_SCRIPT_PATHS + [REVIEWERS_PATH]:
+            local_path = os.path.join(source_root, path)
+            if os.path.isfile(local_path):
+                with open(local_path, "rb") as f:
+                    files[path] = f.read()
+                print(f"Loaded {path} from local checkout")
             else:
-                break
-
-    if not branch_created:
-        print(f"Failed to create branch after {max_retries} attempts. Skipping {target_repo.full_name}")
-
-    return branch_created, current_branch_name
-
-
-def handle_file_operations(target_repo, source_repo, feature_branch_name, default_branch):
-    """Handle creation and updating of workflow files."""
-    # Get file contents from source repo
-    workflow_content = source_repo.get_contents(".github/workflows/Pull-Request-Approval-Workflow.yml")
-    workflow_path = ".github/workflows/Pull-Request-Approval-Workflow.yml"
-
-    pr_script_content = source_repo.get_contents("scripts/pr_review_manager.py")
-    pr_script_path = "scripts/pr_review_manager.py"
-
-    reviewers_content = source_repo.get_contents("REVIEWERS.yml")
-    reviewers_path = "REVIEWERS.yml"
-
-    # Update or create workflow file
+                files[path] = source_repo.get_contents(path).decoded_content
+                print(f"Loaded {path} from {source_repo.full_name}")
+        files[APP_ARCHIVE_PATH] = build_review_app({path: files[path] for path in RUNTIME_SCRIPT_PATHS})
+        print(f"Built {APP_ARCHIVE_PATH} ({len(files[APP_ARCHIVE_PATH])} bytes)")
+        return cls(files)
+
+    @property
+    def deployed_paths(self):
+        """Paths that are always written to targets; REVIEWERS.yml is only added when missing."""
+        return [WORKFLOW_PATH] + RUNTIME_SCRIPT_PATHS + [APP_ARCHIVE_PATH]
+
+    def blob_content(self, path):
+        """The base64 content of a binary file, as the create blob endpoint takes it."""
+        return base64.b64encode(self.files[path]).decode("ascii")
+
+    def tree_element(self, path):
+        """Build the git tree entry that writes one bundled text file, or points at an uploaded binary blob."""
+        if path in self.BINARY_PATHS:
+            return InputGitTreeElement(path, "100644", "blob", sha=self.blob_shas[path])
+        return InputGitTreeElement(path, "100644", "blob", content=self.files[path].decode("utf-8"))
+
+
+@instrumented("is_up_to_date")
+def is_up_to_date(target_repo, bundle):
+    """Check with a single tree read whether the default branch already has the deployed files."""
     try:
-        existing_workflow = target_repo.get_contents(workflow_path, ref=feature_branch_name)
-        target_repo.update_file(
-            workflow_path,
-            "Update Pull Request Approval Workflow",
-            workflow_content.decoded_content.decode("utf-8"),
-            existing_workflow.sha,
-            branch=feature_branch_name,
-        )
-    except Exception:
-        target_repo.create_file(
-            workflow_path,
-            "Add Pull Request Approval Workflow",
-            workflow_content.decoded_content.decode("utf-8"),
-            branch=feature_branch_name,
-        )
-
-    # Handle PR review manager script
-    handle_pr_script(target_repo, pr_script_content, pr_script_path, feature_branch_name)
-
-    # Handle REVIEWERS.yml
-    handle_reviewers_file(target_repo, reviewers_content, reviewers_path, feature_branch_name, default_branch)
-
-
-def handle_pr_script(target_repo, pr_script_content, pr_script_path, feature_branch_name):
-    """Handle the PR review manager script file."""
+        # HEAD resolves to the default branch, so the repository itself does not need to be fetched
+        tree = target_repo.get_git_tree("HEAD", recursive=True)
+    except GithubException as e:
+        print(f"Could not read the default branch tree of {target_repo.full_name}: {str(e)}")
+        return False
+
+    target_shas = {element.path: element.sha for element in tree.tree}
+    if REVIEWERS_PATH not in target_shas:
+        return False
+    return all(target_shas.get(path) == bundle.blob_shas[path] for path in bundle.deployed_paths)
+
+
+def tree_has_file(target_repo, tree_sha, path):
+    """Check whether a top-level file exists in a git tree."""
+    return any(element.path == path for element in target_repo.get_git_tree(tree_sha).tree)
+
+
+@instrumented("check_reviewers_file")
+def reviewers_file_exists(target_repo, parent_commit, default_branch, default_sha):
+    """Check for REVIEWERS.yml on the commit being extended, then on the default branch."""
+    if tree_has_file(target_repo, parent_commit.tree.sha, REVIEWERS_PATH):
+        return True
+    if parent_commit.sha == default_sha:
+        return False
     try:
-        existing_script = target_repo.get_contents(pr_script_path, ref=feature_branch_name)
-        target_repo.update_file(
-            pr_script_path,
-            "Update PR Review Manager Script",
-            pr_script_content.decoded_content.decode("utf-8"),
-            existing_script.sha,
-            branch=feature_branch_name,
-        )
-        print(f"Updated PR Review Manager script in {target_repo.full_name}")
-    except Exception:
-        # Create scripts directory if it doesn't exist
+        target_repo.get_contents(REVIEWERS_PATH, ref=default_branch)
+        return True
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        return False
+
+
+def commit_deployment_files(target_repo, bundle, feature_branch_name, default_branch):
+    """Write every deployment file to the feature branch as one commit and move the branch once.
+
+    The branch is created directly at the new commit when it does not exist yet, so a failed
+    rollout never leaves a branch with only part of the files on it. Returns the branch head,
+    or None when the default branch already has identical files and there is nothing to deploy.
+    """
+    with operation("get_git_ref"):
+        default_sha = target_repo.get_git_ref(f"heads/{default_branch}").object.sha
         try:
-            target_repo.get_contents("scripts", ref=feature_branch_name)
-        except Exception:
-            print(f"Creating scripts directory in {target_repo.full_name}")
-            target_repo.create_file(
-                "scripts/.gitkeep",
-                "Create scripts directory",
-                "",
-                branch=feature_branch_name,
-            )
-
-        # Create the script file
-        target_repo.create_file(
-            pr_script_path,
-            "Add PR Review Manager Script",
-            pr_script_content.decoded_content.decode("utf-8"),
-            branch=feature_branch_name,
-        )
-        print(f"Added PR Review Manager script to {target_repo.full_name}")
-
-
-def handle_reviewers_file(target_repo, reviewers_content, reviewers_path, feature_branch_name, default_branch):
-    """Handle the REVIEWERS.yml file - only create if it doesn't exist."""
-    try:
-        # Check if REVIEWERS.yml exists in any branch
-        try:
-            # First check in feature branch
-            target_repo.get_contents(reviewers_path, ref=feature_branch_name)
-            print(f"REVIEWERS.yml already exists in feature branch of {target_repo.full_name}, preserving it")
-        except Exception:
-            # Then check in default branch
-            try:
-                target_repo.get_contents(reviewers_path, ref=default_branch)
-                print(f"REVIEWERS.yml already exists in default branch of {target_repo.full_name}, preserving it")
-            except Exception:
-                # File doesn't exist in either branch, create it
-                target_repo.create_file(
-                    reviewers_path,
-                    "Add REVIEWERS.yml",
-                    reviewers_content.decoded_content.decode("utf-8"),
-                    branch=feature_branch_name,
-                )
-                print(f"Added REVIEWERS.yml to {target_repo.full_name}")
-    except Exception as e:
-        print(f"Error handling REVIEWERS.yml: {str(e)}")
+            feature_ref = target_repo.get_git_ref(f"heads/{feature_branch_name}")
+            parent_sha = feature_ref.object.sha
+            print(f"Branch {feature_branch_name} already exists in {target_repo.full_name}")
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            feature_ref = None
+            parent_sha = default_sha
+    with operation("get_git_commit"):
+        parent_commit = target_repo.get_git_commit(parent_sha)
+
+    # Tree entries can only carry text, so binary files are uploaded as blobs first
+    for path in bundle.BINARY_PATHS:
+        with operation("create_git_blob"):
+            target_repo.create_git_blob(bundle.blob_content(path), "base64")
+
+    elements = [bundle.tree_element(path) for path in bundle.deployed_paths]
+    if reviewers_file_exists(target_repo, parent_commit, default_branch, default_sha):
+        print(f"REVIEWERS.yml already exists in {target_repo.full_name}, preserving it")
+    else:
+        elements.append(bundle.tree_element(REVIEWERS_PATH))
+
+    with operation("create_git_tree"):
+        tree = target_repo.create_git_tree(elements, base_tree=parent_commit.tree)
+    if tree.sha == parent_commit.tree.sha:
+        print(f"Deployment files are already up to date in {target_repo.full_name}")
+        return parent_sha if feature_ref is not None else None
+
+    with operation("create_git_commit"):
+        commit = target_repo.create_git_commit("Deploy Pull Request Approval Workflow", tree, [parent_commit])
+    if feature_ref is None:
+        with operation("create_git_ref"):
+            target_repo.create_git_ref(ref=f"refs/heads/{feature_branch_name}", sha=commit.sha)
+        print(f"Created branch {feature_branch_name} at {commit.sha} in {target_repo.full_name}")
+    else:
+        # Fast-forward only, so concurrent pushes to the branch are never overwritten
+        with operation("update_git_ref"):
+            feature_ref.edit(commit.sha, force=False)
+        print(f"Moved branch {feature_branch_name} to {commit.sha} in {target_repo.full_name}")
+    return commit.sha
 
 
-def create_or_check_pr(target_repo, org_name, feature_branch_name, default_branch, team_name):
-    """Create a pull request if one doesn't exist."""
+def deployment_pr_body(team_name):
+    """Build the body of the deployment pull request."""
     # Update PR body to include info about TEAM_NAME variable
     pr_body = "Automated PR to deploy the Pull Request Approval Workflow and related configuration\n\n"
     pr_body += f"## Team Configuration\n\n"
     pr_body += f"This workflow is configured to use team: `{team_name}`\n\n"
     pr_body += f"A repository variable `TEAM_NAME` has been set with this value.\n"
     pr_body += f"You can change this in repository settings if needed.\n\n"
+    return pr_body
+
+
+@instrumented("create_pull")
+def create_or_check_pr(target_repo, org_name, feature_branch_name, default_branch, team_name):
+    """Create a pull request if one doesn't exist."""
+    pr_body = deployment_pr_body(team_name)
 
     # Check if PR already exists
     open_prs = target_repo.get_pulls(state="open", head=f"{org_name}:{feature_branch_name}", base=default_branch)
@@ -245,48 +274,188 @@ def create_or_check_pr(target_repo, org_name, feature_branch_name, default_branc
         print(f"PR already exists in {target_repo.full_name}")
 
 
-def process_repository(g, source_repo, full_repo_name, team_name, org_name):
-    """Process a single repository."""
+@instrumented("process_repository")
+def process_repository(g, bundle, full_repo_name, team_name, org_name):
+    """Process a single repository and return a (status, detail) tuple for the rollout summary."""
     try:
         target_repo = g.get_repo(full_repo_name)
         print(f"Processing repository: {full_repo_name} with team: {team_name}")
 
+        # Repositories that already run the current files only need their TEAM_NAME checked
+        if is_up_to_date(target_repo, bundle):
+            if get_team_name_variable(g._Github__requester, full_repo_name) != team_name:
+                set_team_name_variable(g._Github__requester, full_repo_name, team_name)
+            print(f"{full_repo_name} already has the current workflow and scripts, skipping")
+            return "unchanged", "default branch already has the current files"
+
         # Set TEAM_NAME repository variable
         set_team_name_variable(g._Github__requester, full_repo_name, team_name)
 
         # Get default branch
-        default_branch = target_repo.default_branch
-        feature_branch_name = "feature/push_new_pr_update"
-
-        # Create or get feature branch
-        branch_created, feature_branch_name = create_or_get_branch(target_repo, default_branch, feature_branch_name)
-
-        if not branch_created:
-            return
+        with operation("get_repository"):
+            default_branch = target_repo.default_branch
+        feature_branch_name = FEATURE_BRANCH_NAME
 
-        # Handle file operations
-        handle_file_operations(target_repo, source_repo, feature_branch_name, default_branch)
+        # Commit all deployment files to the feature branch at once
+        head_sha = commit_deployment_files(target_repo, bundle, feature_branch_name, default_branch)
+        if head_sha is None:
+            return "unchanged", f"{default_branch} already has the current files"
 
         # Create or check for PR
         create_or_check_pr(target_repo, org_name, feature_branch_name, default_branch, team_name)
 
         print(f"Successfully deployed to {full_repo_name}")
+        return "deployed", f"branch {feature_branch_name} at {head_sha[:7]}"
     except Exception as e:
         print(f"Failed to deploy to {full_repo_name}: {str(e)}")
+        return "failed", str(e)
+
+
+def print_rollout_summary(results):
+    """Print one line per repository plus totals per status."""
+    print("\nRollout summary:")
+    width = max((len(full_repo_name) for full_repo_name, _, _ in results), default=0)
+    for full_repo_name, status, detail in sorted(results):
+        print(f"  {full_repo_name:<{width}}  {status:<8}  {detail}")
+
+    totals = {}
+    for _, status, _ in results:
+        totals[status] = totals.get(status, 0) + 1
+    print("Totals: " + ", ".join(f"{status}={count}" for status, count in sorted(totals.items())))
+
+
+def select_pending_targets(targets, journal, bundle_fingerprint, deadline, progress):
+    """Stream the targets that still need work, stopping once the time budget is used up.
+
+    Repositories the journal already completed with this bundle and team, and repeated
+    entries, are skipped. progress counts the skipped repositories and notes whether any
+    were left for the next run.
+    """
+    seen = set()
+    for full_repo_name, team_name in targets:
+        if full_repo_name in seen:
+            continue
+        seen.add(full_repo_name)
+        if journal is not None and journal.is_completed(full_repo_name, team_name, bundle_fingerprint):
+            progress["completed_earlier"] += 1
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            progress["deferred"] = True
+            return
+        yield full_repo_name, team_name
+
+
+def deploy_workflow_and_config(
+    target_repositories_input,
+    default_team_name="Cloud-Platform-Owners",
+    max_workers=DEFAULT_MAX_WORKERS,
+    http_cache=None,
+    engine="sync",
+    journal_path=None,
+    time_budget=None,
+):
+    """Deploy workflow and configuration to target repositories, several at a time.
+
+    target_repositories_input is a comma-separated list, a CSV or JSONL file, or an
+    organization query such as "org:topic=pr-review" (see iter_targets).
+    http_cache is "memory" or a SQLite path for a conditional-request cache of GET responses.
+    engine "async" deploys with asyncio and aiohttp instead of PyGithub worker threads.
+    journal_path keeps a checkpoint of per-repository outcomes, so a re-run only deploys
+    to failed and pending repositories. time_budget, in seconds, stops starting new
+    repositories once it is used up, leaving them for the next run.
+    """
+    started = time.monotonic()
+    # Workers share one client, so it needs thread-safe connections and one process-wide governor
+    governor = install_pooled_transport()
+    instrumentation = instrumentation_from_env()
+    if instrumentation is not None:
+        add_transport_hook(instrumentation)
+    response_cache = open_response_cache(http_cache, os.getenv("GITHUB_HTTP_CACHE_SCOPE")) if http_cache else None
+    set_response_cache(response_cache)
+
+    journal = None
+    # Hooks are process-wide, so remove them again for callers that run several rollouts
+    try:
+        token = os.getenv("GITHUB_TOKEN")
+        # Lazy objects let up-to-date repositories be checked without fetching the repository itself
+        g = Github(token, base_url=api_base_url(), pool_size=max_workers, lazy=True)
+        source_repo = g.get_repo(os.getenv("GITHUB_REPOSITORY"))
+        org_name = os.getenv("GITHUB_REPOSITORY").split("/")[0]
+        with operation("load_bundle"):
+            bundle = RolloutBundle.load(source_repo)
+
+        if journal_path:
+            journal = RolloutJournal.load(journal_path)
+        deadline = started + time_budget if time_budget else None
+        progress = {"completed_earlier": 0, "deferred": False}
+        # Targets are streamed, so large inventories are never held in memory as a whole
+        repositories = select_pending_targets(
+            iter_targets(g, target_repositories_input, org_name, default_team_name),
+            journal,
+            bundle.fingerprint,
+            deadline,
+            progress,
+        )
 
+        def record(full_repo_name, team_name, status, detail):
+            if journal is not None:
+                journal.record(full_repo_name, team_name, bundle.fingerprint, status, detail)
 
-def deploy_workflow_and_config(target_repositories_input, default_team_name="Cloud-Platform-Owners"):
-    """Deploy workflow and configuration to target repositories."""
-    token = os.getenv("GITHUB_TOKEN")
-    g = Github(token)
-    source_repo = g.get_repo(os.getenv("GITHUB_REPOSITORY"))
-    org_name = os.getenv("GITHUB_REPOSITORY").split("/")[0]
+        if engine == "async":
+            # Imported here so the default engine never loads aiohttp
+            from async_deploy import deploy_repositories_async
 
-    # Parse repositories and team names
-    repositories = parse_repositories(target_repositories_input, org_name, default_team_name)
+            hooks = [governor] + ([instrumentation] if instrumentation is not None else [])
+            results = asyncio.run(
+                deploy_repositories_async(token, bundle, repositories, org_name, max_workers, hooks, record)
+            )
+        else:
 
-    for full_repo_name, team_name in repositories:
-        process_repository(g, source_repo, full_repo_name, team_name, org_name)
+            def deploy(full_repo_name, team_name):
+                status, detail = process_repository(g, bundle, full_repo_name, team_name, org_name)
+                record(full_repo_name, team_name, status, detail)
+                return full_repo_name, status, detail
+
+            # Keep a bounded number of repositories queued, so targets are only read as workers free up
+            in_flight = threading.BoundedSemaphore(max(1, max_workers) * 2)
+            futures = []
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for full_repo_name, team_name in repositories:
+                    in_flight.acquire()
+                    future = executor.submit(deploy, full_repo_name, team_name)
+                    future.add_done_callback(lambda _: in_flight.release())
+                    futures.append(future)
+            results = [future.result() for future in futures]
+
+        print_rollout_summary(results)
+        if progress["completed_earlier"]:
+            print(f"Skipped {progress['completed_earlier']} repositories completed by earlier runs of this rollout")
+        if progress["deferred"]:
+            print(f"Time budget of {time_budget}s used up, re-run with the same journal to deploy to the rest")
+    finally:
+        if journal is not None:
+            journal.close()
+        if instrumentation is not None:
+            remove_transport_hook(instrumentation)
+        if response_cache is not None:
+            set_response_cache(None)
+            response_cache.print_stats()
+            response_cache.backend.close()
+    report_from_env(instrumentation)
+    return results
+
+
+def iter_targets(g, target_repositories_input, org_name, default_team_name):
+    """Stream (repo_name, team_name) tuples from a comma-separated list, a CSV or JSONL file, or an org query."""
+    target_repositories_input = target_repositories_input.strip()
+    if target_repositories_input.startswith(ORG_QUERY_PREFIX):
+        filters = parse_org_query(target_repositories_input)
+        print(f"Selecting repositories of {org_name} with topic {filters['topic']} and team {filters['team']}")
+        return iter_org_repositories(g, org_name, default_team_name, filters["topic"], filters["team"])
+    if target_repositories_input.endswith(TARGET_FILE_EXTENSIONS):
+        print(f"Reading target repositories from {target_repositories_input}")
+        return iter_targets_from_file(target_repositories_input, org_name, default_team_name)
+    return iter(parse_repositories(target_repositories_input, org_name, default_team_name))
 
 
 def parse_repositories(target_repositories_input, org_name, default_team_name):
@@ -315,11 +484,37 @@ def parse_repositories(target_repositories_input, org_name, default_team_name):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: deploy_pr_workflow.py <comma-separated list of target repositories> [default_team_name]")
+        print(
+            "Usage: deploy_pr_workflow.py <comma-separated list of target repositories, "
+            "a .csv or .jsonl file, or org:topic=NAME,team=SLUG> [default_team_name]"
+        )
         sys.exit(1)
 
     default_team_name = "Cloud-Platform-Owners"
     if len(sys.argv) > 2:
         default_team_name = sys.argv[2]
 
-    deploy_workflow_and_config(sys.argv[1], default_team_name)
+    max_workers = int(os.getenv("DEPLOY_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+
+    if os.getenv("DEPLOY_MODE", "deploy").lower() == "status":
+        # Read-only audit of the same targets; imported here because it imports this module
+        from rollout_status import DEFAULT_STATUS_PATH, report_rollout_status
+
+        report_rollout_status(
+            sys.argv[1],
+            default_team_name,
+            max_workers,
+            os.getenv("GITHUB_HTTP_CACHE"),
+            os.getenv("DEPLOY_STATUS_PATH") or DEFAULT_STATUS_PATH,
+        )
+        sys.exit(0)
+
+    deploy_workflow_and_config(
+        sys.argv[1],
+        default_team_name,
+        max_workers,
+        os.getenv("GITHUB_HTTP_CACHE"),
+        os.getenv("DEPLOY_ENGINE", "sync").lower(),
+        os.getenv("DEPLOY_JOURNAL_PATH"),
+        float(os.getenv("DEPLOY_TIME_BUDGET") or 0) or None,
+    )
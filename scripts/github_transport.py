@@ -0,0 +1,170 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, Requester
+
+from rate_limit import RequestGovernor, governor_from_env
+
+# api_base_url lives with the dependency-free client and is imported from here by the PyGithub scripts
+from rest_client import api_base_url  # noqa: F401
+
+# Large enough for the thread pools used by the review manager and the deployer
+DEFAULT_POOL_SIZE = 32
+
+_sessions: Dict[Tuple[str, str, int], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# Objects with before_request(verb, url) and after_response(verb, url, status, headers) methods
+_hooks: List = []
+
+# Object with prepare(verb, url, headers) and complete(prepared, response) methods, see http_cache.ResponseCache
+_response_cache = None
+
+# Paces and retries every request made through the pooled connections, see rate_limit.RequestGovernor
+_governor: Optional[RequestGovernor] = None
+
+
+def add_transport_hook(hook):
+    """Register a hook that sees every request made through the pooled connections."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_transport_hook(hook):
+    """Unregister a hook added with add_transport_hook."""
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def set_response_cache(cache):
+    """Serve GET requests made through the pooled connections from a conditional-request cache, or None to stop."""
+    global _response_cache
+    _response_cache = cache
+
+
+def _shared_session(protocol: str, host: str, port: int, pool_size) -> requests.Session:
+    """Get the process-wide keep-alive session for a host, creating it on first use."""
+    key = (protocol, host, port)
+    with _sessions_lock:
+        if key not in _sessions:
+            session = requests.Session()
+            session.auth = Requester.noopAuth
+            # No urllib3 retries: the governor decides what is sent again, and writes are not repeated blindly
+            adapter = requests.adapters.HTTPAdapter(
+                max_retries=requests.adapters.DEFAULT_RETRIES,
+                pool_connections=pool_size or DEFAULT_POOL_SIZE,
+                pool_maxsize=pool_size or DEFAULT_POOL_SIZE,
+            )
+            session.mount(f"{protocol}://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
+class _HookedConnection:
+    """Runs the governor, the registered transport hooks and the response cache around each request."""
+
+    def getresponse(self):
+        verb, url = self.verb, self.url
+        cache = _response_cache
+        prepared = None
+        if cache is not None and not self.stream:
+            self.headers = dict(self.headers)
+            prepared = cache.prepare(verb, url, self.headers)
+        # Uploads read from a file cannot be sent a second time
+        governor = _governor if self.input is None or isinstance(self.input, (str, bytes)) else None
+        hooks = ([governor] if governor is not None else []) + list(_hooks)
+
+        attempt = 0
+        while True:
+            for hook in hooks:
+                hook.before_request(verb, url)
+            try:
+                try:
+                    response = super().getresponse()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    delay = governor.retry_delay(verb, url, None, {}, attempt, self.input) if governor else None
+                    if delay is None:
+                        raise
+                else:
+                    for hook in hooks:
+                        hook.after_response(verb, url, response.status, response.headers)
+                    if response.status < 400 or governor is None:
+                        break
+                    # Only read for 403s, where the message tells a secondary limit from a permission error
+                    response_body = response.read() if response.status == 403 else None
+                    delay = governor.retry_delay(
+                        verb, url, response.status, response.headers, attempt, self.input, response_body
+                    )
+                    if delay is None:
+                        break
+            except BaseException:
+                # Whatever cut the request short, it must not keep holding the circuit breaker's probe
+                if governor is not None:
+                    governor.abandon()
+                raise
+            print(f"Debug: Retrying {verb} {url} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+        if prepared is not None:
+            response = cache.complete(prepared, response)
+        return response
+
+
+class PooledHTTPSConnection(_HookedConnection, HTTPSRequestsConnectionClass):
+    """PyGithub connection that is safe to use from several threads.
+
+    PyGithub keeps one connection object per client and stores the pending request on it,
+    so concurrent calls overwrite each other. Once injected, PyGithub creates one of these
+    per request instead, and they all share a pooled keep-alive session per host.
+    """
+
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.port = port if port else 443
+        self.host = host
+        self.protocol = "https"
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.retry = retry
+        self.pool_size = pool_size or DEFAULT_POOL_SIZE
+        self.session = _shared_session(self.protocol, host, self.port, pool_size)
+
+    def close(self):
+        # The session is shared with other requests, keep it open
+        pass
+
+
+class PooledHTTPConnection(_HookedConnection, HTTPRequestsConnectionClass):
+    """Plain HTTP counterpart of PooledHTTPSConnection, used for local GitHub stand-ins."""
+
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.port = port if port else 80
+        self.host = host
+        self.protocol = "http"
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.retry = retry
+        self.pool_size = pool_size or DEFAULT_POOL_SIZE
+        self.session = _shared_session(self.protocol, host, self.port, pool_size)
+
+    def close(self):
+        pass
+
+
+_installed = False
+
+
+def install_pooled_transport() -> RequestGovernor:
+    """Make every PyGithub client in this process use the thread-safe pooled connections.
+
+    Returns the process-wide governor that paces and retries their requests, for clients
+    that do not go through PyGithub, such as the async engines, to share as a hook.
+    """
+    global _installed, _governor
+    if not _installed:
+        _governor = governor_from_env()
+        Requester.injectConnectionClasses(PooledHTTPConnection, PooledHTTPSConnection)
+        _installed = True
+    return _governor
@@ -0,0 +1,368 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+CONFIG_PATH = "REVIEWERS.yml"
+STATUS_CONTEXT = "pr-review-requirements"
+TEAM_MEMBERS_PAGE_SIZE = 100
+TEAMS_PAGE_SIZE = 100
+REVIEWS_PAGE_SIZE = 100
+
+PULL_REQUEST_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $configPath: String!, $statusContext: String!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      isCrossRepository
+      headRefName
+      headRefOid
+      baseRefName
+      reviews {
+        totalCount
+      }
+      reviewRequests(first: 100) {
+        nodes {
+          requestedReviewer {
+            ... on Team {
+              slug
+            }
+          }
+        }
+      }
+      assignees(first: 100) {
+        nodes {
+          login
+        }
+      }
+      commits(last: 1) {
+        nodes {
+          commit {
+            status {
+              context(name: $statusContext) {
+                state
+              }
+            }
+          }
+        }
+      }
+      latestOpinionatedReviews(first: 100) {
+        nodes {
+          state
+          author {
+            login
+          }
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+      headRef {
+        target {
+          ... on Commit {
+            file(path: $configPath) {
+              object {
+                ... on Blob {
+                  text
+                }
+              }
+            }
+          }
+        }
+      }
+      baseRef {
+        branchProtectionRule {
+          dismissesStaleReviews
+        }
+        target {
+          ... on Commit {
+            file(path: $configPath) {
+              object {
+                ... on Blob {
+                  text
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+LATEST_REVIEWS_QUERY = f"""
+query($owner: String!, $name: String!, $number: Int!, $after: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequest(number: $number) {{
+      latestOpinionatedReviews(first: {REVIEWS_PAGE_SIZE}, after: $after) {{
+        nodes {{
+          state
+          author {{
+            login
+          }}
+        }}
+        pageInfo {{
+          hasNextPage
+          endCursor
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+class PullRequestSnapshot(NamedTuple):
+    """Everything process_pull_request reads about a PR, fetched in one GraphQL query."""
+
+    number: int
+    head_ref: str
+    head_sha: str
+    base_ref: str
+    review_count: int
+    # (login, state) of each author's latest APPROVED / CHANGES_REQUESTED review
+    latest_reviews: List[tuple]
+    dismiss_stale_reviews: bool
+    head_config: Optional[str]
+    base_config: Optional[str]
+    requested_team_slugs: List[str]
+    assignees: List[str]
+    # Lower-case state of the pr-review-requirements status on the head commit, if set
+    review_status: Optional[str]
+
+
+def _file_text(ref: Optional[Dict]) -> Optional[str]:
+    """Extract a blob's text from a ref { target { file { object } } } selection."""
+    try:
+        return ref["target"]["file"]["object"]["text"]
+    except (KeyError, TypeError):
+        return None
+
+
+ORGANIZATION_TEAMS_QUERY = f"""
+query($org: String!, $after: String) {{
+  organization(login: $org) {{
+    teams(first: {TEAMS_PAGE_SIZE}, after: $after) {{
+      nodes {{
+        slug
+        databaseId
+        parentTeam {{
+          slug
+        }}
+        members(first: {TEAM_MEMBERS_PAGE_SIZE}, membership: IMMEDIATE) {{
+          nodes {{
+            login
+          }}
+          pageInfo {{
+            hasNextPage
+            endCursor
+          }}
+        }}
+      }}
+      pageInfo {{
+        hasNextPage
+        endCursor
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def _team_members_query(team_count: int, immediate: bool = False) -> str:
+    """Build a query that pages through the members of several teams at once using aliases.
+
+    immediate leaves out the members that only belong to a child team.
+    """
+    variables = ["$org: String!"]
+    selections = []
+    membership = ", membership: IMMEDIATE" if immediate else ""
+    for i in range(team_count):
+        variables.append(f"$slug{i}: String!")
+        variables.append(f"$after{i}: String")
+        selections.append(
+            f"""
+    team{i}: team(slug: $slug{i}) {{
+      members(first: {TEAM_MEMBERS_PAGE_SIZE}, after: $after{i}{membership}) {{
+        nodes {{
+          login
+        }}
+        pageInfo {{
+          hasNextPage
+          endCursor
+        }}
+      }}
+    }}"""
+        )
+    return f"query({', '.join(variables)}) {{\n  organization(login: $org) {{{''.join(selections)}\n  }}\n}}\n"
+
+
+class GraphQLLoader:
+    """Batch reader for PR review data over the GitHub GraphQL API."""
+
+    def __init__(self, gh, repository: str):
+        self.requester = gh.requester
+        self.owner, self.name = repository.split("/", 1)
+
+    def load_pull_request(self, pr_number: int) -> PullRequestSnapshot:
+        """Fetch head/base, latest reviews, branch protection and REVIEWERS.yml for a PR."""
+        _, data = self.requester.graphql_query(
+            PULL_REQUEST_QUERY,
+            {
+                "owner": self.owner,
+                "name": self.name,
+                "number": pr_number,
+                "configPath": CONFIG_PATH,
+                "statusContext": STATUS_CONTEXT,
+            },
+        )
+        pr = data["data"]["repository"]["pullRequest"]
+        base_ref = pr.get("baseRef") or {}
+        protection = base_ref.get("branchProtectionRule") or {}
+
+        latest_reviews = self._latest_reviews(pr_number, pr["latestOpinionatedReviews"])
+
+        requested_team_slugs = [
+            node["requestedReviewer"]["slug"]
+            for node in pr["reviewRequests"]["nodes"]
+            if (node.get("requestedReviewer") or {}).get("slug")
+        ]
+        review_status = None
+        for node in pr["commits"]["nodes"]:
+            context = (node["commit"].get("status") or {}).get("context")
+            if context:
+                review_status = context["state"].lower()
+
+        print(f"Debug: Loaded PR #{pr_number} with {len(latest_reviews)} latest reviews via GraphQL")
+        return PullRequestSnapshot(
+            number=pr_number,
+            head_ref=pr["headRefName"],
+            head_sha=pr["headRefOid"],
+            base_ref=pr["baseRefName"],
+            review_count=pr["reviews"]["totalCount"],
+            latest_reviews=latest_reviews,
+            dismiss_stale_reviews=bool(protection.get("dismissesStaleReviews", False)),
+            # Config from a fork is never trusted, matching the REST lookup against this repository
+            head_config=None if pr["isCrossRepository"] else _file_text(pr.get("headRef")),
+            base_config=_file_text(base_ref),
+            requested_team_slugs=requested_team_slugs,
+            assignees=[node["login"] for node in pr["assignees"]["nodes"]],
+            review_status=review_status,
+        )
+
+    def _latest_reviews(self, pr_number: int, page: Dict) -> List[tuple]:
+        """Collect (login, state) pairs from the first page of latest reviews, paging through the rest."""
+        latest_reviews = []
+        while True:
+            for review in page["nodes"]:
+                # Reviews by deleted accounts have no author
+                if review.get("author"):
+                    latest_reviews.append((review["author"]["login"], review["state"]))
+            if not page["pageInfo"]["hasNextPage"]:
+                return latest_reviews
+            _, data = self.requester.graphql_query(
+                LATEST_REVIEWS_QUERY,
+                {
+                    "owner": self.owner,
+                    "name": self.name,
+                    "number": pr_number,
+                    "after": page["pageInfo"]["endCursor"],
+                },
+            )
+            page = data["data"]["repository"]["pullRequest"]["latestOpinionatedReviews"]
+
+    def load_team_members(self, org_login: str, team_slugs: List[str]) -> Dict[str, List[str]]:
+        """Fetch the member logins of several teams, batching every page across all teams."""
+        members: Dict[str, List[str]] = {slug: [] for slug in team_slugs}
+        cursors: Dict[str, Optional[str]] = {slug: None for slug in team_slugs}
+        _load_member_pages(self.requester, org_login, members, cursors)
+        print(f"Debug: Loaded members of {len(members)} teams via GraphQL")
+        return members
+
+
+def _load_member_pages(
+    requester,
+    org_login: str,
+    members: Dict[str, List],
+    cursors: Dict[str, Optional[str]],
+    immediate: bool = False,
+    missing: Optional[List[str]] = None,
+):
+    """Add the remaining member pages of teams to members, starting at each team's cursor, all teams per query.
+
+    Teams that do not exist are added to missing when it is given.
+    """
+    pending = list(dict.fromkeys(cursors))
+    while pending:
+        variables = {"org": org_login}
+        for i, slug in enumerate(pending):
+            variables[f"slug{i}"] = slug
+            variables[f"after{i}"] = cursors[slug]
+        _, data = requester.graphql_query(_team_members_query(len(pending), immediate), variables)
+        organization = data["data"]["organization"] or {}
+
+        next_pending = []
+        for i, slug in enumerate(pending):
+            team = organization.get(f"team{i}")
+            if team is None:
+                print(f"Warning: Team {slug} not found")
+                if missing is not None:
+                    missing.append(slug)
+                continue
+            page = team["members"]
+            members[slug].extend(node["login"] for node in page["nodes"])
+            if page["pageInfo"]["hasNextPage"]:
+                cursors[slug] = page["pageInfo"]["endCursor"]
+                next_pending.append(slug)
+        pending = next_pending
+
+
+def load_teams_members(
+    requester, org_login: str, team_slugs: List[str], immediate: bool = False
+) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Fetch the members of some teams of an organization, returning them and the slugs of teams not found.
+
+    immediate leaves out the members that only belong to a child team.
+    """
+    members: Dict[str, List] = {slug: [] for slug in team_slugs}
+    missing: List[str] = []
+    _load_member_pages(requester, org_login, members, {slug: None for slug in team_slugs}, immediate, missing)
+    for slug in missing:
+        members.pop(slug, None)
+    return members, missing
+
+
+def load_organization_teams(requester, org_login: str) -> List[Dict]:
+    """Fetch every team of an organization with its id, parent team and direct members.
+
+    Teams come a hundred at a time with their first hundred members, and the members of
+    larger teams are paged afterwards, so most organizations need only a few queries.
+    The result is what MembershipIndex.replace_teams takes.
+    """
+    teams: List[Dict] = []
+    members: Dict[str, List] = {}
+    cursors: Dict[str, Optional[str]] = {}
+    after = None
+    while True:
+        _, data = requester.graphql_query(ORGANIZATION_TEAMS_QUERY, {"org": org_login, "after": after})
+        page = data["data"]["organization"]["teams"]
+        for node in page["nodes"]:
+            slug = node["slug"]
+            members[slug] = [member["login"] for member in node["members"]["nodes"]]
+            teams.append(
+                {
+                    "slug": slug,
+                    "id": node["databaseId"],
+                    "parent": (node.get("parentTeam") or {}).get("slug"),
+                    "direct": members[slug],
+                }
+            )
+            if node["members"]["pageInfo"]["hasNextPage"]:
+                cursors[slug] = node["members"]["pageInfo"]["endCursor"]
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        after = page["pageInfo"]["endCursor"]
+
+    if cursors:
+        _load_member_pages(requester, org_login, members, cursors, immediate=True)
+    print(f"Debug: Loaded {len(teams)} teams of {org_login} via GraphQL")
+    return teams
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import requests
+from github.Requester import RequestsResponse
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Headers that describe the cached representation; everything else is taken from the 304
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link", "X-GitHub-Media-Type")
+
+
+class MemoryCacheBackend:
+    """In-process LRU store for cached responses, bounded by entry count and total body size."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous["body"])
+            self._entries[key] = entry
+            self._size += len(entry["body"])
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted["body"])
+
+    def close(self):
+        pass
+
+
+class SQLiteCacheBackend:
+    """On-disk LRU store for cached responses, so validators survive between runs."""
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, headers TEXT, body BLOB, "
+            "size INTEGER, last_used REAL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return {"etag": row[0], "last_modified": row[1], "headers": json.loads(row[2]), "body": bytes(row[3])}
+
+    def set(self, key: str, entry: Dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    entry["etag"],
+                    entry["last_modified"],
+                    json.dumps(entry["headers"]),
+                    entry["body"],
+                    len(entry["body"]),
+                    time.time(),
+                ),
+            )
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            while count > self.max_entries or size > self.max_bytes:
+                row = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+                if row is None:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+                count, size = count - 1, size - row[1]
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    """Conditional-request cache for GET responses made through the pooled transport.
+
+    Responses carrying an ETag or Last-Modified header are stored, and the next GET of the
+    same URL is sent with If-None-Match / If-Modified-Since. GitHub answers an unchanged
+    resource with a 304, which does not count against the rate limit, and the stored body is
+    returned in its place. Entries are keyed by URL, Accept header and a hash of the
+    Authorization header, so responses are never shared between identities; scope replaces
+    the authorization hash when tokens rotate but the identity stays the same.
+    """
+
+    def __init__(self, backend=None, scope: Optional[str] = None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.scope = scope
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def _key(self, url: str, headers: Dict[str, str]) -> str:
+        identity = self.scope
+        if identity is None:
+            identity = hashlib.sha256(headers.get("Authorization", "").encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{identity}\n{headers.get('Accept', '')}\n{url}".encode("utf-8")).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def prepare(self, verb: str, url: str, headers: Dict[str, str]) -> Optional[Tuple[str, Optional[Dict]]]:
+        """Add validators for a cached GET to its headers, returning what complete() needs."""
+        if verb.upper() != "GET":
+            return None
+        key = self._key(url, headers)
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count("misses")
+            return key, None
+
+        self._count("hits")
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return key, entry
+
+    def complete(self, prepared: Tuple[str, Optional[Dict]], response: RequestsResponse) -> RequestsResponse:
+        """Replay the stored body for a 304, or store a fresh 200 response for revalidation."""
+        key, entry = prepared
+        if response.status == 304 and entry is not None:
+            self._count("not_modified")
+            replay = requests.Response()
+            replay.status_code = 200
+            replay.headers = CaseInsensitiveDict(entry["headers"])
+            # Rate limit and date headers come from the 304 itself
+            replay.headers.update(response.headers)
+            replay._content = entry["body"]
+            replay.encoding = "utf-8"
+            return RequestsResponse(replay)
+
+        if response.status == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                stored_headers = {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers}
+                self.backend.set(
+                    key,
+                    {
+                        "etag": etag,
+                        "last_modified": last_modified,
+                        "headers": stored_headers,
+                        "body": response.response.content,
+                    },
+                )
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """Get the counters: GETs sent with a stored validator, GETs without one, and 304 answers."""
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+    def print_stats(self):
+        """Print the counters in the scripts' debug log format."""
+        print(f"Debug: HTTP cache: {self.hits} hits ({self.not_modified} not modified), {self.misses} misses")
+
+
+def open_response_cache(spec: str, scope: Optional[str] = None) -> ResponseCache:
+    """Create a cache from a setting: "memory" for an in-process cache, anything else is a SQLite path."""
+    if spec == "memory":
+        return ResponseCache(MemoryCacheBackend(), scope)
+    return ResponseCache(SQLiteCacheBackend(spec), scope)
@@ -0,0 +1,278 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Upper bounds of the operation duration histogram, in seconds
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UNATTRIBUTED = "(unattributed)"
+# Statuses worth sending again; a repeat of the same request after one of these counts as a retry
+_RETRYABLE_STATUSES = {403, 409, 422, 429, 500, 502, 503, 504}
+
+
+class _Invocation:
+    """One running logical operation; requests made while it is innermost are attributed to it."""
+
+    __slots__ = ("name", "failed_requests")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failed_requests = set()
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("github_operation", default=None)
+
+
+class OperationStats:
+    """Counters of one logical operation across a run."""
+
+    def __init__(self):
+        self.calls = 0
+        self.durations: List[float] = []
+        self.bucket_counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.requests = 0
+        self.statuses: Dict[int, int] = {}
+        self.retries = 0
+        self.rate_limit_remaining: Optional[int] = None
+
+    def percentile(self, fraction: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "duration_seconds": {
+                "total": sum(self.durations),
+                "p50": self.percentile(0.5),
+                "p95": self.percentile(0.95),
+                "max": max(self.durations, default=0.0),
+                "buckets": {str(bound): count for bound, count in zip(DURATION_BUCKETS + ("+Inf",), self._cumulative())},
+            },
+            "requests": self.requests,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "retries": self.retries,
+            "rate_limit_remaining": self.rate_limit_remaining,
+        }
+
+    def _cumulative(self) -> List[int]:
+        totals, running = [], 0
+        for count in self.bucket_counts:
+            running += count
+            totals.append(running)
+        return totals
+
+
+class Instrumentation:
+    """Per-operation call counts, durations, request statuses, retries and rate-limit budget.
+
+    Operations are named with the operation() context manager or the instrumented()
+    decorator. Registered as a transport hook, every HTTP request is attributed to the
+    innermost running operation of its thread or asyncio task, so the run summary shows
+    which step used the time and which used the rate limit.
+    """
+
+    def __init__(self):
+        self.operations: Dict[str, OperationStats] = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def _stats(self, name: str) -> OperationStats:
+        if name not in self.operations:
+            self.operations[name] = OperationStats()
+        return self.operations[name]
+
+    def record_duration(self, name: str, seconds: float):
+        with self._lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.durations.append(seconds)
+            bucket = next((i for i, bound in enumerate(DURATION_BUCKETS) if seconds <= bound), len(DURATION_BUCKETS))
+            stats.bucket_counts[bucket] += 1
+
+    def before_request(self, verb: str, url: str):
+        """Nothing to do before a request; operations are timed by operation() itself."""
+
+    def after_response(self, verb: str, url: str, status: int, headers):
+        """Count a response against the innermost running operation."""
+        invocation = _current.get()
+        remaining = headers.get("x-ratelimit-remaining") if headers is not None else None
+        with self._lock:
+            stats = self._stats(invocation.name if invocation is not None else UNATTRIBUTED)
+            stats.requests += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if invocation is not None:
+                request = (verb, url)
+                if request in invocation.failed_requests:
+                    stats.retries += 1
+                    invocation.failed_requests.discard(request)
+                if status in _RETRYABLE_STATUSES:
+                    invocation.failed_requests.add(request)
+            if remaining is not None:
+                remaining = int(float(remaining))
+                if stats.rate_limit_remaining is None or remaining < stats.rate_limit_remaining:
+                    stats.rate_limit_remaining = remaining
+
+    def to_dict(self) -> Dict:
+        """Snapshot every operation's counters as plain data."""
+        with self._lock:
+            return {
+                "elapsed_seconds": time.time() - self.started_at,
+                "operations": {name: stats.to_dict() for name, stats in sorted(self.operations.items())},
+            }
+
+    def print_summary(self):
+        """Print one row per operation, busiest first."""
+        snapshot = self.to_dict()
+        rows = sorted(snapshot["operations"].items(), key=lambda item: -item[1]["duration_seconds"]["total"])
+        width = max([len(name) for name, _ in rows] + [len("operation")])
+        print(f"\nGitHub API usage ({snapshot['elapsed_seconds']:.2f}s):")
+        print(
+            f"  {'operation':<{width}}  {'calls':>5}  {'total s':>8}  {'p50 ms':>7}  {'p95 ms':>7}  "
+            f"{'requests':>8}  {'errors':>6}  {'retries':>7}  {'remaining':>9}"
+        )
+        for name, stats in rows:
+            duration = stats["duration_seconds"]
+            errors = sum(count for status, count in stats["statuses"].items() if int(status) >= 400)
+            remaining = stats["rate_limit_remaining"]
+            print(
+                f"  {name:<{width}}  {stats['calls']:>5}  {duration['total']:>8.2f}  {duration['p50'] * 1000:>7.0f}  "
+                f"{duration['p95'] * 1000:>7.0f}  {stats['requests']:>8}  {errors:>6}  {stats['retries']:>7}  "
+                f"{remaining if remaining is not None else '-':>9}"
+            )
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Wrote API usage metrics to {path}")
+
+    def to_openmetrics(self) -> str:
+        """Render the counters in the OpenMetrics text format."""
+        snapshot = self.to_dict()["operations"]
+        lines = [
+            "# TYPE github_operation_duration_seconds histogram",
+            "# HELP github_operation_duration_seconds Wall-clock time of each logical operation.",
+        ]
+        for name, stats in snapshot.items():
+            label = _label(name)
+            duration = stats["duration_seconds"]
+            for bound, count in duration["buckets"].items():
+                lines.append(f'github_operation_duration_seconds_bucket{{operation="{label}",le="{bound}"}} {count}')
+            lines.append(f'github_operation_duration_seconds_sum{{operation="{label}"}} {duration["total"]}')
+            lines.append(f'github_operation_duration_seconds_count{{operation="{label}"}} {stats["calls"]}')
+
+        lines += [
+            "# TYPE github_operation_requests counter",
+            "# HELP github_operation_requests GitHub API requests per operation and response status.",
+        ]
+        for name, stats in snapshot.items():
+            for status, count in stats["statuses"].items():
+                lines.append(f'github_operation_requests_total{{operation="{_label(name)}",status="{status}"}} {count}')
+
+        lines += [
+            "# TYPE github_operation_retries counter",
+            "# HELP github_operation_retries Requests repeated after a failed attempt.",
+        ]
+        for name, stats in snapshot.items():
+            lines.append(f'github_operation_retries_total{{operation="{_label(name)}"}} {stats["retries"]}')
+
+        lines += [
+            "# TYPE github_rate_limit_remaining gauge",
+            "# HELP github_rate_limit_remaining Lowest X-RateLimit-Remaining seen by each operation.",
+        ]
+        for name, stats in snapshot.items():
+            if stats["rate_limit_remaining"] is not None:
+                lines.append(f'github_rate_limit_remaining{{operation="{_label(name)}"}} {stats["rate_limit_remaining"]}')
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+        print(f"Wrote API usage metrics to {path}")
+
+    def report(self, json_path: Optional[str] = None, openmetrics_path: Optional[str] = None):
+        """Print the summary table and write the requested metric files."""
+        self.print_summary()
+        if json_path:
+            self.write_json(json_path)
+        if openmetrics_path:
+            self.write_openmetrics(openmetrics_path)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+_active: Optional[Instrumentation] = None
+
+
+def enable_instrumentation() -> Instrumentation:
+    """Start recording operations in this process and return the recorder."""
+    global _active
+    if _active is None:
+        _active = Instrumentation()
+    return _active
+
+
+def instrumentation_from_env() -> Optional[Instrumentation]:
+    """Enable instrumentation when METRICS_ENABLED or a metrics output path is set."""
+    if (
+        os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+        or os.environ.get("METRICS_JSON_PATH")
+        or os.environ.get("METRICS_OPENMETRICS_PATH")
+    ):
+        return enable_instrumentation()
+    return None
+
+
+def report_from_env(instrumentation: Optional[Instrumentation]):
+    """Print the summary and write the metric files named by METRICS_JSON_PATH / METRICS_OPENMETRICS_PATH."""
+    if instrumentation is not None:
+        instrumentation.report(os.environ.get("METRICS_JSON_PATH"), os.environ.get("METRICS_OPENMETRICS_PATH"))
+
+
+@contextmanager
+def operation(name: str):
+    """Attribute the requests made inside the block to a named operation and time it."""
+    if _active is None:
+        yield
+        return
+    token = _current.set(_Invocation(name))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        _active.record_duration(name, time.perf_counter() - started)
+
+
+def instrumented(name: str):
+    """Decorate a function or coroutine function so every call is recorded as an operation."""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with operation(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with operation(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
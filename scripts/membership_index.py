@@ -0,0 +1,433 @@
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Paths with these suffixes are kept in SQLite, anything else as gzipped JSON
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+
+class GzipIndexStore:
+    """Keeps the whole index in one gzipped JSON file, which an Actions cache step can restore."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, data: Dict, changed: Set[str], removed: Set[str]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+class SQLiteIndexStore:
+    """Keeps one row per team, so saving after a webhook update only writes the teams it touched.
+
+    Several processes on one host, such as the webhook service and batch runs, can share the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS teams (slug TEXT PRIMARY KEY, entry TEXT)")
+        return db
+
+    def load(self) -> Dict:
+        db = self._connect()
+        try:
+            data = {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM meta")}
+            data["teams"] = {slug: json.loads(entry) for slug, entry in db.execute("SELECT slug, entry FROM teams")}
+        finally:
+            db.close()
+        data.setdefault("version", INDEX_FORMAT_VERSION)
+        return data
+
+    def save(self, data: Dict, changed: Set[str], removed: Set[str]):
+        db = self._connect()
+        try:
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [(key, json.dumps(value)) for key, value in data.items() if key != "teams"],
+                )
+                db.executemany("DELETE FROM teams WHERE slug = ?", [(slug,) for slug in removed])
+                db.executemany(
+                    "INSERT OR REPLACE INTO teams VALUES (?, ?)",
+                    [(slug, json.dumps(data["teams"][slug], separators=(",", ":"))) for slug in changed],
+                )
+        finally:
+            db.close()
+
+
+def open_index_store(path: str):
+    """Pick the backing store for an index path by its suffix."""
+    return SQLiteIndexStore(path) if path.endswith(SQLITE_SUFFIXES) else GzipIndexStore(path)
+
+
+class MembershipIndex:
+    """Team membership snapshot (team slug -> member logins) persisted between runs.
+
+    The snapshot is stored as gzipped JSON, or in SQLite for paths ending in .sqlite or .db.
+    Every team carries its own fetch timestamp, so stale teams are refreshed one at a time
+    instead of rebuilding the whole index. An index built for a whole organization with
+    replace_teams also knows each team's direct members and parent team, which lets
+    apply_webhook keep it current from membership, team and organization events.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: int = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.org: Optional[str] = None
+        self.built_at = 0.0
+        self._teams: Dict[str, Dict] = {}
+        self._user_teams: Dict[str, Set[str]] = {}
+        self._changed: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str, ttl: int = DEFAULT_TTL_SECONDS) -> "MembershipIndex":
+        """Load a snapshot from disk, starting empty if it is missing or unreadable."""
+        index = cls(path, ttl)
+        if not os.path.exists(path):
+            print(f"Debug: No membership index at {path}, starting cold")
+            return index
+
+        try:
+            data = open_index_store(path).load()
+            if data.get("version") != INDEX_FORMAT_VERSION:
+                print(f"Debug: Ignoring membership index with unsupported version {data.get('version')}")
+                return index
+            for team_slug, entry in data.get("teams", {}).items():
+                index._store(team_slug, entry["members"], entry["fetched_at"], entry)
+            index.org = data.get("org")
+            index.built_at = data.get("built_at") or 0.0
+            index._changed.clear()
+            print(f"Debug: Loaded membership index with {len(index._teams)} teams from {path}")
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            print(f"Warning: Could not read membership index {path}: {str(e)}")
+            index._teams.clear()
+            index._user_teams.clear()
+        return index
+
+    def _store(self, team_slug: str, members: Iterable[str], fetched_at: float, details: Optional[Dict] = None):
+        """Replace a team's members and keep the reverse user -> teams map in sync.
+
+        details may carry the team's id, parent slug and direct members from an organization build.
+        """
+        members = set(members)
+        previous = self._teams.get(team_slug)
+        if previous:
+            for login in set(previous["members"]) - members:
+                self._user_teams.get(login, set()).discard(team_slug)
+        entry = {"members": sorted(members), "fetched_at": fetched_at}
+        for key in ("id", "parent", "direct"):
+            value = (details or {}).get(key, (previous or {}).get(key) if details is None else None)
+            if value is not None:
+                entry[key] = sorted(value) if key == "direct" else value
+        self._teams[team_slug] = entry
+        for login in members:
+            self._user_teams.setdefault(login, set()).add(team_slug)
+        self._changed.add(team_slug)
+        self._removed.discard(team_slug)
+
+    def _drop(self, team_slug: str):
+        """Forget a team, so it is fetched again the next time it is needed."""
+        entry = self._teams.pop(team_slug, None)
+        if entry is None:
+            return
+        for login in entry["members"]:
+            self._user_teams.get(login, set()).discard(team_slug)
+        self._changed.discard(team_slug)
+        self._removed.add(team_slug)
+
+    def is_fresh(self, team_slug: str) -> bool:
+        """Check whether a team is present and younger than the TTL."""
+        with self._lock:
+            entry = self._teams.get(team_slug)
+            return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def is_complete(self) -> bool:
+        """Check whether the index holds a fresh build of every team of its organization."""
+        return self.built_at > 0 and time.time() - self.built_at < self.ttl
+
+    def get_members(self, team_slug: str) -> Optional[List[str]]:
+        """Get the cached members of a team, or None when the team is missing or stale."""
+        # Webhooks update the index from other threads, so readers take the lock too
+        with self._lock:
+            if not self.is_fresh(team_slug):
+                return None
+            return list(self._teams[team_slug]["members"])
+
+    def set_members(self, team_slug: str, members: List[str]):
+        """Record freshly fetched members for a team."""
+        with self._lock:
+            self._store(team_slug, members, time.time())
+            self._dirty = True
+
+    def is_member(self, username: str, team_slug: str) -> Optional[bool]:
+        """Check whether a user belongs to a team, or None when the team is missing or stale."""
+        with self._lock:
+            if not self.is_fresh(team_slug):
+                return None
+            return team_slug in self._user_teams.get(username, ())
+
+    def teams_of(self, username: str) -> List[str]:
+        """Get the fresh teams a user is known to belong to."""
+        with self._lock:
+            return sorted(slug for slug in self._user_teams.get(username, ()) if self.is_fresh(slug))
+
+    def stale_teams(self) -> Dict[str, bool]:
+        """Map each stale team to whether its direct members are known, i.e. it came from an organization build."""
+        with self._lock:
+            return {slug: "direct" in entry for slug, entry in self._teams.items() if not self.is_fresh(slug)}
+
+    def refresh_team(self, team_slug: str, members: List[str], direct: bool = False):
+        """Record refetched members of a stale team.
+
+        With direct, members are the team's direct members: its child teams are added to them
+        and its parent teams are updated, keeping an organization build consistent.
+        """
+        with self._lock:
+            if not direct or team_slug not in self._teams:
+                self._store(team_slug, members, time.time())
+            else:
+                self._teams[team_slug]["direct"] = sorted(set(members))
+                self._teams[team_slug]["fetched_at"] = time.time()
+                for slug in [team_slug] + self._ancestors(team_slug):
+                    self._recompute(slug)
+            self._dirty = True
+
+    def forget_team(self, team_slug: str):
+        """Remove a team that no longer exists, updating its parent teams."""
+        with self._lock:
+            if team_slug not in self._teams:
+                return
+            ancestors = self._ancestors(team_slug)
+            for child in self._children(team_slug):
+                self._teams[child].pop("parent", None)
+            self._drop(team_slug)
+            for slug in ancestors:
+                self._recompute(slug)
+            self._dirty = True
+
+    def replace_teams(self, org: str, teams: List[Dict]):
+        """Replace the index with a build of every team of an organization.
+
+        Each team is a dict with slug, id, parent (slug or None) and direct (member logins).
+        A team's members are its direct members plus the members of its child teams, the
+        same as GitHub's team members endpoint returns.
+        """
+        children: Dict[str, List[str]] = {}
+        for team in teams:
+            children.setdefault(team["parent"], []).append(team["slug"])
+        direct = {team["slug"]: set(team["direct"]) for team in teams}
+        members: Dict[str, Set[str]] = {}
+
+        def collect(team_slug: str) -> Set[str]:
+            if team_slug not in members:
+                members[team_slug] = set(direct[team_slug])
+                for child in children.get(team_slug, ()):
+                    members[team_slug] |= collect(child)
+            return members[team_slug]
+
+        with self._lock:
+            for team_slug in list(self._teams):
+                self._drop(team_slug)
+            now = time.time()
+            for team in teams:
+                self._store(team["slug"], collect(team["slug"]), now, team)
+            self.org = org
+            self.built_at = now
+            self._dirty = True
+        print(f"Debug: Built membership index of {org} with {len(self._teams)} teams")
+
+    def _children(self, team_slug: str) -> List[str]:
+        return [slug for slug, entry in self._teams.items() if entry.get("parent") == team_slug]
+
+    def _ancestors(self, team_slug: str) -> List[str]:
+        """The parent chain of a team, nearest first, as far as the index knows it."""
+        chain = []
+        parent = (self._teams.get(team_slug) or {}).get("parent")
+        while parent and parent in self._teams and parent not in chain:
+            chain.append(parent)
+            parent = self._teams[parent].get("parent")
+        return chain
+
+    def _recompute(self, team_slug: str):
+        """Rebuild a team's members from its direct members and its child teams, or drop it if they are unknown.
+
+        Child teams must be up to date already, so changes are applied nearest team first.
+        """
+        entry = self._teams.get(team_slug)
+        if entry is None:
+            return
+        if "direct" not in entry:
+            # Only the member list from the REST API is known, which a removal cannot be applied to
+            self._drop(team_slug)
+            return
+        members = set(entry["direct"])
+        for child in self._children(team_slug):
+            members.update(self._teams[child]["members"])
+        self._store(team_slug, members, entry["fetched_at"])
+
+    def _team_slug(self, team: Dict) -> Optional[str]:
+        """Find a webhook payload's team in the index, by id first since slugs change on renames."""
+        team_id = team.get("id")
+        if team_id is not None:
+            for slug, entry in self._teams.items():
+                if entry.get("id") == team_id:
+                    return slug
+        return team.get("slug")
+
+    def apply_webhook(self, event: str, payload: Dict) -> bool:
+        """Apply a membership, team or organization webhook event, returning whether the index changed.
+
+        Membership checks trust the index as it is, so callers must only pass payloads from
+        deliveries whose signature was verified, never from an unauthenticated endpoint.
+        """
+        action = payload.get("action")
+        with self._lock:
+            if event == "membership" and payload.get("scope", "team") == "team":
+                login = (payload.get("member") or {}).get("login")
+                team_slug = self._team_slug(payload.get("team") or {})
+                if not login or team_slug not in self._teams:
+                    return False
+                entry = self._teams[team_slug]
+                if action == "added":
+                    if "direct" in entry:
+                        entry["direct"] = sorted(set(entry["direct"]) | {login})
+                    for slug in [team_slug] + self._ancestors(team_slug):
+                        self._store(slug, set(self._teams[slug]["members"]) | {login}, self._teams[slug]["fetched_at"])
+                elif action == "removed":
+                    if "direct" in entry:
+                        entry["direct"] = [member for member in entry["direct"] if member != login]
+                    for slug in [team_slug] + self._ancestors(team_slug):
+                        self._recompute(slug)
+                else:
+                    return False
+
+            elif event == "team":
+                team = payload.get("team") or {}
+                team_slug = self._team_slug(team)
+                if action == "created":
+                    if not self.is_complete() or not team.get("slug"):
+                        return False
+                    parent = (team.get("parent") or {}).get("slug")
+                    self._store(team["slug"], [], time.time(), {"id": team.get("id"), "parent": parent, "direct": []})
+                elif action == "deleted":
+                    if team_slug not in self._teams:
+                        return False
+                    ancestors = self._ancestors(team_slug)
+                    for child in self._children(team_slug):
+                        self._teams[child].pop("parent", None)
+                    self._drop(team_slug)
+                    for slug in ancestors:
+                        self._recompute(slug)
+                elif action == "edited":
+                    if team_slug not in self._teams:
+                        return False
+                    changes = payload.get("changes") or {}
+                    if team.get("slug") and team["slug"] != team_slug:
+                        entry = self._teams[team_slug]
+                        self._drop(team_slug)
+                        self._store(team["slug"], entry["members"], entry["fetched_at"], entry)
+                        for child in self._children(team_slug):
+                            self._teams[child]["parent"] = team["slug"]
+                        team_slug = team["slug"]
+                    if "parent" in changes:
+                        old_ancestors = self._ancestors(team_slug)
+                        self._teams[team_slug]["parent"] = (team.get("parent") or {}).get("slug")
+                        for slug in old_ancestors + self._ancestors(team_slug):
+                            self._recompute(slug)
+                else:
+                    return False
+
+            elif event == "organization" and action == "member_removed":
+                login = ((payload.get("membership") or {}).get("user") or {}).get("login")
+                if not login or not self._user_teams.get(login):
+                    return False
+                for slug in list(self._user_teams[login]):
+                    entry = self._teams[slug]
+                    if "direct" in entry:
+                        entry["direct"] = [member for member in entry["direct"] if member != login]
+                    self._store(slug, [member for member in entry["members"] if member != login], entry["fetched_at"])
+            else:
+                return False
+
+            self._dirty = True
+        print(f"Debug: Applied {event}.{action} to the membership index")
+        return True
+
+    def save(self):
+        """Write the snapshot back to disk if anything changed."""
+        if not self.path or not self._dirty:
+            return
+
+        with self._lock:
+            data = {"version": INDEX_FORMAT_VERSION, "org": self.org, "built_at": self.built_at, "teams": self._teams}
+            open_index_store(self.path).save(data, set(self._changed), set(self._removed))
+            self._changed.clear()
+            self._removed.clear()
+            self._dirty = False
+        print(f"Debug: Saved membership index with {len(self._teams)} teams to {self.path}")
+
+
+def refresh_index(index: MembershipIndex, requester, org: str):
+    """Bring an index of an organization up to date, refetching only its stale teams.
+
+    The whole organization is only read again when the index is not a complete build of it.
+    """
+    from graphql_loader import load_organization_teams, load_teams_members
+
+    if index.org != org or not index.is_complete():
+        index.replace_teams(org, load_organization_teams(requester, org))
+        return
+
+    stale = index.stale_teams()
+    for direct in (True, False):
+        slugs = [slug for slug, has_direct in stale.items() if has_direct == direct]
+        if not slugs:
+            continue
+        members, missing = load_teams_members(requester, org, slugs, immediate=direct)
+        for slug in missing:
+            index.forget_team(slug)
+        for slug, logins in members.items():
+            index.refresh_team(slug, logins, direct)
+    print(f"Debug: Refreshed {len(stale)} stale teams of the membership index of {org}")
+
+
+if __name__ == "__main__":
+    # Refresh the index of a whole organization, e.g. from a scheduled job writing a shared SQLite file
+    from github import Github
+
+    from github_transport import api_base_url
+
+    if len(sys.argv) != 3:
+        print("Usage: membership_index.py <organization> <index path (.json.gz, .sqlite or .db)>")
+        sys.exit(1)
+    index = MembershipIndex.load(sys.argv[2], int(os.environ.get("MEMBERSHIP_INDEX_TTL", DEFAULT_TTL_SECONDS)))
+    gh = Github(os.environ["GITHUB_TOKEN"], base_url=api_base_url())
+    refresh_index(index, gh.requester, sys.argv[1])
+    index.save()
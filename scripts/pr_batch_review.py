@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from github import Github
+from github.GithubException import GithubException
+
+from approval_state import ApprovalStateStore
+from github_transport import add_transport_hook, api_base_url, install_pooled_transport, set_response_cache
+from graphql_loader import load_organization_teams
+from http_cache import open_response_cache
+from instrumentation import instrumentation_from_env, instrumented, report_from_env
+from membership_index import DEFAULT_TTL_SECONDS, MembershipIndex
+from pr_review_manager import PRReviewManager
+from review_config import CompiledConfigCache
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_SUMMARY_PATH = "pr-batch-summary.json"
+# How long a long-running process waits before trying a failed membership index build again
+MEMBERSHIP_BUILD_RETRY_SECONDS = 300
+
+
+def iter_open_pull_requests(
+    gh, org_name: str, repositories: Optional[List[str]] = None
+) -> Iterator[Tuple[str, object]]:
+    """Stream (repository name, pull request) pairs for every open PR, one page at a time."""
+    if repositories:
+        repo_names = (name if "/" in name else f"{org_name}/{name}" for name in repositories)
+        repos = ((name, gh.get_repo(name)) for name in repo_names)
+    else:
+        repos = ((repo.full_name, repo) for repo in gh.get_organization(org_name).get_repos() if not repo.archived)
+
+    for full_name, repo in repos:
+        for pr in repo.get_pulls(state="open"):
+            yield full_name, pr
+
+
+class BatchReviewRunner:
+    """Evaluates many open PRs in one process with a shared client, config cache and membership cache."""
+
+    def __init__(
+        self,
+        github_token: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        membership_index: Optional[MembershipIndex] = None,
+        use_graphql: bool = False,
+        batch_requests: bool = False,
+        gh: Optional[Github] = None,
+        config_cache=None,
+        approval_state: Optional[ApprovalStateStore] = None,
+        compiled_configs: Optional[CompiledConfigCache] = None,
+    ):
+        # Workers share one client, so it needs thread-safe connections
+        install_pooled_transport()
+        self.github_token = github_token
+        # PRs come from listings, so nothing needs to be fetched again before it is used
+        self.gh = gh if gh is not None else Github(github_token, base_url=api_base_url(), lazy=True, pool_size=max_workers)
+        self.max_workers = max(1, max_workers)
+        self.membership_index = membership_index if membership_index is not None else MembershipIndex()
+        self.use_graphql = use_graphql
+        self.batch_requests = batch_requests
+        self.config_cache = config_cache if config_cache is not None else {}
+        self.approval_state = approval_state
+        # A REVIEWERS.yml rolled out unchanged to many repositories is compiled once per team
+        self.compiled_configs = compiled_configs if compiled_configs is not None else CompiledConfigCache()
+        self._team_names: Dict[str, str] = {}
+        self._orgs: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._build_retry_at = 0.0
+
+    def _get_team_name(self, full_name: str) -> str:
+        """Get a repository's TEAM_NAME variable, falling back to the TEAM_NAME environment variable."""
+        with self._lock:
+            if full_name in self._team_names:
+                return self._team_names[full_name]
+
+        team_name = os.environ.get("TEAM_NAME", "")
+        try:
+            _, data = self.gh.requester.requestJsonAndCheck("GET", f"/repos/{full_name}/actions/variables/TEAM_NAME")
+            team_name = data.get("value", team_name)
+        except GithubException as e:
+            if e.status != 404:
+                print(f"Warning: Could not read TEAM_NAME variable of {full_name}: {str(e)}")
+
+        with self._lock:
+            self._team_names[full_name] = team_name
+        return team_name
+
+    @instrumented("build_membership_index")
+    def build_membership_index(self, org_name: str):
+        """Load every team of the organization into the membership index, unless it has a fresh build already.
+
+        A few GraphQL queries then answer every membership check of the run.
+        """
+        # Workers evaluating their first PRs at the same time must not all build it
+        with self._build_lock:
+            if self.membership_index.is_complete() and self.membership_index.org == org_name:
+                return
+            if time.monotonic() < self._build_retry_at:
+                return
+            try:
+                teams = load_organization_teams(self.gh.requester, org_name)
+            except Exception as e:
+                print(f"Warning: Could not build the membership index of {org_name}, looking teams up as needed: {e}")
+                self._build_retry_at = time.monotonic() + MEMBERSHIP_BUILD_RETRY_SECONDS
+                return
+            self.membership_index.replace_teams(org_name, teams)
+
+    def _get_org(self, org_name: str):
+        """Get a lazily loaded organization object shared by all PRs of that owner."""
+        with self._lock:
+            if org_name not in self._orgs:
+                self._orgs[org_name] = self.gh.get_organization(org_name)
+            return self._orgs[org_name]
+
+    @instrumented("evaluate_pull_request")
+    def evaluate(self, full_name: str, pr, review_events: Optional[List[Tuple[str, Dict]]] = None) -> Dict:
+        """Re-evaluate one PR and report its review status before and after.
+
+        review_events, when given, are (action, review) pairs applied to the recorded approval state.
+        """
+        result = {
+            "repository": full_name,
+            "number": pr.number,
+            "head_sha": pr.head.sha,
+            "previous": None,
+            "current": None,
+            "error": None,
+            "avoided_writes": 0,
+        }
+        try:
+            manager = PRReviewManager(
+                self.github_token,
+                full_name,
+                pr.number,
+                membership_index=self.membership_index,
+                use_graphql=self.use_graphql,
+                batch_requests=self.batch_requests,
+                gh=self.gh,
+                pull_request=pr,
+                config_cache=self.config_cache,
+                team_name=self._get_team_name(full_name),
+                approval_state=self.approval_state,
+                compiled_configs=self.compiled_configs,
+            )
+            org = self._get_org(full_name.split("/")[0])
+            if review_events:
+                recorded = self.approval_state.get(full_name, pr.number) if self.approval_state is not None else None
+                if recorded is not None and recorded["head_sha"] == pr.head.sha:
+                    result["previous"] = recorded["status"]
+                result["current"] = manager.process_review_events(pr.number, org, review_events)
+            else:
+                result["previous"] = manager.get_review_status(pr.head.sha)
+                result["current"] = manager.process_pull_request(pr.number, org)
+            result["avoided_writes"] = manager.avoided_writes
+        except Exception as e:
+            print(f"Error evaluating {full_name}#{pr.number}: {str(e)}")
+            result["error"] = str(e)
+
+        result["changed"] = result["current"] is not None and result["current"] != result["previous"]
+        return result
+
+    def run(self, pull_requests: Iterator[Tuple[str, object]]) -> List[Dict]:
+        """Evaluate PRs concurrently as they are streamed in, keeping a bounded number in flight."""
+        in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for full_name, pr in pull_requests:
+                in_flight.acquire()
+                future = executor.submit(self.evaluate, full_name, pr)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+        return [future.result() for future in futures]
+
+
+def write_summary(results: List[Dict], path: str):
+    """Print the PRs whose status changed and write the full summary as JSON."""
+    changed = [result for result in results if result["changed"]]
+    errors = [result for result in results if result["error"]]
+
+    avoided_writes = sum(result["avoided_writes"] for result in results)
+    print(
+        f"\nEvaluated {len(results)} PRs: {len(changed)} status changes, {len(errors)} errors, "
+        f"{avoided_writes} redundant writes skipped"
+    )
+    for result in changed:
+        print(
+            f"  {result['repository']}#{result['number']}: {result['previous'] or 'none'} -> {result['current']}"
+        )
+    for result in errors:
+        print(f"  {result['repository']}#{result['number']}: error: {result['error']}")
+
+    summary = {
+        "evaluated": len(results),
+        "changed": len(changed),
+        "errors": len(errors),
+        "avoided_writes": avoided_writes,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Wrote batch summary to {path}")
+
+
+def main():
+    github_token = os.environ["GITHUB_TOKEN"]
+    org_name = os.environ["GITHUB_ORGANIZATION"]
+    # Comma-separated repositories; every repository in the organization when empty
+    repositories = [name.strip() for name in os.environ.get("BATCH_REPOSITORIES", "").split(",") if name.strip()]
+    max_workers = int(os.environ.get("BATCH_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+    summary_path = os.environ.get("BATCH_SUMMARY_PATH", DEFAULT_SUMMARY_PATH)
+    use_graphql = os.environ.get("PR_REVIEW_USE_GRAPHQL", "false").lower() == "true"
+    batch_requests = os.environ.get("PR_REVIEW_BATCH_REQUESTS", "false").lower() == "true"
+
+    ttl = int(os.environ.get("MEMBERSHIP_INDEX_TTL", DEFAULT_TTL_SECONDS))
+    membership_index_path = os.environ.get("MEMBERSHIP_INDEX_PATH")
+    if membership_index_path:
+        membership_index = MembershipIndex.load(membership_index_path, ttl)
+    else:
+        membership_index = MembershipIndex(ttl=ttl)
+
+    config_cache_path = os.environ.get("REVIEW_CONFIG_CACHE_PATH")
+    compiled_configs = CompiledConfigCache.load(config_cache_path) if config_cache_path else CompiledConfigCache()
+
+    runner = BatchReviewRunner(
+        github_token, max_workers, membership_index, use_graphql, batch_requests, compiled_configs=compiled_configs
+    )
+    response_cache = None
+    if os.environ.get("GITHUB_HTTP_CACHE"):
+        response_cache = open_response_cache(os.environ["GITHUB_HTTP_CACHE"], os.environ.get("GITHUB_HTTP_CACHE_SCOPE"))
+        set_response_cache(response_cache)
+    instrumentation = instrumentation_from_env()
+    if instrumentation is not None:
+        add_transport_hook(instrumentation)
+    try:
+        if os.environ.get("MEMBERSHIP_INDEX_BUILD", "true").lower() == "true":
+            runner.build_membership_index(org_name)
+        results = runner.run(iter_open_pull_requests(runner.gh, org_name, repositories))
+    finally:
+        membership_index.save()
+        compiled_configs.save()
+        if response_cache is not None:
+            response_cache.print_stats()
+            response_cache.backend.close()
+        report_from_env(instrumentation)
+    write_summary(results, summary_path)
+
+
+if __name__ == "__main__":
+    main()
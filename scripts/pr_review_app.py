@@ -0,0 +1,73 @@
+import asyncio
+import os
+
+from instrumentation import instrumentation_from_env, report_from_env
+from rate_limit import governor_from_env
+
+# Engines that run async_review; "sync" runs PRReviewManager on PyGithub
+ASYNC_ENGINES = ("lite", "async")
+
+
+def run_review_engine(engine: str):
+    """Evaluate the PR named by the GitHub Actions environment with the lite or async engine.
+
+    "lite" sends requests with the standard library (rest_client.RestGitHub), so it runs from
+    the packaged review manager without installing anything. "async" uses aiohttp.
+    """
+    # Imported here so starting the sync engine never pays for them, and the other way round
+    from async_review import run_async_review
+    from membership_index import DEFAULT_TTL_SECONDS, MembershipIndex
+    from review_config import CompiledConfigCache
+
+    if engine == "async":
+        from async_github import AsyncGitHub as client_class
+    else:
+        from rest_client import RestGitHub as client_class
+
+    instrumentation = instrumentation_from_env()
+    membership_index = None
+    membership_index_path = os.environ.get("MEMBERSHIP_INDEX_PATH")
+    if membership_index_path:
+        ttl = int(os.environ.get("MEMBERSHIP_INDEX_TTL", DEFAULT_TTL_SECONDS))
+        membership_index = MembershipIndex.load(membership_index_path, ttl)
+    config_cache_path = os.environ.get("REVIEW_CONFIG_CACHE_PATH")
+    compiled_configs = CompiledConfigCache.load(config_cache_path) if config_cache_path else None
+
+    # The governor paces and retries requests like it does for the sync engine
+    hooks = [governor_from_env()] + ([instrumentation] if instrumentation is not None else [])
+    try:
+        asyncio.run(
+            run_async_review(
+                os.environ["GITHUB_TOKEN"],
+                os.environ["GITHUB_REPOSITORY"],
+                int(os.environ["PR_NUMBER"]),
+                os.environ["GITHUB_ORGANIZATION"],
+                membership_index,
+                hooks,
+                compiled_configs,
+                client_class,
+            )
+        )
+    finally:
+        if membership_index is not None:
+            membership_index.save()
+        if compiled_configs is not None:
+            compiled_configs.save()
+        report_from_env(instrumentation)
+
+
+def main():
+    """Entry point of the packaged review manager, which defaults to the sync engine like the scripts."""
+    engine = os.environ.get("PR_REVIEW_ENGINE", "sync").lower()
+    if engine in ASYNC_ENGINES:
+        run_review_engine(engine)
+        return
+
+    # Only the sync engine needs PyGithub, so it is only imported for it
+    from pr_review_manager import main as run_sync_engine
+
+    run_sync_engine()
+
+
+if __name__ == "__main__":
+    main()
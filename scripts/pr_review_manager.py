@@ -1,53 +1,125 @@
+import json
 import os
 import re
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 import yaml
 from github import Github
 from github.GithubException import GithubException
+from github.PullRequest import PullRequest
+
+from approval_state import ApprovalStateStore
+from github_transport import add_transport_hook, api_base_url, install_pooled_transport, set_response_cache
+from graphql_loader import GraphQLLoader, PullRequestSnapshot
+from http_cache import open_response_cache
+from instrumentation import instrumentation_from_env, instrumented, operation, report_from_env
+from membership_index import DEFAULT_TTL_SECONDS, MembershipIndex
+from pr_review_app import ASYNC_ENGINES, run_review_engine
+from rate_limit import is_transient
+from review_config import (
+    BranchPolicy,
+    CompiledConfigCache,
+    CompiledReviewConfig,
+    ConfigError,
+    ReviewTally,
+    compile_review_config,
+    meets_requirements,
+)
+
+ASSIGNEE_BATCH_SIZE = 10
+MAX_TEAM_LOOKUP_WORKERS = 8
+REVIEWS_PER_PAGE = 100
+# Part of the recorded requirements, so approvals counted under other review rules are recomputed
+REVIEW_COUNTING = "latest-review"
+_LAST_PAGE_LINK = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+
+def _last_page_number(headers: Dict) -> int:
+    """Get the number of the last page from a Link header, 1 when everything fit on one page."""
+    match = _LAST_PAGE_LINK.search(headers.get("link") or "")
+    if match is None:
+        return 1
+    return int(parse_qs(urlparse(match.group(1)).query).get("page", ["1"])[0])
 
 
 class PRReviewManager:
-    def __init__(self, github_token: str, repository: str, pr_number: int):
-        """Initialize the PR Review Manager."""
-        self.gh = Github(github_token)
-        self.repo = self.gh.get_repo(repository)
-        self.pr_number = pr_number
-        self.pr = self.repo.get_pull(pr_number)
+    def __init__(
+        self,
+        github_token: str,
+        repository: str,
+        pr_number: int,
+        membership_index: Optional[MembershipIndex] = None,
+        use_graphql: bool = False,
+        batch_requests: bool = False,
+        gh: Optional[Github] = None,
+        pull_request=None,
+        config_cache: Optional[Dict[Tuple[str, str], bytes]] = None,
+        team_name: Optional[str] = None,
+        approval_state: Optional[ApprovalStateStore] = None,
+        compiled_configs: Optional[CompiledConfigCache] = None,
+    ):
+        """Initialize the PR Review Manager.
+
+        gh, pull_request and config_cache let several managers in one process share a client,
+        reuse already listed PRs and download each (repository, ref) REVIEWERS.yml only once.
+        team_name overrides the TEAM_NAME environment variable for {{ team_name }} substitution.
+        approval_state records approval tallies so review events can be applied incrementally.
+        compiled_configs reuses REVIEWERS.yml files already compiled for the same TEAM_NAME.
+        """
+        self.batch_requests = batch_requests
+        if batch_requests:
+            # Team lookups run on a thread pool, which needs thread-safe connections
+            install_pooled_transport()
+        # With GraphQL reads, lazy objects let REST writes go out without fetching the PR or commit first
+        self.gh = gh if gh is not None else Github(github_token, base_url=api_base_url(), lazy=use_graphql)
+        self.repository = repository
+        with operation("get_pull_request"):
+            self.repo = self.gh.get_repo(repository)
+            self.pr_number = pr_number
+            self.pr = pull_request if pull_request is not None else self.repo.get_pull(pr_number)
+        self.config_cache = config_cache
+        self.team_name = team_name if team_name is not None else os.environ.get("TEAM_NAME", "")
+        self.compiled_configs = compiled_configs
+        self.graphql: Optional[GraphQLLoader] = None
+        self.snapshot: Optional[PullRequestSnapshot] = None
+        if use_graphql:
+            self.graphql = GraphQLLoader(self.gh, repository)
+            with operation("load_pull_request"):
+                self.snapshot = self.graphql.load_pull_request(pr_number)
         self.config = self._load_config()
-        self.org = self.repo.organization
-
-    def _load_config(self) -> Dict:
-        """Load the REVIEWERS.yml configuration file from PR's head branch."""
+        # Per-run memoization of team lookups, keyed by team slug and (username, team slug)
+        self._teams: Dict[str, Optional[object]] = {}
+        self._team_members: Dict[str, List[str]] = {}
+        self._team_membership: Dict[Tuple[str, str], bool] = {}
+        # Optional snapshot of team members persisted across runs
+        self.membership_index = membership_index
+        self.approval_state = approval_state
+        # Current pr-review-requirements state per head SHA, read at most once per run
+        self._review_status: Dict[str, Optional[str]] = {}
+        # API writes skipped because GitHub already had the desired state
+        self.avoided_writes = 0
+
+    @property
+    def org(self):
+        """The organization owning the repository, only fetched when asked for."""
+        return self.repo.organization
+
+    @instrumented("load_config")
+    def _load_config(self) -> CompiledReviewConfig:
+        """Load the REVIEWERS.yml configuration file from PR's head branch and compile it."""
         try:
-            # Get the PR's head branch ref and sha
-            head_sha = self.pr.head.sha
-            print(
-                f"Debug: Looking for REVIEWERS.yml in PR #{self.pr_number} head branch: {self.pr.head.ref} (SHA: {head_sha})"
-            )
-
-            try:
-                # Try to get the file from the PR's head branch
-                config_file = self.repo.get_contents("REVIEWERS.yml", ref=self.pr.head.ref)
-                print(f"Debug: Found REVIEWERS.yml in PR head branch {self.pr.head.ref}")
-            except Exception as e:
-                print(f"Debug: Could not find REVIEWERS.yml in PR head branch: {str(e)}")
-                # Fallback to try getting from the base branch
-                config_file = self.repo.get_contents("REVIEWERS.yml", ref=self.pr.base.ref)
-                print(f"Debug: Found REVIEWERS.yml in base branch {self.pr.base.ref}")
-
-            content = config_file.decoded_content
-            if not content:
-                raise ValueError("REVIEWERS.yml is empty")
-
-            print(f"Debug: Successfully loaded REVIEWERS.yml, size: {len(content)} bytes")
-
-            config = yaml.safe_load(content.decode("utf-8"))
-            if not config:
-                raise ValueError("REVIEWERS.yml contains no valid configuration")
-
-            print("Debug: Successfully parsed YAML configuration")
-            return config
+            if self.snapshot is not None:
+                content = self._config_from_snapshot()
+            else:
+                content = self._fetch_config()
+            if self.compiled_configs is not None:
+                return self.compiled_configs.get_or_compile(content, self.team_name)
+            return compile_review_config(content, self.team_name)
 
+        except ConfigError as e:
+            print(f"Error: {str(e)}")
+            raise
         except yaml.YAMLError as e:
             print(f"Debug: YAML parsing error - {str(e)}")
             raise ValueError(f"Failed to parse REVIEWERS.yml: {str(e)}") from e
@@ -55,79 +127,155 @@ class PRReviewManager:
             print(f"Debug: Unexpected error while loading config - {str(e)}")
             raise FileNotFoundError(f"Failed to load REVIEWERS.yml: {str(e)}") from e
 
-    def _get_branch_config(self, branch_name: str) -> Optional[Dict]:
-        """Get the configuration for a specific branch."""
-        try:
-            branch_configs = self.config["pull_requests"]["branches"]
-
-            # First check for exact match
-            if branch_name in branch_configs:
-                print(f"Debug: Found exact match configuration for branch {branch_name}")
-                return branch_configs[branch_name]
-
-            # Then check pattern matches
-            for pattern, config in branch_configs.items():
-                if "*" in pattern:
-                    regex_pattern = pattern.replace("*", ".*")
-                    if re.match(regex_pattern, branch_name):
-                        # Check if branch is excluded
-                        if "exclude" in config and branch_name in config["exclude"]:
-                            print(f"Debug: Branch {branch_name} is excluded from pattern {pattern}")
-                            continue
-                        print(
-                            f"Debug: Found pattern match configuration for branch {branch_name} using pattern {pattern}"
-                        )
-                        return config
+    def _fetch_config(self) -> bytes:
+        """Download REVIEWERS.yml from the PR's head branch, falling back to its base branch."""
+        # Get the PR's head branch ref and sha
+        head_sha = self.pr.head.sha
+        print(
+            f"Debug: Looking for REVIEWERS.yml in PR #{self.pr_number} head branch: {self.pr.head.ref} (SHA: {head_sha})"
+        )
 
+        try:
+            # Try to get the file from the PR's head branch
+            content = self._get_config_at(self.pr.head.ref)
+            print(f"Debug: Found REVIEWERS.yml in PR head branch {self.pr.head.ref}")
+        except Exception as e:
+            print(f"Debug: Could not find REVIEWERS.yml in PR head branch: {str(e)}")
+            # Fallback to try getting from the base branch
+            content = self._get_config_at(self.pr.base.ref)
+            print(f"Debug: Found REVIEWERS.yml in base branch {self.pr.base.ref}")
+
+        return content
+
+    def _get_config_at(self, ref: str) -> bytes:
+        """Download REVIEWERS.yml at a ref, using the shared config cache when there is one."""
+        key = (self.repository, ref)
+        if self.config_cache is not None and key in self.config_cache:
+            return self.config_cache[key]
+        content = self.repo.get_contents("REVIEWERS.yml", ref=ref).decoded_content
+        if self.config_cache is not None:
+            self.config_cache[key] = content
+        return content
+
+    def _config_from_snapshot(self) -> bytes:
+        """Get REVIEWERS.yml from the GraphQL snapshot, preferring the PR's head branch."""
+        snapshot = self.snapshot
+        if snapshot.head_config is not None:
+            print(f"Debug: Found REVIEWERS.yml in PR head branch {snapshot.head_ref}")
+            return snapshot.head_config.encode("utf-8")
+        if snapshot.base_config is not None:
+            print(f"Debug: Found REVIEWERS.yml in base branch {snapshot.base_ref}")
+            return snapshot.base_config.encode("utf-8")
+        raise FileNotFoundError(f"REVIEWERS.yml not found in {snapshot.head_ref} or {snapshot.base_ref}")
+
+    def _get_branch_config(self, branch_name: str) -> Optional[BranchPolicy]:
+        """Get the review policy for a specific branch, or None when nothing is configured for it."""
+        policy = self.config.match(branch_name)
+        if policy is None:
             print(f"Debug: No matching configuration found for branch {branch_name}")
             return None
 
-        except KeyError as e:
-            print(f"Debug: Missing key in configuration: {str(e)}")
-            return None
-        except Exception as e:
-            print(f"Debug: Error getting branch configuration: {str(e)}")
-            return None
+        if policy.pattern == branch_name:
+            print(f"Debug: Found exact match configuration for branch {branch_name}")
+        else:
+            print(f"Debug: Found pattern match configuration for branch {branch_name} using pattern {policy.pattern}")
+        return policy if policy.configured else None
 
+    @instrumented("get_team")
+    def _get_team(self, team_slug: str, org):
+        """Get a team by slug, fetching each team at most once per run."""
+        if team_slug not in self._teams:
+            try:
+                self._teams[team_slug] = org.get_team_by_slug(team_slug)
+            except GithubException as e:
+                if e.status != 404:
+                    raise
+                print(f"Warning: Team {team_slug} not found")
+                self._teams[team_slug] = None
+        return self._teams[team_slug]
+
+    @instrumented("get_team_members")
     def _get_team_members(self, team_slug: str, org) -> List[str]:
         """Get list of usernames for members of a team."""
+        if team_slug in self._team_members:
+            return list(self._team_members[team_slug])
+        if self.membership_index is not None:
+            cached_members = self.membership_index.get_members(team_slug)
+            if cached_members is not None:
+                return cached_members
+
         try:
-            team = org.get_team_by_slug(team_slug)
-            members = list(team.get_members())
-            print(f"team found: {team} from {team_slug}")
+            team = self._get_team(team_slug, org)
+            members = []
+            if team is not None:
+                members = [member.login for member in team.get_members()]
+                print(f"team found: {team} from {team_slug}")
+            self._store_team_members(team_slug, members)
             if not members:
                 print(f"Warning: No members found in team {team_slug}")
-                return []
-            return [member.login for member in members]
+            return members
         except GithubException as e:
-            if e.status == 404:
-                print(f"Warning: Team {team_slug} not found")
-                return []
             print(f"Warning: Error accessing team {team_slug}: {str(e)}")
             return []
         except Exception as e:
             print(f"Warning: Unexpected error getting team members for {team_slug}: {str(e)}")
             return []
 
-    def _get_user_teams(self, username: str, org) -> List[str]:
-        """Get all teams that a user belongs to in the organization."""
+    def _store_team_members(self, team_slug: str, members: List[str]):
+        """Remember a team's members for this run and, if enabled, for later runs."""
+        self._team_members[team_slug] = members
+        if self.membership_index is not None:
+            self.membership_index.set_members(team_slug, members)
+
+    @instrumented("prefetch_team_members")
+    def _prefetch_team_members(self, team_slugs: List[str], org):
+        """Load the members of every team that is not cached yet in one batched GraphQL query."""
+        missing = [
+            slug
+            for slug in dict.fromkeys(team_slugs)
+            if slug not in self._team_members
+            and (self.membership_index is None or not self.membership_index.is_fresh(slug))
+        ]
+        if not missing:
+            return
         try:
-            teams = list(org.get_teams())
-            user_teams = []
-
-            for team in teams:
-                try:
-                    if team.has_in_members(self.gh.get_user(username)):
-                        user_teams.append(team.slug)
-                except Exception as e:
-                    print(f"Warning: Error checking if user {username} is in team {team.slug}: {str(e)}")
-                    continue
-
-            return user_teams
+            for team_slug, members in self.graphql.load_team_members(org.login, missing).items():
+                self._store_team_members(team_slug, members)
         except Exception as e:
-            print(f"Warning: Error getting teams for user {username}: {str(e)}")
-            return []
+            print(f"Warning: Could not prefetch team members via GraphQL: {str(e)}")
+
+    def _is_team_member(self, username: str, team_slug: str, org) -> bool:
+        """Check whether a user is an active member of a team, memoized per (user, team)."""
+        key = (username, team_slug)
+        if key not in self._team_membership and self.membership_index is not None:
+            is_member = self.membership_index.is_member(username, team_slug)
+            if is_member is not None:
+                self._team_membership[key] = is_member
+        if key not in self._team_membership:
+            if team_slug in self._team_members or self.membership_index is not None:
+                # Resolve from the whole team list so the answer can be persisted for later runs
+                self._team_membership[key] = username in self._get_team_members(team_slug, org)
+                return self._team_membership[key]
+
+            is_member = False
+            try:
+                team = self._get_team(team_slug, org)
+                if team is not None:
+                    is_member = team.get_team_membership(username).state == "active"
+            except GithubException as e:
+                if e.status != 404:
+                    print(f"Warning: Error checking if user {username} is in team {team_slug}: {str(e)}")
+            except Exception as e:
+                print(f"Warning: Error checking if user {username} is in team {team_slug}: {str(e)}")
+            self._team_membership[key] = is_member
+        return self._team_membership[key]
 
+    @instrumented("get_user_teams")
+    def _get_user_teams(self, username: str, org, team_slugs: List[str]) -> List[str]:
+        """Get the teams among team_slugs that a user belongs to."""
+        return [team_slug for team_slug in team_slugs if self._is_team_member(username, team_slug, org)]
+
+    @instrumented("check_branch_protection")
     def _check_branch_protection(self, branch_name: str) -> bool:
         """Check if the branch has 'dismiss stale reviews' enabled in branch protection."""
         try:
@@ -138,157 +286,360 @@ class PRReviewManager:
             print(f"Warning: Could not check branch protection settings: {str(e)}")
             return False
 
-    def _format_team_slug(self, team_name: str) -> str:
-        """Format a team name into a proper team slug with variable substitution."""
-        team_name = team_name.replace("{{ team_name }}", os.environ.get("TEAM_NAME", ""))
-        return team_name.lower().strip().replace(" ", "-")
+    def _approver_teams(self, reviewer_login: str, org, required_team_slugs: List[str]) -> List[str]:
+        """Get the required teams an approval by this reviewer counts for."""
+        # For team approvals, only ask about the teams this branch requires
+        try:
+            user_team_slugs = self._get_user_teams(reviewer_login, org, required_team_slugs)
+            for team_slug in user_team_slugs:
+                print(f"Debug: User {reviewer_login} approval counts for team {team_slug}")
+            return user_team_slugs
+        except Exception as e:
+            print(f"Warning: Error processing team membership for {reviewer_login}: {str(e)}")
+            return []
 
-    def _check_required_reviews(self, pr, branch_config: Dict, org) -> bool:
-        """Check if the PR has met the required review conditions."""
+    def _meets_requirements(self, approvals: Dict[str, List[str]], branch_config: BranchPolicy) -> bool:
+        """Check counted approvals (approver -> required teams they approve for) against a branch policy."""
+        return meets_requirements(approvals, branch_config.required_approvals, list(branch_config.required_team_slugs))
+
+    def _iter_reviews_newest_first(self, pr) -> Iterator[Tuple[Optional[str], str]]:
+        """Yield (login, state) of every review on the PR, newest first, one page at a time.
+
+        The first page tells how many pages there are; later pages are then read from the
+        last one back, so a caller that stops early never reads the oldest reviews.
+        """
+        url = f"/repos/{self.repository}/pulls/{pr.number}/reviews"
+        parameters = {"per_page": REVIEWS_PER_PAGE}
+        headers, first_page = self.gh.requester.requestJsonAndCheck("GET", url, parameters=parameters)
+        for page in range(_last_page_number(headers), 1, -1):
+            _, reviews = self.gh.requester.requestJsonAndCheck("GET", url, parameters=dict(parameters, page=page))
+            for review in reversed(reviews):
+                yield (review.get("user") or {}).get("login"), review["state"]
+        for review in reversed(first_page):
+            yield (review.get("user") or {}).get("login"), review["state"]
+
+    @instrumented("check_required_reviews")
+    def _check_required_reviews(
+        self, pr, branch_config: BranchPolicy, org, latest_reviews: Optional[List[Tuple[str, str]]] = None
+    ) -> Tuple[bool, Dict[str, List[str]]]:
+        """Check if the PR has met the required review conditions.
+
+        Only each reviewer's latest approving, change-requesting or dismissed review counts.
+        latest_reviews, when given, holds (login, state) pairs already fetched via GraphQL;
+        otherwise reviews are read newest first. Membership is only looked up for required
+        teams no counted approver covers yet, and reading stops once the requirements are
+        met. Also returns the counted approvers with the required teams each one was found
+        to approve for, which may leave out older approvals that were not needed.
+        """
+        tally = ReviewTally(branch_config.required_approvals, branch_config.required_team_slugs)
         try:
-            required_approvals = branch_config.get("required_approvals", 0)
-            required_teams = branch_config.get("required_teams", [])
-
-            # Get all reviews
-            reviews = pr.get_reviews()
-            approved_reviewers = set()
-            team_approvals = set()
-
-            for review in reviews:
-                if review.state == "APPROVED":
-                    reviewer = review.user
-                    approved_reviewers.add(reviewer.login)
-
-                    # For team approvals, get all teams the user belongs to
-                    try:
-                        user_team_slugs = self._get_user_teams(reviewer.login, org)
-                        for team_slug in user_team_slugs:
-                            team_approvals.add(team_slug)
-                            print(f"Debug: User {reviewer.login} approval counts for team {team_slug}")
-                    except Exception as e:
-                        print(f"Warning: Error processing team membership for {reviewer.login}: {str(e)}")
-
-            # Check number of approvals
-            if len(approved_reviewers) < required_approvals:
-                print(f"Debug: Not enough approvals. Got {len(approved_reviewers)}, need {required_approvals}")
-                return False
-
-            # Check required teams - now a user in multiple teams counts for all those teams
-            if required_teams:
-                # Format each required team name to match the team slugs format
-                required_team_slugs = [self._format_team_slug(team) for team in required_teams]
-
-                print(f"Debug: Required team slugs: {required_team_slugs}")
-                print(f"Debug: Teams with approvals: {team_approvals}")
-
-                # Check if all required teams have at least one approver
-                missing_teams = set(required_team_slugs) - team_approvals
-                if missing_teams:
-                    print(f"Debug: Missing required team approvals from: {missing_teams}")
-                    return False
-
-            return True
+            if tally.satisfied:
+                print("Debug: Branch requires no approvals, not reading reviews")
+                return self._meets_requirements(tally.approvals, branch_config), tally.approvals
+
+            if latest_reviews is None:
+                latest_reviews = self._iter_reviews_newest_first(pr)
+
+            for reviewer_login, state in latest_reviews:
+                if not tally.observe(reviewer_login, state):
+                    continue
+                unsatisfied = tally.unsatisfied_team_slugs()
+                tally.add_approver(
+                    reviewer_login, self._approver_teams(reviewer_login, org, unsatisfied) if unsatisfied else []
+                )
+                if tally.satisfied:
+                    print(f"Debug: Requirements met after {len(tally.approvals)} approvals, not reading older reviews")
+                    break
+
+            return self._meets_requirements(tally.approvals, branch_config), tally.approvals
 
         except Exception as e:
             print(f"Warning: Error checking required reviews: {str(e)}")
-            return False
+            return False, tally.approvals
+
+    @instrumented("create_review_request")
+    def _request_team_reviews(self, pr, team_slugs: List[str], requested_team_slugs: List[str]):
+        """Request reviews from the teams that are not requested yet, in a single call when batching is enabled."""
+        already_requested = [team_slug for team_slug in team_slugs if team_slug in requested_team_slugs]
+        if already_requested:
+            print(f"Debug: Reviews already requested from teams: {', '.join(already_requested)}")
+            team_slugs = [team_slug for team_slug in team_slugs if team_slug not in requested_team_slugs]
+            if not self.batch_requests:
+                self.avoided_writes += len(already_requested)
+            elif not team_slugs:
+                self.avoided_writes += 1
+
+        if self.batch_requests and team_slugs:
+            try:
+                pr.create_review_request(team_reviewers=team_slugs)
+                for team_slug in team_slugs:
+                    print(f"Successfully requested review from team: {team_slug}")
+                return
+            except GithubException as e:
+                # GitHub rejects the whole request if any team is invalid, so find it one team at a time
+                print(f"Debug: Batched review request failed, requesting teams one at a time: {str(e)}")
+
+        for team_slug in team_slugs:
+            try:
+                pr.create_review_request(team_reviewers=[team_slug])
+                print(f"Successfully requested review from team: {team_slug}")
+            except GithubException as e:
+                print(f"Warning: Could not request review from team {team_slug}: {str(e)}")
+                continue
+
+    def _expand_assignee_teams(self, team_slugs: List[str], org) -> set:
+        """Get the members of all assignee teams, looking teams up concurrently when batching is enabled."""
+        if self.batch_requests and len(team_slugs) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_TEAM_LOOKUP_WORKERS, len(team_slugs))) as executor:
+                member_lists = list(executor.map(lambda slug: self._get_team_members(slug, org), team_slugs))
+        else:
+            member_lists = [self._get_team_members(team_slug, org) for team_slug in team_slugs]
+
+        assignees = set()
+        for team_slug, team_members in zip(team_slugs, member_lists):
+            if team_members:
+                assignees.update(team_members)
+                print(f"Found {len(team_members)} members in team {team_slug}")
+        return assignees
+
+    @instrumented("add_assignees")
+    def _add_assignees(self, pr, assignees: set, current_assignees: List[str]):
+        """Add the assignees that are not assigned yet, in batches to handle GitHub's limitation."""
+        missing = sorted(assignees - set(current_assignees))
+        batch_count = -(-len(missing) // ASSIGNEE_BATCH_SIZE)
+        self.avoided_writes += -(-len(assignees) // ASSIGNEE_BATCH_SIZE) - batch_count
+        if not missing:
+            print("Debug: All assignees are already assigned")
+            return
 
-    def process_pull_request(self, pr_number: int, org):
-        """Process a pull request according to the configuration."""
-        pr = self.repo.get_pull(pr_number)
-        branch_name = pr.base.ref
+        try:
+            for i in range(0, len(missing), ASSIGNEE_BATCH_SIZE):
+                batch = missing[i : i + ASSIGNEE_BATCH_SIZE]
+                pr.add_to_assignees(*batch)
+                print(f"Successfully added assignees: {', '.join(batch)}")
+        except GithubException as e:
+            print(f"Warning: Error adding assignees: {str(e)}")
+
+    @instrumented("create_status")
+    def _post_review_status(self, head_sha: str, meets_requirements: bool) -> str:
+        """Set the pr-review-requirements status on a commit unless it already has that state, and return it."""
+        state = "success" if meets_requirements else "pending"
+        if self.get_review_status(head_sha) == state:
+            print(f"Debug: Status check is already {state}, not updating it")
+            self.avoided_writes += 1
+            return state
+
+        status_context = "pr-review-requirements"
+        try:
+            if not meets_requirements:
+                self.repo.get_commit(head_sha).create_status(
+                    state="pending",
+                    target_url="",
+                    description="Required reviews not yet met",
+                    context=status_context,
+                )
+            else:
+                self.repo.get_commit(head_sha).create_status(
+                    state="success",
+                    target_url="",
+                    description="All review requirements met",
+                    context=status_context,
+                )
+            self._review_status[head_sha] = state
+        except GithubException as e:
+            if is_transient(e.status, e.headers, e.data):
+                # Still failing after the governor's retries; fail the run rather than leave a stale status
+                print(f"Error: Could not update status check: {str(e)}")
+                raise
+            print(f"Warning: Could not update status check: {str(e)}")
+        return state
+
+    def _requirements_key(self, branch_config: BranchPolicy) -> List:
+        """Describe what recorded approvals were computed against, so changed rules invalidate them."""
+        return [branch_config.required_approvals, sorted(branch_config.required_team_slugs), REVIEW_COUNTING]
+
+    @instrumented("get_review_status")
+    def get_review_status(self, head_sha: str) -> Optional[str]:
+        """Get the current state of the pr-review-requirements status on a commit, if any."""
+        if head_sha not in self._review_status:
+            if self.snapshot is not None and self.snapshot.head_sha == head_sha:
+                self._review_status[head_sha] = self.snapshot.review_status
+            else:
+                self._review_status[head_sha] = None
+                for status in self.repo.get_commit(head_sha).get_combined_status().statuses:
+                    if status.context == "pr-review-requirements":
+                        self._review_status[head_sha] = status.state
+                        break
+        return self._review_status[head_sha]
+
+    @instrumented("process_pull_request")
+    def process_pull_request(self, pr_number: int, org) -> Optional[str]:
+        """Process a pull request according to the configuration.
+
+        Returns the review status state that was computed, or None when no branch config applies.
+        """
+        if pr_number == self.pr_number:
+            pr, snapshot = self.pr, self.snapshot
+        else:
+            pr, snapshot = self.repo.get_pull(pr_number), None
+        branch_name = snapshot.base_ref if snapshot is not None else pr.base.ref
         print(f"Debug: Processing PR #{pr_number} targeting branch {branch_name}")
 
         branch_config = self._get_branch_config(branch_name)
-        if not branch_config:
+        if branch_config is None:
             print(f"No configuration found for branch: {branch_name}")
-            return
+            return None
 
         # Check if stale reviews are dismissed for this branch
-        dismiss_stale_reviews = self._check_branch_protection(branch_name)
+        if snapshot is not None:
+            dismiss_stale_reviews = snapshot.dismiss_stale_reviews
+        else:
+            dismiss_stale_reviews = self._check_branch_protection(branch_name)
         print(f"Debug: Dismiss stale reviews setting for branch {branch_name}: {dismiss_stale_reviews}")
 
         # Only add new reviewers if no reviews exist or if stale reviews are dismissed
-        should_request_reviews = dismiss_stale_reviews or pr.get_reviews().totalCount == 0
+        if snapshot is not None:
+            should_request_reviews = dismiss_stale_reviews or snapshot.review_count == 0
+        else:
+            should_request_reviews = dismiss_stale_reviews or pr.get_reviews().totalCount == 0
 
         # Assign reviewers and assignees
-        review_teams = branch_config.get("review_teams", [])
-        assignee_teams = branch_config.get("assignees", [])
+        review_teams = list(branch_config.review_team_slugs)
+        assignee_teams = list(branch_config.assignee_team_slugs)
+
+        if snapshot is not None:
+            # Resolve every team this run needs in one batched query
+            self._prefetch_team_members(assignee_teams + list(branch_config.required_team_slugs), org)
 
         try:
             # Add review teams using team slugs if needed
             if should_request_reviews:
                 print("Debug: Requesting reviews since either no reviews exist or stale reviews are dismissed")
-                for team in review_teams:
-                    team_slug = self._format_team_slug(team)
-                    try:
-                        pr.create_review_request(team_reviewers=[team_slug])
-                        print(f"Successfully requested review from team: {team_slug}")
-                    except GithubException as e:
-                        print(f"Warning: Could not request review from team {team_slug}: {str(e)}")
-                        continue
+                if snapshot is not None:
+                    requested_team_slugs = snapshot.requested_team_slugs
+                else:
+                    requested_team_slugs = [team.slug for team in pr.requested_teams]
+                self._request_team_reviews(pr, review_teams, requested_team_slugs)
             else:
                 print("Debug: Skipping review requests as reviews exist and stale reviews are not dismissed")
 
             # Add assignees from teams
-            assignees = set()
-            for team in assignee_teams:
-                team_slug = self._format_team_slug(team)
-                team_members = self._get_team_members(team_slug, org)
-                if team_members:
-                    assignees.update(team_members)
-                    print(f"Found {len(team_members)} members in team {team_slug}")
+            assignees = self._expand_assignee_teams(assignee_teams, org)
 
             # Only proceed if there are assignees to add
             if assignees:
-                try:
-                    # Add assignees in batches to handle GitHub's limitation
-                    assignees_list = list(assignees)
-                    for i in range(0, len(assignees_list), 10):
-                        batch = assignees_list[i : i + 10]
-                        pr.add_to_assignees(*batch)
-                        print(f"Successfully added assignees: {', '.join(batch)}")
-                except GithubException as e:
-                    print(f"Warning: Error adding assignees: {str(e)}")
+                if snapshot is not None:
+                    current_assignees = snapshot.assignees
+                else:
+                    current_assignees = [assignee.login for assignee in pr.assignees]
+                self._add_assignees(pr, assignees, current_assignees)
             else:
                 print("No valid assignees found to add to the PR")
 
             # Check review requirements
-            meets_requirements = self._check_required_reviews(pr, branch_config, org)
-
-            status_context = "pr-review-requirements"
-            try:
-                if not meets_requirements:
-                    self.repo.get_commit(pr.head.sha).create_status(
-                        state="pending",
-                        target_url="",
-                        description="Required reviews not yet met",
-                        context=status_context,
-                    )
-                else:
-                    self.repo.get_commit(pr.head.sha).create_status(
-                        state="success",
-                        target_url="",
-                        description="All review requirements met",
-                        context=status_context,
-                    )
-            except GithubException as e:
-                print(f"Warning: Could not update status check: {str(e)}")
+            latest_reviews = snapshot.latest_reviews if snapshot is not None else None
+            meets_requirements, approvals = self._check_required_reviews(pr, branch_config, org, latest_reviews)
+
+            head_sha = snapshot.head_sha if snapshot is not None else pr.head.sha
+            state = self._post_review_status(head_sha, meets_requirements)
+            if self.approval_state is not None:
+                self.approval_state.record(
+                    self.repository, pr_number, head_sha, self._requirements_key(branch_config), approvals, state
+                )
+            print(f"Debug: Skipped {self.avoided_writes} redundant writes")
+            return state
 
         except Exception as e:
             print(f"Error processing PR #{pr_number}: {str(e)}")
             raise
 
+    @instrumented("process_review_events")
+    def process_review_events(self, pr_number: int, org, review_events: List[Tuple[str, Dict]]) -> Optional[str]:
+        """Apply pull_request_review webhook events to the recorded approval state of a PR.
+
+        review_events holds (action, review payload) pairs. Reviewer and assignee requests were
+        already made when the PR was opened or pushed to, so only the approvals of the reviewers
+        in the events are resolved and the status is only posted when it changes. Falls back to
+        process_pull_request when nothing matching the PR's head and rules was recorded.
+        """
+        if self.approval_state is None or pr_number != self.pr_number:
+            return self.process_pull_request(pr_number, org)
+
+        pr, snapshot = self.pr, self.snapshot
+        branch_name = snapshot.base_ref if snapshot is not None else pr.base.ref
+        head_sha = snapshot.head_sha if snapshot is not None else pr.head.sha
+        branch_config = self._get_branch_config(branch_name)
+        if branch_config is None:
+            print(f"No configuration found for branch: {branch_name}")
+            return None
+
+        requirements = self._requirements_key(branch_config)
+        recorded = self.approval_state.get(self.repository, pr_number)
+        if recorded is None or recorded["head_sha"] != head_sha or recorded["requirements"] != requirements:
+            print(f"Debug: No approval state recorded for {head_sha}, running a full evaluation")
+            return self.process_pull_request(pr_number, org)
+
+        approvals = recorded["approvers"]
+        for action, review in review_events:
+            reviewer_login = (review.get("user") or {}).get("login")
+            review_state = (review.get("state") or "").upper()
+            if action == "dismissed":
+                # The reviewer may still have an earlier approval, which only a full scan can tell
+                print(f"Debug: Review by {reviewer_login} was dismissed, running a full evaluation")
+                return self.process_pull_request(pr_number, org)
+            if action != "submitted" or not reviewer_login:
+                continue
+
+            if review_state == "APPROVED" and reviewer_login not in approvals:
+                approvals[reviewer_login] = self._approver_teams(reviewer_login, org, requirements[1])
+            elif review_state == "CHANGES_REQUESTED" and reviewer_login in approvals:
+                # Older approvals the record skipped may make up for it, which only a full scan can tell
+                print(f"Debug: {reviewer_login} withdrew their approval, running a full evaluation")
+                return self.process_pull_request(pr_number, org)
+
+        # The recorded status stands in for reading it back from GitHub
+        self._review_status.setdefault(head_sha, recorded["status"])
+        state = self._post_review_status(head_sha, self._meets_requirements(approvals, branch_config))
+        self.approval_state.record(self.repository, pr_number, head_sha, requirements, approvals, state)
+        return state
+
 
 def main():
+    engine = os.environ.get("PR_REVIEW_ENGINE", "sync").lower()
+    if engine in ASYNC_ENGINES:
+        # Same as running the packaged review manager; neither engine needs the PyGithub client
+        run_review_engine(engine)
+        return
+
     # Get inputs from GitHub Actions environment
     github_token = os.environ["GITHUB_TOKEN"]
     repository = os.environ["GITHUB_REPOSITORY"]
     pr_number = int(os.environ["PR_NUMBER"])
     org_name = os.environ["GITHUB_ORGANIZATION"]
+    membership_index_path = os.environ.get("MEMBERSHIP_INDEX_PATH")
+    approval_state_path = os.environ.get("APPROVAL_STATE_PATH")
+    config_cache_path = os.environ.get("REVIEW_CONFIG_CACHE_PATH")
+    use_graphql = os.environ.get("PR_REVIEW_USE_GRAPHQL", "false").lower() == "true"
+    batch_requests = os.environ.get("PR_REVIEW_BATCH_REQUESTS", "false").lower() == "true"
+    http_cache = os.environ.get("GITHUB_HTTP_CACHE")
+    instrumentation = instrumentation_from_env()
+    # Must happen before the first client is created, so every request is paced and retried by the governor
+    install_pooled_transport()
+    if instrumentation is not None:
+        add_transport_hook(instrumentation)
+    response_cache = None
+    if http_cache:
+        response_cache = open_response_cache(http_cache, os.environ.get("GITHUB_HTTP_CACHE_SCOPE"))
+        set_response_cache(response_cache)
+
+    membership_index = None
+    if membership_index_path:
+        ttl = int(os.environ.get("MEMBERSHIP_INDEX_TTL", DEFAULT_TTL_SECONDS))
+        membership_index = MembershipIndex.load(membership_index_path, ttl)
+    compiled_configs = CompiledConfigCache.load(config_cache_path) if config_cache_path else None
 
     # Debug: Check repository access
-    gh = Github(github_token)
+    gh = Github(github_token, base_url=api_base_url())
     org = gh.get_organization(org_name)
     try:
         repo = gh.get_repo(repository)
@@ -299,9 +650,44 @@ def main():
     except Exception as e:
         print(f"Debug: Error accessing repository - {str(e)}")
 
+    approval_state = ApprovalStateStore.load(approval_state_path) if approval_state_path else None
+
+    # Review events carry the PR and the review, so they can be applied to the recorded approvals
+    review_event = None
+    pull_request = None
+    if approval_state is not None and os.environ.get("GITHUB_EVENT_NAME") == "pull_request_review":
+        with open(os.environ["GITHUB_EVENT_PATH"], encoding="utf-8") as f:
+            review_event = json.load(f)
+        pull_request = gh.create_from_raw_data(PullRequest, review_event["pull_request"])
+
     # Initialize and run the PR Review Manager
-    manager = PRReviewManager(github_token, repository, pr_number)
-    manager.process_pull_request(pr_number, org)
+    manager = PRReviewManager(
+        github_token,
+        repository,
+        pr_number,
+        membership_index,
+        use_graphql,
+        batch_requests,
+        pull_request=pull_request,
+        approval_state=approval_state,
+        compiled_configs=compiled_configs,
+    )
+    try:
+        if review_event is not None:
+            manager.process_review_events(pr_number, org, [(review_event["action"], review_event["review"])])
+        else:
+            manager.process_pull_request(pr_number, org)
+    finally:
+        if membership_index is not None:
+            membership_index.save()
+        if approval_state is not None:
+            approval_state.save()
+        if compiled_configs is not None:
+            compiled_configs.save()
+        if response_cache is not None:
+            response_cache.print_stats()
+            response_cache.backend.close()
+        report_from_env(instrumentation)
 
 
 if __name__ == "__main__":
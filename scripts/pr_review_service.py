@@ -0,0 +1,424 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from github import Auth, Github
+from github.PullRequest import PullRequest
+
+from approval_state import ApprovalStateStore
+from github_transport import add_transport_hook, api_base_url, install_pooled_transport, set_response_cache
+from http_cache import open_response_cache
+from instrumentation import Instrumentation, instrumentation_from_env
+from membership_index import DEFAULT_TTL_SECONDS, MembershipIndex
+from pr_batch_review import DEFAULT_MAX_WORKERS, BatchReviewRunner
+from review_config import CompiledConfigCache
+
+DEFAULT_PORT = 8080
+# REVIEWERS.yml is looked up by branch name, so cached copies must expire for pushes to be seen
+DEFAULT_CONFIG_TTL_SECONDS = 60
+# Events for the same PR arriving within this window are evaluated once
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+# PRs whose last event time and approval state are remembered, least recently seen ones are forgotten
+DEFAULT_TRACKED_PULL_REQUESTS = 10000
+
+HANDLED_ACTIONS = {
+    "pull_request": {"opened", "reopened", "synchronize", "ready_for_review"},
+    "pull_request_review": {"submitted", "dismissed"},
+}
+# Events that keep the membership index current instead of triggering an evaluation
+MEMBERSHIP_EVENTS = {"membership", "team", "organization"}
+
+
+class ExpiringCache:
+    """Thread-safe mapping whose entries disappear a fixed time after they are written."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry[1] < self.ttl
+
+    def __getitem__(self, key):
+        # Expired entries are only replaced, never removed here, so a lookup right after a
+        # successful membership test cannot fail
+        with self._lock:
+            return self._entries[key][0]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+
+    def discard(self, key):
+        """Drop an entry before it expires."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class PullRequestCoalescer:
+    """Collapses bursts of events for one PR into a single evaluation of its newest state.
+
+    The first event for a (repository, PR) key starts a debounce timer; later events within
+    the window only replace the pending payload, so the evaluation sees the last writer's head
+    SHA. At most one evaluation per key runs at a time, and events arriving meanwhile are
+    evaluated once it finishes. Webhooks can be delivered out of order, so an event whose PR
+    updated_at is older than one already seen for the key is dropped as stale. merge, when
+    given, combines a pending payload with a newer one instead of replacing it. Only the
+    max_tracked most recently seen keys are remembered for the stale check.
+    """
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        evaluate: Callable,
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        merge: Optional[Callable[[Tuple, Tuple], Tuple]] = None,
+        max_tracked: int = DEFAULT_TRACKED_PULL_REQUESTS,
+    ):
+        self.executor = executor
+        self.evaluate = evaluate
+        self.debounce = debounce
+        self.merge = merge
+        self.max_tracked = max_tracked
+        self._pending: Dict[Tuple[str, int], Tuple] = {}
+        self._scheduled: Set[Tuple[str, int]] = set()
+        self._running: Set[Tuple[str, int]] = set()
+        self._last_seen: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.received = 0
+        self.coalesced = 0
+        self.stale = 0
+
+    def submit(self, key: Tuple[str, int], updated_at: str, args: Tuple) -> bool:
+        """Queue an evaluation for a PR, returning False when the event is older than one already seen."""
+        with self._lock:
+            self.received += 1
+            # GitHub timestamps share one ISO 8601 format, so they compare as strings
+            if updated_at < self._last_seen.get(key, ""):
+                self.stale += 1
+                return False
+            self._last_seen[key] = updated_at
+            self._last_seen.move_to_end(key)
+            if len(self._last_seen) > self.max_tracked:
+                # A PR not seen for this long has no event in flight, forgetting it only skips one stale check
+                self._last_seen.popitem(last=False)
+
+            if key in self._pending:
+                self.coalesced += 1
+                if self.merge is not None:
+                    args = self.merge(self._pending[key], args)
+            self._pending[key] = args
+            if key not in self._scheduled and key not in self._running:
+                self._schedule(key)
+        return True
+
+    def _schedule(self, key: Tuple[str, int]):
+        """Start the debounce timer of a key. Must be called with the lock held."""
+        self._scheduled.add(key)
+        timer = threading.Timer(self.debounce, self._fire, (key,))
+        timer.daemon = True
+        timer.start()
+
+    def _fire(self, key: Tuple[str, int]):
+        with self._lock:
+            self._scheduled.discard(key)
+            args = self._pending.pop(key, None)
+            if args is None:
+                return
+            self._running.add(key)
+        self.executor.submit(self._run, key, args)
+
+    def _run(self, key: Tuple[str, int], args: Tuple):
+        try:
+            self.evaluate(*args)
+        except Exception as e:
+            print(f"Error evaluating {key[0]}#{key[1]}: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.discard(key)
+                if key in self._pending:
+                    self._schedule(key)
+
+
+class ReviewService:
+    """Runs process_pull_request for webhook events, keeping clients and caches warm between events.
+
+    One client per GitHub App installation is kept for the life of the process; PyGithub refreshes
+    its installation token shortly before it expires. Config and team membership caches are shared
+    by every event of an installation, so most events only pay for the review writes.
+    """
+
+    def __init__(
+        self,
+        app_id: Optional[str] = None,
+        private_key: Optional[str] = None,
+        github_token: Optional[str] = None,
+        webhook_secret: Optional[str] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        config_ttl: float = DEFAULT_CONFIG_TTL_SECONDS,
+        membership_ttl: int = DEFAULT_TTL_SECONDS,
+        use_graphql: bool = False,
+        batch_requests: bool = False,
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        membership_index_dir: Optional[str] = None,
+        build_membership_index: bool = True,
+        allow_unsigned: bool = False,
+        max_tracked_pull_requests: int = DEFAULT_TRACKED_PULL_REQUESTS,
+    ):
+        if not github_token and not (app_id and private_key):
+            raise ValueError("Either a GitHub App id and private key or a token is required")
+        if not webhook_secret and not allow_unsigned:
+            raise ValueError("A webhook secret is required unless unsigned deliveries are explicitly allowed")
+
+        install_pooled_transport()
+        self.app_auth = Auth.AppAuth(app_id, private_key) if app_id and private_key else None
+        self.github_token = github_token
+        self.webhook_secret = webhook_secret
+        # Only meaningful without a secret: with one, every delivery must be signed
+        self.allow_unsigned = allow_unsigned and not webhook_secret
+        self.max_workers = max_workers
+        self.membership_ttl = membership_ttl
+        self.membership_index_dir = membership_index_dir
+        self.build_membership_index = build_membership_index
+        self.use_graphql = use_graphql
+        self.batch_requests = batch_requests
+        self.config_cache = ExpiringCache(config_ttl)
+        # Keyed by blob SHA and team, so installations can share compiled configs safely
+        self.compiled_configs = CompiledConfigCache()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.coalescer = PullRequestCoalescer(
+            self.executor, self._evaluate, debounce, self._merge_events, max_tracked_pull_requests
+        )
+        # Shared by all installations, entries are keyed by repository and PR
+        self.approval_state = ApprovalStateStore(max_entries=max_tracked_pull_requests)
+        # Keyed by installation id, or by organization in token mode
+        self._runners: Dict[object, BatchReviewRunner] = {}
+        self._lock = threading.Lock()
+
+    def _open_membership_index(self, org_login: Optional[str]) -> MembershipIndex:
+        """Open an organization's membership index, kept in membership_index_dir when set."""
+        if self.membership_index_dir and org_login:
+            path = os.path.join(self.membership_index_dir, f"{org_login}.sqlite")
+            return MembershipIndex.load(path, self.membership_ttl)
+        return MembershipIndex(ttl=self.membership_ttl)
+
+    def _get_runner(self, installation_id: Optional[int], org_login: Optional[str] = None) -> BatchReviewRunner:
+        """Get the warm runner of an installation, creating its client and caches on first use.
+
+        In token mode one token may reach several organizations, so runners are kept per organization.
+        """
+        key = installation_id if self.app_auth is not None else ("token", org_login)
+
+        with self._lock:
+            if key not in self._runners:
+                if self.app_auth is None:
+                    gh = Github(self.github_token, base_url=api_base_url(), lazy=True, pool_size=self.max_workers)
+                else:
+                    auth = self.app_auth.get_installation_auth(installation_id)
+                    gh = Github(auth=auth, base_url=api_base_url(), lazy=True, pool_size=self.max_workers)
+                # Each installation is its own organization, so team slugs must not be shared
+                self._runners[key] = BatchReviewRunner(
+                    self.github_token,
+                    self.max_workers,
+                    self._open_membership_index(org_login),
+                    self.use_graphql,
+                    self.batch_requests,
+                    gh=gh,
+                    config_cache=self.config_cache,
+                    approval_state=self.approval_state,
+                    compiled_configs=self.compiled_configs,
+                )
+            return self._runners[key]
+
+    def verify_signature(self, body: bytes, signature: Optional[str]) -> bool:
+        """Check the X-Hub-Signature-256 header against the webhook secret, failing without one."""
+        if not self.webhook_secret or not signature:
+            return False
+        expected = "sha256=" + hmac.new(self.webhook_secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    def handle_event(self, event: str, payload: Dict, verified: bool = False) -> bool:
+        """Queue a webhook event for evaluation, returning False when the event is ignored or stale.
+
+        Membership, team and organization events are applied to the membership index right away,
+        but only from deliveries with a verified signature: the index decides who counts as a
+        team member, so it must never be fed by unauthenticated requests.
+        """
+        installation_id = (payload.get("installation") or {}).get("id")
+        if event in MEMBERSHIP_EVENTS:
+            if not verified:
+                print(f"Warning: Ignored unsigned {event} delivery, the membership index only takes verified ones")
+                return False
+            org_login = (payload.get("organization") or {}).get("login")
+            membership_index = self._get_runner(installation_id, org_login).membership_index
+            if not membership_index.apply_webhook(event, payload):
+                return False
+            membership_index.save()
+            return True
+        if payload.get("action") not in HANDLED_ACTIONS.get(event, ()):
+            return False
+        _check_pull_request_payload(event, payload)
+
+        full_name = payload["repository"]["full_name"]
+        pr_data = payload["pull_request"]
+        if event == "pull_request" and payload["action"] == "synchronize":
+            # New commits on the head branch may have changed REVIEWERS.yml
+            self.config_cache.discard((full_name, pr_data["head"]["ref"]))
+
+        # Review events only need the new review applied, anything else needs a full evaluation
+        review_events = [(payload["action"], payload["review"])] if event == "pull_request_review" else None
+        key = (full_name, pr_data["number"])
+        args = (installation_id, full_name, pr_data, review_events)
+        if not self.coalescer.submit(key, pr_data.get("updated_at") or "", args):
+            print(f"Dropped stale {event}.{payload['action']} for {full_name}#{pr_data['number']}")
+            return False
+        print(f"Queued {event}.{payload['action']} for {full_name}#{pr_data['number']}")
+        return True
+
+    @staticmethod
+    def _merge_events(pending: Tuple, newer: Tuple) -> Tuple:
+        """Combine two queued events of one PR, keeping every review unless a full evaluation is due."""
+        installation_id, full_name, pr_data, review_events = newer
+        if pending[3] is None or review_events is None:
+            return installation_id, full_name, pr_data, None
+        return installation_id, full_name, pr_data, pending[3] + review_events
+
+    def _evaluate(
+        self, installation_id: Optional[int], full_name: str, pr_data: Dict, review_events: Optional[List] = None
+    ):
+        """Evaluate a PR from the webhook payload without fetching it again."""
+        started = time.time()
+        org_login = full_name.split("/")[0]
+        runner = self._get_runner(installation_id, org_login)
+        if self.build_membership_index and not runner.membership_index.is_complete():
+            runner.build_membership_index(org_login)
+            runner.membership_index.save()
+        pr = runner.gh.create_from_raw_data(PullRequest, pr_data)
+        result = runner.evaluate(full_name, pr, review_events)
+        print(
+            f"Evaluated {full_name}#{pr_data['number']} in {time.time() - started:.2f}s: "
+            f"{result['previous'] or 'none'} -> {result['current']}, {result['avoided_writes']} redundant writes skipped"
+        )
+
+
+def _check_pull_request_payload(event: str, payload: Dict):
+    """Raise ValueError naming the first field a pull request or review event needs but lacks."""
+    required = [("repository", "full_name"), ("pull_request", "number"), ("pull_request", "head", "ref")]
+    if event == "pull_request_review":
+        required.append(("review",))
+    for path in required:
+        value = payload
+        for key in path:
+            if not isinstance(value, dict) or value.get(key) is None:
+                raise ValueError(f"{event} payload has no {'.'.join(path)}")
+            value = value[key]
+
+
+def make_handler(service: ReviewService, instrumentation: Optional[Instrumentation] = None):
+    """Build the HTTP request handler class bound to a service, serving /metrics when instrumented."""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _respond(self, status: int, message: str, content_type: str = "text/plain"):
+            body = message.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._respond(200, "ok")
+            elif self.path == "/metrics" and instrumentation is not None:
+                self._respond(
+                    200,
+                    instrumentation.to_openmetrics(),
+                    "application/openmetrics-text; version=1.0.0; charset=utf-8",
+                )
+            else:
+                self._respond(404, "not found")
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            verified = service.verify_signature(body, self.headers.get("X-Hub-Signature-256"))
+            if not verified and not service.allow_unsigned:
+                self._respond(401, "invalid signature")
+                return
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self._respond(400, "invalid JSON")
+                return
+            if not isinstance(payload, dict):
+                self._respond(400, "payload is not a JSON object")
+                return
+
+            event = self.headers.get("X-GitHub-Event", "")
+            try:
+                queued = service.handle_event(event, payload, verified)
+            except ValueError as e:
+                self._respond(400, str(e))
+                return
+            except Exception as e:
+                print(f"Error: Failed to handle {event} delivery {self.headers.get('X-GitHub-Delivery')}: {e}")
+                self._respond(500, "internal error")
+                return
+            if queued:
+                self._respond(202, "queued")
+            else:
+                self._respond(204, "")
+
+    return WebhookHandler
+
+
+def main():
+    private_key = os.environ.get("GITHUB_APP_PRIVATE_KEY")
+    private_key_path = os.environ.get("GITHUB_APP_PRIVATE_KEY_PATH")
+    if not private_key and private_key_path:
+        with open(private_key_path, encoding="utf-8") as f:
+            private_key = f.read()
+
+    service = ReviewService(
+        app_id=os.environ.get("GITHUB_APP_ID"),
+        private_key=private_key,
+        github_token=os.environ.get("GITHUB_TOKEN"),
+        webhook_secret=os.environ.get("WEBHOOK_SECRET"),
+        max_workers=int(os.environ.get("SERVICE_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+        config_ttl=float(os.environ.get("CONFIG_CACHE_TTL", DEFAULT_CONFIG_TTL_SECONDS)),
+        membership_ttl=int(os.environ.get("MEMBERSHIP_INDEX_TTL", DEFAULT_TTL_SECONDS)),
+        use_graphql=os.environ.get("PR_REVIEW_USE_GRAPHQL", "false").lower() == "true",
+        batch_requests=os.environ.get("PR_REVIEW_BATCH_REQUESTS", "false").lower() == "true",
+        debounce=float(os.environ.get("SERVICE_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS)),
+        membership_index_dir=os.environ.get("MEMBERSHIP_INDEX_DIR"),
+        build_membership_index=os.environ.get("MEMBERSHIP_INDEX_BUILD", "true").lower() == "true",
+        allow_unsigned=os.environ.get("WEBHOOK_ALLOW_UNSIGNED", "false").lower() == "true",
+        max_tracked_pull_requests=int(os.environ.get("SERVICE_MAX_TRACKED_PRS", DEFAULT_TRACKED_PULL_REQUESTS)),
+    )
+    if service.allow_unsigned:
+        print("Warning: WEBHOOK_SECRET is not set, accepting unsigned deliveries (WEBHOOK_ALLOW_UNSIGNED=true)")
+    if os.environ.get("GITHUB_HTTP_CACHE"):
+        # Installation tokens rotate hourly, so entries stay keyed by token unless a scope is set
+        set_response_cache(
+            open_response_cache(os.environ["GITHUB_HTTP_CACHE"], os.environ.get("GITHUB_HTTP_CACHE_SCOPE"))
+        )
+    instrumentation = instrumentation_from_env()
+    if instrumentation is not None:
+        add_transport_hook(instrumentation)
+    port = int(os.environ.get("SERVICE_PORT", DEFAULT_PORT))
+    server = ThreadingHTTPServer(("", port), make_handler(service, instrumentation))
+    print(f"PR review service listening on port {port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+# Start pacing requests once fewer than this many remain in the current rate-limit window
+DEFAULT_LOW_WATERMARK = 200
+# Never pause longer than this for one response, GitHub's windows are at most an hour
+MAX_PAUSE_SECONDS = 3600
+
+# GitHub's secondary limits: 900 points a minute for REST requests, where reads cost 1 point and
+# writes 5, and 80 content-creating requests a minute. Buckets hold a small burst and refill with
+# the rest, so no 60 second window ever goes over the limit.
+DEFAULT_POINTS_PER_MINUTE = 900
+DEFAULT_WRITES_PER_MINUTE = 80
+POINTS_BURST = 100
+WRITES_BURST = 10
+READ_POINTS = 1
+WRITE_POINTS = 5
+
+DEFAULT_MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 30.0
+# How long GitHub asks clients to wait after a secondary rate limit that comes without Retry-After
+SECONDARY_RATE_WAIT_SECONDS = 60
+# Consecutive server errors or failed connections after which requests fail fast for a while
+CIRCUIT_FAILURE_THRESHOLD = 10
+CIRCUIT_COOLDOWN_SECONDS = 30
+
+READ_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+IDEMPOTENT_METHODS = READ_METHODS | frozenset(["PUT", "DELETE"])
+SERVER_ERROR_STATUSES = frozenset([500, 502, 503, 504])
+# Secondary limits can come as a 403 with neither Retry-After nor an exhausted budget; only the
+# message and documentation URL tell them from a permission error
+RATE_LIMIT_MESSAGE = re.compile(r"rate[ -]limit", re.IGNORECASE)
+
+# Writes that are safe to send again: they set state rather than add to it, or create content-addressed
+# git objects. A repeated variable creation is answered with "already exists", which callers turn into an update.
+IDEMPOTENT_WRITES = [
+    ("POST", re.compile(r"/statuses/[0-9a-f]+$")),
+    ("POST", re.compile(r"/pulls/\d+/requested_reviewers$")),
+    ("POST", re.compile(r"/issues/\d+/assignees$")),
+    ("POST", re.compile(r"/actions/variables$")),
+    ("PATCH", re.compile(r"/actions/variables/[^/]+$")),
+    ("POST", re.compile(r"/git/(blobs|trees|commits)$")),
+    ("PATCH", re.compile(r"/git/refs/.+$")),
+]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+def is_graphql_query(verb: str, url: str, body=None) -> bool:
+    """Whether a request is a GraphQL read: a POST to the GraphQL endpoint without a mutation."""
+    if verb.upper() != "POST" or not urlsplit(url).path.endswith("/graphql"):
+        return False
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return "mutation" not in (body or "")
+
+
+def is_idempotent(verb: str, url: str, body=None) -> bool:
+    """Whether sending a request twice has the same effect as sending it once."""
+    verb = verb.upper()
+    if verb in IDEMPOTENT_METHODS or is_graphql_query(verb, url, body):
+        return True
+    path = urlsplit(url).path
+    return any(verb == method and pattern.search(path) for method, pattern in IDEMPOTENT_WRITES)
+
+
+def _mentions_rate_limit(body) -> bool:
+    """Whether an error body, raw or decoded, says the request hit a rate limit."""
+    if isinstance(body, dict):
+        body = f"{body.get('message', '')} {body.get('documentation_url', '')}"
+    elif isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return isinstance(body, str) and RATE_LIMIT_MESSAGE.search(body) is not None
+
+
+def is_rate_limited(status: int, headers, body=None) -> bool:
+    """Whether a response rejected the request for a rate limit, so GitHub did not act on it.
+
+    body, the response body when known, catches secondary limits sent without either header.
+    """
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    if headers.get("retry-after") is not None or headers.get("x-ratelimit-remaining") == "0":
+        return True
+    return _mentions_rate_limit(body)
+
+
+def is_transient(status: int, headers, body=None) -> bool:
+    """Whether a failed request may well succeed later: server errors and rate limits."""
+    # Exceptions carry headers as plain dicts, not always with lowercase names
+    headers = {name.lower(): value for name, value in (headers or {}).items()}
+    return status in SERVER_ERROR_STATUSES or is_rate_limited(status, headers, body)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so retrying workers spread out instead of retrying together."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; take() blocks until the tokens it asks for have accrued.
+
+    Tokens may go negative, which queues callers in arrival order. A rate of None means
+    no limit until set_rate gives it one.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: Optional[float]):
+        """Change the refill rate, keeping the tokens accrued at the old one."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def take(self, tokens: float = 1.0):
+        """Take tokens, sleeping until they are available."""
+        with self._lock:
+            if self.rate is None:
+                return
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(min(delay, MAX_PAUSE_SECONDS))
+
+
+class CircuitBreaker:
+    """Fails requests fast after repeated server errors, then lets a single probe through after a cooldown.
+
+    A probe that never reports an outcome stops holding the circuit after another cooldown.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            waited = now - self._opened_at
+            probe_lost = self._probing and now - self._probe_started >= self.cooldown
+            if waited >= self.cooldown and (not self._probing or probe_lost):
+                self._probing = True
+                self._probe_started = now
+                return
+        retry_in = max(0, int(self.cooldown - waited))
+        raise CircuitOpenError(f"GitHub failed {self.failures} requests in a row, not sending more for {retry_in}s")
+
+    def release(self):
+        """End a probe without an outcome, e.g. a rate-limited or aborted request, so another may probe."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success: bool):
+        """Count a request outcome, opening the circuit at the threshold and closing it on success."""
+        with self._lock:
+            self._probing = False
+            if success:
+                self.failures = 0
+                self._opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self._opened_at is None:
+                    print(f"Warning: {self.failures} GitHub requests failed in a row, pausing for {self.cooldown}s")
+                self._opened_at = time.monotonic()
+
+
+class RateLimitThrottle:
+    """Process-wide request pacing driven by GitHub's rate-limit response headers.
+
+    Registered as a transport hook, so every thread sharing the process waits on the
+    same pause: a Retry-After or an exhausted X-RateLimit-Remaining stops all workers,
+    and a low remaining budget is spread over the time left in the window by a token
+    bucket shared by all of them.
+    """
+
+    def __init__(self, low_watermark: int = DEFAULT_LOW_WATERMARK):
+        self.low_watermark = low_watermark
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self._paused_until = 0.0
+        self._budget = TokenBucket(None, 1.0)
+        self._lock = threading.Lock()
+
+    def _pause(self, seconds: float):
+        """Hold every request for the given number of seconds from now."""
+        seconds = min(max(seconds, 0.0), MAX_PAUSE_SECONDS)
+        self._paused_until = max(self._paused_until, time.time() + seconds)
+
+    def before_request(self, verb: str, url: str):
+        """Block until the shared pause, if any, is over and the budget allows another request."""
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.time()
+            if delay <= 0:
+                break
+            time.sleep(delay)
+        self._budget.take()
+
+    def after_response(self, verb: str, url: str, status: int, headers):
+        """Update the shared pause and budget from a response's rate-limit headers."""
+        retry_after = headers.get("retry-after")
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(float(remaining))
+            if reset is not None:
+                self.reset_at = float(reset)
+
+            if retry_after is not None:
+                print(f"Rate limited on {verb} {url}, pausing all requests for {retry_after}s")
+                self._pause(float(retry_after))
+            elif status == 429:
+                print(f"Secondary rate limit on {verb} {url}, pausing all requests for {SECONDARY_RATE_WAIT_SECONDS}s")
+                self._pause(SECONDARY_RATE_WAIT_SECONDS)
+            elif self.remaining is not None and self.reset_at is not None:
+                window_left = self.reset_at - time.time()
+                if self.remaining == 0:
+                    print(f"Rate limit exhausted, pausing all requests for {int(window_left)}s")
+                    self._pause(window_left + 1)
+                elif self.remaining < self.low_watermark and window_left > 0:
+                    # Spread what is left of the budget evenly over the rest of the window
+                    self._budget.set_rate(self.remaining / window_left)
+                elif self._budget.rate is not None:
+                    self._budget.set_rate(None)
+
+
+class RequestGovernor(RateLimitThrottle):
+    """Shared pacing, retry and failure policy for every GitHub client of a process.
+
+    On top of the rate-limit headers it keeps requests within GitHub's secondary limits
+    with token buckets for points and writes, and a circuit breaker stops sending after
+    repeated server errors. Transports ask retry_delay(...) after each failed attempt.
+    Rate-limit rejections are retried for any request, because GitHub did not act on them.
+    Server errors and dropped connections are only retried for idempotent requests, so a
+    write that may have gone through is never repeated blindly.
+    """
+
+    def __init__(
+        self,
+        points_per_minute: int = DEFAULT_POINTS_PER_MINUTE,
+        writes_per_minute: int = DEFAULT_WRITES_PER_MINUTE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        low_watermark: int = DEFAULT_LOW_WATERMARK,
+    ):
+        super().__init__(low_watermark)
+        points_burst = min(POINTS_BURST, points_per_minute)
+        writes_burst = min(WRITES_BURST, writes_per_minute)
+        self.points = TokenBucket(max(points_per_minute - points_burst, 1) / 60, points_burst)
+        self.writes = TokenBucket(max(writes_per_minute - writes_burst, 1) / 60, writes_burst)
+        self.max_attempts = max_attempts
+        self.breaker = CircuitBreaker()
+
+    def before_request(self, verb: str, url: str):
+        """Fail fast while the circuit is open, otherwise wait for the pause and the request's share of the budget."""
+        self.breaker.check()
+        super().before_request(verb, url)
+        if verb.upper() in READ_METHODS or is_graphql_query(verb, url):
+            self.points.take(READ_POINTS)
+        else:
+            self.writes.take()
+            self.points.take(WRITE_POINTS)
+
+    def after_response(self, verb: str, url: str, status: int, headers):
+        super().after_response(verb, url, status, headers)
+        if is_rate_limited(status, headers):
+            # Says nothing about GitHub's health, but must not keep a probe from finishing
+            self.breaker.release()
+        else:
+            self.breaker.record(status not in SERVER_ERROR_STATUSES)
+
+    def abandon(self):
+        """Called by transports when a request ends in an exception, so it cannot hold the circuit's probe."""
+        self.breaker.release()
+
+    def retry_delay(
+        self, verb: str, url: str, status: Optional[int], headers, attempt: int, body=None, response_body=None
+    ) -> Optional[float]:
+        """Seconds to wait before sending a failed request again, or None to give up.
+
+        status is None when the connection failed before a response arrived. attempt
+        counts from 0 for the first try, body lets GraphQL reads be told from mutations,
+        and response_body lets secondary limits without rate-limit headers be recognized.
+        """
+        if status is None:
+            self.breaker.record(False)
+        rate_limited = status is not None and is_rate_limited(status, headers, response_body)
+        if rate_limited and not is_rate_limited(status, headers):
+            # after_response only sees headers, so this secondary limit has not paused anything yet
+            print(f"Secondary rate limit on {verb} {url}, pausing all requests for {SECONDARY_RATE_WAIT_SECONDS}s")
+            with self._lock:
+                self._pause(SECONDARY_RATE_WAIT_SECONDS)
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if rate_limited:
+            # The shared pause set from this response already holds the retry back, the jitter spreads workers out
+            return random.uniform(0, BACKOFF_BASE_SECONDS)
+        if (status is None or status in SERVER_ERROR_STATUSES) and is_idempotent(verb, url, body):
+            return backoff_delay(attempt)
+        return None
+
+
+def governor_from_env() -> RequestGovernor:
+    """Create a governor, with GITHUB_POINTS_PER_MINUTE and GITHUB_WRITES_PER_MINUTE overriding GitHub's limits."""
+    return RequestGovernor(
+        int(os.environ.get("GITHUB_POINTS_PER_MINUTE") or DEFAULT_POINTS_PER_MINUTE),
+        int(os.environ.get("GITHUB_WRITES_PER_MINUTE") or DEFAULT_WRITES_PER_MINUTE),
+        int(os.environ.get("GITHUB_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS),
+    )
@@ -0,0 +1,241 @@
+import asyncio
+import http.client
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from rate_limit import is_idempotent
+
+try:
+    from github.GithubException import GithubException
+except ImportError:  # The packaged review manager runs without PyGithub
+
+    class GithubException(Exception):
+        """Stand-in for PyGithub's GithubException with the same status, data and headers."""
+
+        def __init__(self, status: int, data=None, headers=None, message: Optional[str] = None):
+            super().__init__(status, data, headers)
+            self.status = status
+            self.data = data
+            self.headers = headers
+            self.message = message
+
+        def __str__(self) -> str:
+            return f"{self.message + ': ' if self.message else ''}{self.status} {json.dumps(self.data)}"
+
+
+DEFAULT_BASE_URL = "https://api.github.com"
+DEFAULT_MAX_CONCURRENCY = 16
+REQUEST_TIMEOUT_SECONDS = 30
+
+_NEXT_LINK = re.compile(r'<([^>]+)>;\s*rel="next"')
+_LAST_LINK = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+
+def last_page_number(link_header: str) -> int:
+    """Get the number of the last page from a Link header, 1 when everything fit on one page."""
+    match = _LAST_LINK.search(link_header or "")
+    if match is None:
+        return 1
+    return int(parse_qs(urlsplit(match.group(1)).query).get("page", ["1"])[0])
+
+
+def api_base_url() -> str:
+    """The REST API root: GITHUB_API_URL when set (Actions sets it, also on GitHub Enterprise Server), else github.com."""
+    return os.environ.get("GITHUB_API_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+class RestGitHub:
+    """Dependency-free GitHub client with the same interface as async_github.AsyncGitHub.
+
+    Requests are sent with http.client over keep-alive connections, one per worker
+    thread, and awaited through a thread pool of max_concurrency workers. Nothing
+    outside the standard library is imported, so the async review engine can run from
+    the packaged review manager without installing PyGithub or aiohttp.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        hooks: Optional[List] = None,
+    ):
+        self.base_url = (base_url or api_base_url()).rstrip("/")
+        # GitHub Enterprise Server serves GraphQL at /api/graphql next to /api/v3
+        self.graphql_url = (
+            self.base_url[: -len("/v3")] if self.base_url.endswith("/v3") else self.base_url
+        ) + "/graphql"
+        self.hooks = list(hooks or [])
+        # A hook with retry_delay, see rate_limit.RequestGovernor, decides which failed requests are sent again
+        self._governor = next((hook for hook in self.hooks if hasattr(hook, "retry_delay")), None)
+        self._headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json",
+            "User-Agent": "pr-review-process",
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="rest")
+        self._local = threading.local()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.request_count = 0
+
+    async def __aenter__(self) -> "RestGitHub":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def _connection(self, scheme: str, netloc: str, fresh: bool = False) -> http.client.HTTPConnection:
+        """Get this thread's keep-alive connection to a host, opening one when needed."""
+        connections = self._local.__dict__.setdefault("connections", {})
+        key = (scheme, netloc)
+        if fresh or key not in connections:
+            if key in connections:
+                connections[key].close()
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[key] = connection_class(netloc, timeout=REQUEST_TIMEOUT_SECONDS)
+            with self._lock:
+                self._connections.append(connections[key])
+        return connections[key]
+
+    def _send(self, verb: str, url: str, body: Optional[bytes], headers: Dict) -> Tuple[int, object, bytes]:
+        """Send one request on this thread's connection and read the whole response."""
+        parts = urlsplit(url)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        for hook in self.hooks:
+            hook.before_request(verb, url)
+
+        try:
+            reused = (parts.scheme, parts.netloc) in self._local.__dict__.get("connections", {})
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request(verb, target, body=body, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server most likely closed the idle keep-alive connection before reading the request,
+                # but it may have acted on it, so only a request that is safe to repeat is sent again here.
+                # Anything else is left to request(), which asks the governor like for other failures.
+                if not reused or not is_idempotent(verb, url, body):
+                    raise
+                for hook in self.hooks:
+                    hook.before_request(verb, url)
+                connection = self._connection(parts.scheme, parts.netloc, fresh=True)
+                connection.request(verb, target, body=body, headers=headers)
+                response = connection.getresponse()
+            data = response.read()
+
+            with self._lock:
+                self.request_count += 1
+            for hook in self.hooks:
+                hook.after_response(verb, url, response.status, response.headers)
+        except BaseException:
+            # Whatever cut the request short, it must not keep holding the circuit breaker's probe
+            if self._governor is not None:
+                self._governor.abandon()
+            raise
+        return response.status, response.headers, data
+
+    async def request(
+        self,
+        verb: str,
+        path: str,
+        params: Optional[Dict] = None,
+        json: Optional[Dict] = None,
+        accept: Optional[str] = None,
+    ) -> Tuple[Dict, object]:
+        """Send one request and return (headers, decoded body), raising GithubException on errors."""
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        if params:
+            url += ("&" if "?" in url else "?") + urlencode(params)
+        headers = dict(self._headers)
+        if accept:
+            headers["Accept"] = accept
+        body = None
+        if json is not None:
+            body = _json_dumps(json).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        loop = asyncio.get_running_loop()
+        governor = self._governor
+        attempt = 0
+        while True:
+            try:
+                status, response_headers, raw = await loop.run_in_executor(
+                    self._executor, self._send, verb, url, body, headers
+                )
+            except (OSError, http.client.HTTPException):
+                delay = governor.retry_delay(verb, url, None, {}, attempt, body) if governor else None
+                if delay is None:
+                    raise
+            else:
+                if status < 400 or governor is None:
+                    break
+                delay = governor.retry_delay(verb, url, status, response_headers, attempt, body, raw)
+                if delay is None:
+                    break
+            print(f"Debug: Retrying {verb} {url} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+        data: object = raw
+        if (response_headers.get("Content-Type") or "").startswith("application/json"):
+            data = _json_loads(raw) if raw else None
+        if status >= 400:
+            raise GithubException(status, data if isinstance(data, dict) else None, dict(response_headers))
+        return {name.lower(): value for name, value in response_headers.items()}, data
+
+    async def paginate(self, path: str, params: Optional[Dict] = None) -> AsyncIterator:
+        """Yield every item of a paginated list endpoint, following Link headers."""
+        params = dict(params or {}, per_page=100)
+        url = path
+        while url:
+            headers, page = await self.request("GET", url, params=params)
+            for item in page:
+                yield item
+            match = _NEXT_LINK.search(headers.get("link", ""))
+            # The next link already carries the query string
+            url, params = (match.group(1), None) if match else (None, None)
+
+    async def paginate_backwards(self, path: str, first_page: Optional[Tuple[Dict, List]] = None) -> AsyncIterator:
+        """Yield every item of a paginated list endpoint from the last one back, the last page first.
+
+        The first page tells how many pages there are, so a caller that stops early never reads
+        the first items of the list. first_page, the (headers, items) of page 1 when already
+        requested with per_page=100, saves requesting it again.
+        """
+        if first_page is None:
+            first_page = await self.request("GET", path, params={"per_page": 100})
+        headers, items = first_page
+        for page in range(last_page_number(headers.get("link", "")), 1, -1):
+            _, page_items = await self.request("GET", path, params={"per_page": 100, "page": page})
+            for item in reversed(page_items):
+                yield item
+        for item in reversed(items):
+            yield item
+
+    async def get_list(self, path: str, params: Optional[Dict] = None) -> List:
+        """Collect every item of a paginated list endpoint."""
+        return [item async for item in self.paginate(path, params)]
+
+    async def graphql(self, query: str, variables: Dict) -> Dict:
+        """Run a GraphQL query and return its data."""
+        _, data = await self.request("POST", self.graphql_url, json={"query": query, "variables": variables})
+        if data.get("errors"):
+            raise GithubException(200, data, None)
+        return data["data"]
+
+
+# The request() parameter named json shadows the module inside it
+_json_dumps = json.dumps
+_json_loads = json.loads
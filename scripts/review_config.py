@@ -0,0 +1,404 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+COMPILED_FORMAT_VERSION = 1
+DEFAULT_MAX_COMPILED_CONFIGS = 256
+BRANCH_SETTINGS = ("required_approvals", "required_teams", "review_teams", "assignees", "exclude")
+
+
+class ConfigError(ValueError):
+    """REVIEWERS.yml is valid YAML but does not follow the expected schema."""
+
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__("Invalid REVIEWERS.yml:\n" + "\n".join(f"  - {problem}" for problem in problems))
+
+
+def parse_review_config(content: bytes) -> Dict:
+    """Parse the contents of REVIEWERS.yml.
+
+    Raises ValueError when the file holds no configuration and yaml.YAMLError when it is not valid YAML.
+    """
+    if not content:
+        raise ValueError("REVIEWERS.yml is empty")
+
+    print(f"Debug: Successfully loaded REVIEWERS.yml, size: {len(content)} bytes")
+
+    config = yaml.safe_load(content.decode("utf-8"))
+    if not config:
+        raise ValueError("REVIEWERS.yml contains no valid configuration")
+
+    print("Debug: Successfully parsed YAML configuration")
+    return config
+
+
+def format_team_slug(team_name: str, substitution: str) -> str:
+    """Format a team name into a proper team slug with {{ team_name }} substitution."""
+    team_name = team_name.replace("{{ team_name }}", substitution)
+    return team_name.lower().strip().replace(" ", "-")
+
+
+def meets_requirements(
+    approvals: Dict[str, List[str]], required_approvals: int, required_team_slugs: List[str]
+) -> bool:
+    """Check counted approvals (approver -> required teams they approve for) against a branch's requirements."""
+    # Check number of approvals
+    if len(approvals) < required_approvals:
+        print(f"Debug: Not enough approvals. Got {len(approvals)}, need {required_approvals}")
+        return False
+
+    # Check required teams - now a user in multiple teams counts for all those teams
+    if required_team_slugs:
+        team_approvals = {team_slug for team_slugs in approvals.values() for team_slug in team_slugs}
+        print(f"Debug: Required team slugs: {required_team_slugs}")
+        print(f"Debug: Teams with approvals: {team_approvals}")
+
+        # Check if all required teams have at least one approver
+        missing_teams = set(required_team_slugs) - team_approvals
+        if missing_teams:
+            print(f"Debug: Missing required team approvals from: {missing_teams}")
+            return False
+
+    return True
+
+
+class ReviewTally:
+    """Streaming count of approvals against a branch's requirements, fed reviews newest first.
+
+    Only each author's latest APPROVED, CHANGES_REQUESTED or DISMISSED review counts;
+    comments neither add nor withdraw an approval. Approvers are only checked against the
+    required teams nobody covers yet, and satisfied tells callers they can stop reading.
+    """
+
+    OPINIONATED_STATES = ("APPROVED", "CHANGES_REQUESTED", "DISMISSED")
+
+    def __init__(self, required_approvals: int, required_team_slugs):
+        self.required_approvals = required_approvals
+        self.required_team_slugs = list(required_team_slugs)
+        # Approver -> the required teams they were found to approve for
+        self.approvals: Dict[str, List[str]] = {}
+        self._decided = set()
+        self._covered_teams = set()
+
+    def observe(self, login: Optional[str], state: str) -> bool:
+        """Note an author's review, returning True when it is their latest opinion and an approval."""
+        if not login or login in self._decided or state not in self.OPINIONATED_STATES:
+            return False
+        self._decided.add(login)
+        return state == "APPROVED"
+
+    def unsatisfied_team_slugs(self) -> List[str]:
+        return [team_slug for team_slug in self.required_team_slugs if team_slug not in self._covered_teams]
+
+    def add_approver(self, login: str, team_slugs: List[str]):
+        """Count an approval together with the still unsatisfied required teams it covers."""
+        self.approvals[login] = team_slugs
+        self._covered_teams.update(team_slugs)
+
+    @property
+    def satisfied(self) -> bool:
+        return len(self.approvals) >= self.required_approvals and not self.unsatisfied_team_slugs()
+
+
+class BranchRule:
+    """One entry under pull_requests.branches, ready for matching."""
+
+    __slots__ = ("pattern", "config", "exclude", "specificity", "order")
+
+    def __init__(self, pattern: str, config: Dict, order: int):
+        self.pattern = pattern
+        self.config = config
+        self.exclude = frozenset(config.get("exclude") or ())
+        # More literal characters make a pattern more specific; fewer wildcards break ties
+        self.specificity = (len(pattern.replace("*", "")), -pattern.count("*"))
+        self.order = order
+
+
+class _TrieNode:
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.rules: List[BranchRule] = []
+
+
+class BranchMatcher:
+    """Compiled lookup from a branch name to its most specific branch configuration.
+
+    Exact names live in a hash map, "prefix*" patterns in a character trie and every
+    other wildcard pattern in a list of precompiled fullmatch regexes sorted from most
+    to least specific. A branch listed in a pattern's exclude set falls through to the
+    next most specific match.
+    """
+
+    def __init__(self, branch_configs: Dict[str, Dict]):
+        self._exact: Dict[str, BranchRule] = {}
+        self._trie = _TrieNode()
+        self._regexes: List[Tuple[BranchRule, "re.Pattern"]] = []
+
+        for order, (pattern, config) in enumerate(branch_configs.items()):
+            rule = BranchRule(pattern, config or {}, order)
+            if "*" not in pattern:
+                self._exact[pattern] = rule
+            elif pattern.endswith("*") and "*" not in pattern[:-1]:
+                node = self._trie
+                for char in pattern[:-1]:
+                    node = node.children.setdefault(char, _TrieNode())
+                node.rules.append(rule)
+            else:
+                regex = re.compile(".*".join(re.escape(part) for part in pattern.split("*")))
+                self._regexes.append((rule, regex))
+
+        self._regexes.sort(key=lambda item: (item[0].specificity, -item[0].order), reverse=True)
+
+    def _prefix_candidates(self, branch_name: str) -> Iterator[BranchRule]:
+        """Yield the prefix rules matching a branch, from the longest prefix to the shortest."""
+        node = self._trie
+        matched = list(node.rules)
+        for char in branch_name:
+            node = node.children.get(char)
+            if node is None:
+                break
+            matched.extend(node.rules)
+        return reversed(matched)
+
+    def match(self, branch_name: str) -> Optional[BranchRule]:
+        """Get the most specific rule matching a branch, or None."""
+        rule = self._exact.get(branch_name)
+        if rule is not None:
+            return rule
+
+        best = None
+        for rule in self._prefix_candidates(branch_name):
+            if branch_name in rule.exclude:
+                print(f"Debug: Branch {branch_name} is excluded from pattern {rule.pattern}")
+                continue
+            best = rule
+            break
+
+        for rule, regex in self._regexes:
+            if best is not None and rule.specificity <= best.specificity:
+                break
+            if regex.fullmatch(branch_name):
+                if branch_name in rule.exclude:
+                    print(f"Debug: Branch {branch_name} is excluded from pattern {rule.pattern}")
+                    continue
+                best = rule
+                break
+
+        return best
+
+
+def config_blob_sha(content: bytes) -> str:
+    """Compute the git blob SHA of REVIEWERS.yml contents, which identifies the file across refs and repositories."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class BranchPolicy(NamedTuple):
+    """Review rules of one branch pattern, with every team name already turned into a slug."""
+
+    pattern: str
+    required_approvals: int
+    required_team_slugs: Tuple[str, ...]
+    review_team_slugs: Tuple[str, ...]
+    assignee_team_slugs: Tuple[str, ...]
+    exclude: Tuple[str, ...]
+    # False for patterns listed without settings, which match branches but ask for nothing
+    configured: bool
+
+
+class CompiledReviewConfig:
+    """A validated REVIEWERS.yml for one TEAM_NAME, compiled once and never modified.
+
+    Branch patterns are precompiled into a BranchMatcher and {{ team_name }} is already
+    substituted into normalized slugs, so evaluating a PR only matches and compares.
+    """
+
+    __slots__ = ("blob_sha", "team_name", "policies", "_policies_by_pattern", "_matcher")
+
+    def __init__(self, blob_sha: str, team_name: str, policies: Tuple[BranchPolicy, ...]):
+        self.blob_sha = blob_sha
+        self.team_name = team_name
+        self.policies = tuple(policies)
+        self._policies_by_pattern = {policy.pattern: policy for policy in self.policies}
+        self._matcher = BranchMatcher({policy.pattern: {"exclude": policy.exclude} for policy in self.policies})
+
+    def match(self, branch_name: str) -> Optional[BranchPolicy]:
+        """Get the policy of the most specific pattern matching a branch, or None."""
+        rule = self._matcher.match(branch_name)
+        return self._policies_by_pattern[rule.pattern] if rule is not None else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "blob_sha": self.blob_sha,
+            "team_name": self.team_name,
+            "policies": [policy._asdict() for policy in self.policies],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CompiledReviewConfig":
+        policies = tuple(
+            BranchPolicy(**{key: tuple(value) if isinstance(value, list) else value for key, value in policy.items()})
+            for policy in data["policies"]
+        )
+        return cls(data["blob_sha"], data["team_name"], policies)
+
+
+def _team_slugs(value, where: str, problems: List[str], team_name: str) -> Tuple[str, ...]:
+    """Validate a list of team names and turn it into unique slugs."""
+    if value is None:
+        return ()
+    if not isinstance(value, list) or not all(isinstance(item, str) and item.strip() for item in value):
+        problems.append(f"{where} must be a list of team names")
+        return ()
+    return tuple(dict.fromkeys(format_team_slug(item, team_name) for item in value))
+
+
+def compile_review_config(content: bytes, team_name: str, blob_sha: Optional[str] = None) -> CompiledReviewConfig:
+    """Parse, validate and compile REVIEWERS.yml for one TEAM_NAME.
+
+    Raises ConfigError listing every schema problem, besides the errors of parse_review_config.
+    """
+    config = parse_review_config(content)
+    problems: List[str] = []
+    pull_requests = config.get("pull_requests") if isinstance(config, dict) else None
+    if not isinstance(pull_requests, dict):
+        raise ConfigError(["pull_requests must be a mapping with a branches key"])
+    branches = pull_requests.get("branches")
+    if not isinstance(branches, dict) or not branches:
+        raise ConfigError(["pull_requests.branches must be a non-empty mapping of branch patterns"])
+
+    policies = []
+    for pattern, settings in branches.items():
+        where = f"pull_requests.branches.{pattern}"
+        if not isinstance(pattern, str):
+            problems.append(f"{where}: branch patterns must be strings, quote {pattern!r}")
+            continue
+        if settings is None:
+            settings = {}
+        if not isinstance(settings, dict):
+            problems.append(f"{where} must be a mapping of settings")
+            continue
+        unknown = sorted(str(key) for key in settings if key not in BRANCH_SETTINGS)
+        if unknown:
+            print(f"Warning: Ignoring unknown settings in {where}: {', '.join(unknown)}")
+
+        required_approvals = settings.get("required_approvals", 0)
+        if isinstance(required_approvals, bool) or not isinstance(required_approvals, int) or required_approvals < 0:
+            problems.append(f"{where}.required_approvals must be a non-negative integer, got {required_approvals!r}")
+            required_approvals = 0
+
+        exclude = settings.get("exclude") or []
+        if not isinstance(exclude, list) or not all(isinstance(item, str) for item in exclude):
+            problems.append(f"{where}.exclude must be a list of branch names")
+            exclude = []
+
+        slugs = {
+            key: _team_slugs(settings.get(key), f"{where}.{key}", problems, team_name)
+            for key in ("required_teams", "review_teams", "assignees")
+        }
+        policies.append(
+            BranchPolicy(
+                pattern=pattern,
+                required_approvals=required_approvals,
+                required_team_slugs=slugs["required_teams"],
+                review_team_slugs=slugs["review_teams"],
+                assignee_team_slugs=slugs["assignees"],
+                exclude=tuple(exclude),
+                configured=bool(settings),
+            )
+        )
+    if problems:
+        raise ConfigError(problems)
+
+    blob_sha = blob_sha or config_blob_sha(content)
+    print(f"Debug: Compiled REVIEWERS.yml {blob_sha[:7]} with {len(policies)} branch rules")
+    return CompiledReviewConfig(blob_sha, team_name, tuple(policies))
+
+
+class CompiledConfigCache:
+    """Compiled REVIEWERS.yml files keyed by blob SHA and TEAM_NAME.
+
+    One cache is shared by every PR evaluated in a process, so a file deployed unchanged to
+    many repositories is compiled once. With a path, entries are persisted as JSON for an
+    Actions cache step to carry between runs. The least recently used entries are dropped
+    beyond max_entries.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_COMPILED_CONFIGS):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompiledReviewConfig]" = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, max_entries: int = DEFAULT_MAX_COMPILED_CONFIGS) -> "CompiledConfigCache":
+        """Load compiled configs from disk, starting empty if the file is missing or unreadable."""
+        cache = cls(path, max_entries)
+        if not os.path.exists(path):
+            print(f"Debug: No compiled config cache at {path}, starting cold")
+            return cache
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != COMPILED_FORMAT_VERSION:
+                print(f"Debug: Ignoring compiled config cache with unsupported version {data.get('version')}")
+                return cache
+            for entry in data.get("configs", []):
+                compiled = CompiledReviewConfig.from_dict(entry)
+                cache._entries[cls._key(compiled.blob_sha, compiled.team_name)] = compiled
+            print(f"Debug: Loaded {len(cache._entries)} compiled configs from {path}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: Could not read compiled config cache {path}: {str(e)}")
+            cache._entries.clear()
+        return cache
+
+    @staticmethod
+    def _key(blob_sha: str, team_name: str) -> str:
+        return f"{blob_sha}:{team_name}"
+
+    def get_or_compile(self, content: bytes, team_name: str) -> CompiledReviewConfig:
+        """Get the compiled form of REVIEWERS.yml contents, compiling and remembering it on first use."""
+        blob_sha = config_blob_sha(content)
+        key = self._key(blob_sha, team_name)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+        if compiled is not None:
+            print(f"Debug: Using compiled REVIEWERS.yml {blob_sha[:7]} from cache")
+            return compiled
+
+        compiled = compile_review_config(content, team_name, blob_sha)
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        return compiled
+
+    def save(self):
+        """Write the compiled configs back to disk if any were added."""
+        if not self.path or not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            data = {"version": COMPILED_FORMAT_VERSION, "configs": [c.to_dict() for c in self._entries.values()]}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            self._dirty = False
+        os.replace(tmp_path, self.path)
+        print(f"Debug: Saved {len(data['configs'])} compiled configs to {self.path}")
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+JOURNAL_FORMAT_VERSION = 1
+# Outcomes that need no further work while the deployed files and team stay the same
+COMPLETED_STATUSES = {"deployed", "unchanged"}
+
+
+class RolloutJournal:
+    """Append-only checkpoint of per-repository rollout outcomes.
+
+    Every outcome is written as one JSON line and flushed as soon as the repository
+    finishes, so a rollout that crashes or hits the runner's time limit keeps what it
+    already did. Outcomes are tied to the bundle fingerprint and team name they were
+    deployed with: a re-run with the same journal skips the completed repositories and
+    only works on failed and pending ones, while a new bundle starts the rollout over.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "RolloutJournal":
+        """Replay a journal from disk, keeping the latest outcome of each repository."""
+        journal = cls(path)
+        if not os.path.exists(path):
+            print(f"No rollout journal at {path}, starting a new rollout")
+            return journal
+
+        skipped = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Typically the last line of a run that was killed mid-write
+                    skipped += 1
+                    continue
+                if entry.get("version") == JOURNAL_FORMAT_VERSION and "repository" in entry:
+                    journal._entries[entry["repository"]] = entry
+        if skipped:
+            print(f"Warning: Ignored {skipped} unreadable lines in rollout journal {path}")
+        print(f"Loaded outcomes of {len(journal._entries)} repositories from rollout journal {path}")
+        journal._compact()
+        return journal
+
+    def _compact(self):
+        """Rewrite the journal with only the latest outcome of each repository."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def get(self, full_repo_name: str) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(full_repo_name)
+
+    def is_completed(self, full_repo_name: str, team_name: str, bundle_fingerprint: str) -> bool:
+        """Check whether a repository was already deployed with these files and this team."""
+        entry = self.get(full_repo_name)
+        return (
+            entry is not None
+            and entry["status"] in COMPLETED_STATUSES
+            and entry["team_name"] == team_name
+            and entry["bundle"] == bundle_fingerprint
+        )
+
+    def record(self, full_repo_name: str, team_name: str, bundle_fingerprint: str, status: str, detail: str):
+        """Append the outcome of one repository and flush it to disk."""
+        entry = {
+            "version": JOURNAL_FORMAT_VERSION,
+            "repository": full_repo_name,
+            "team_name": team_name,
+            "bundle": bundle_fingerprint,
+            "status": status,
+            "detail": detail,
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            self._entries[full_repo_name] = entry
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
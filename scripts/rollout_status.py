@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from github import Github
+from github import GithubException
+
+from deploy_pr_workflow import (
+    DEFAULT_MAX_WORKERS,
+    FEATURE_BRANCH_NAME,
+    REVIEWERS_PATH,
+    WORKFLOW_PATH,
+    RolloutBundle,
+    get_team_name_variable,
+    iter_targets,
+)
+from github_transport import (
+    add_transport_hook,
+    api_base_url,
+    install_pooled_transport,
+    remove_transport_hook,
+    set_response_cache,
+)
+from http_cache import open_response_cache
+from instrumentation import instrumentation_from_env, instrumented, operation, report_from_env
+
+STATUS_FORMAT_VERSION = 1
+DEFAULT_STATUS_PATH = "rollout-status.json"
+
+
+def files_state(target_shas: Dict[str, str], bundle) -> Dict:
+    """Compare a default-branch tree with the bundle: current, outdated or missing, plus the differing paths."""
+    outdated = [path for path in bundle.deployed_paths if target_shas.get(path) != bundle.blob_shas[path]]
+    if WORKFLOW_PATH not in target_shas:
+        state = "missing"
+    elif outdated:
+        state = "outdated"
+    else:
+        state = "current"
+    return {"state": state, "outdated": outdated, "reviewers_file": REVIEWERS_PATH in target_shas}
+
+
+@instrumented("get_deploy_pull")
+def get_deploy_pull(target_repo, owner: str) -> Optional[Dict]:
+    """Get the most recently updated deployment PR of a repository, open or not, or None if there never was one."""
+    pulls = target_repo.get_pulls(
+        state="all", head=f"{owner}:{FEATURE_BRANCH_NAME}", sort="updated", direction="desc"
+    )
+    pull = next(iter(pulls), None)
+    if pull is None:
+        return None
+    # The listing carries merged_at, so telling merged from closed needs no extra request
+    state = "merged" if pull.merged_at is not None else pull.state
+    return {"number": pull.number, "state": state, "url": pull.html_url}
+
+
+@instrumented("collect_repository_status")
+def collect_repository_status(g, bundle, full_repo_name: str, team_name: str) -> Dict:
+    """Read one repository's deployed files, TEAM_NAME variable and deployment PR without changing anything."""
+    status = {
+        "repository": full_repo_name,
+        "expected_team": team_name,
+        "team_name": None,
+        "files": None,
+        "pull_request": None,
+        "error": None,
+    }
+    try:
+        target_repo = g.get_repo(full_repo_name)
+        with operation("get_git_tree"):
+            tree = target_repo.get_git_tree("HEAD", recursive=True)
+        status["files"] = files_state({element.path: element.sha for element in tree.tree}, bundle)
+        status["team_name"] = get_team_name_variable(g._Github__requester, full_repo_name)
+        status["pull_request"] = get_deploy_pull(target_repo, full_repo_name.split("/")[0])
+    except GithubException as e:
+        status["error"] = f"{e.status} {(e.data or {}).get('message', '')}".strip()
+    except Exception as e:
+        status["error"] = str(e)
+    return status
+
+
+def summarize(status: Dict) -> str:
+    """Classify a repository for the totals: error, current, pending (deployment PR open), outdated or missing."""
+    if status["error"]:
+        return "error"
+    pull = status["pull_request"] or {}
+    if status["files"]["state"] == "current":
+        return "current" if status["team_name"] == status["expected_team"] else "team-mismatch"
+    if pull.get("state") == "open":
+        return "pending"
+    return status["files"]["state"]
+
+
+def status_totals(statuses: List[Dict]) -> Dict[str, int]:
+    """Count repositories per summarized state."""
+    totals: Dict[str, int] = {}
+    for status in statuses:
+        state = summarize(status)
+        totals[state] = totals.get(state, 0) + 1
+    return totals
+
+
+def print_status_table(statuses: List[Dict]):
+    """Print one compact line per repository plus totals."""
+    print("\nRollout status:")
+    width = max((len(status["repository"]) for status in statuses), default=0)
+    for status in sorted(statuses, key=lambda status: status["repository"]):
+        if status["error"]:
+            print(f"  {status['repository']:<{width}}  {'error':<13}  {status['error']}")
+            continue
+        pull = status["pull_request"]
+        pull_text = f"PR #{pull['number']} {pull['state']}" if pull else "no PR"
+        team_text = status["team_name"] or "no TEAM_NAME"
+        if status["team_name"] != status["expected_team"]:
+            team_text += f" (expected {status['expected_team']})"
+        print(f"  {status['repository']:<{width}}  {summarize(status):<13}  {pull_text:<18}  {team_text}")
+
+    totals = status_totals(statuses)
+    print("Totals: " + ", ".join(f"{state}={count}" for state, count in sorted(totals.items())))
+
+
+def write_status_report(statuses: List[Dict], bundle, path: str):
+    """Write the statuses as JSON for dashboards and later comparisons."""
+    totals = status_totals(statuses)
+    report = {
+        "version": STATUS_FORMAT_VERSION,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "bundle": bundle.fingerprint,
+        "totals": totals,
+        "repositories": sorted(statuses, key=lambda status: status["repository"]),
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote rollout status of {len(statuses)} repositories to {path}")
+
+
+def report_rollout_status(
+    target_repositories_input,
+    default_team_name="Cloud-Platform-Owners",
+    max_workers=DEFAULT_MAX_WORKERS,
+    http_cache=None,
+    report_path=DEFAULT_STATUS_PATH,
+):
+    """Audit the rollout on the same targets deploy_workflow_and_config takes, without writing to any repository.
+
+    Each repository costs three reads (default-branch tree, TEAM_NAME variable and deployment
+    PR), made by max_workers threads paced by the process-wide request governor. http_cache is
+    "memory" or a SQLite path; with a SQLite cache kept between audits, unchanged repositories
+    are answered with 304 Not Modified, which does not count against the rate limit.
+    """
+    install_pooled_transport()
+    instrumentation = instrumentation_from_env()
+    if instrumentation is not None:
+        add_transport_hook(instrumentation)
+    response_cache = open_response_cache(http_cache, os.getenv("GITHUB_HTTP_CACHE_SCOPE")) if http_cache else None
+    set_response_cache(response_cache)
+
+    try:
+        g = Github(os.getenv("GITHUB_TOKEN"), base_url=api_base_url(), pool_size=max_workers, lazy=True)
+        source_repo = g.get_repo(os.getenv("GITHUB_REPOSITORY"))
+        org_name = os.getenv("GITHUB_REPOSITORY").split("/")[0]
+        with operation("load_bundle"):
+            bundle = RolloutBundle.load(source_repo)
+
+        seen = set()
+        in_flight = threading.BoundedSemaphore(max(1, max_workers) * 2)
+        futures = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for full_repo_name, team_name in iter_targets(g, target_repositories_input, org_name, default_team_name):
+                if full_repo_name in seen:
+                    continue
+                seen.add(full_repo_name)
+                in_flight.acquire()
+                future = executor.submit(collect_repository_status, g, bundle, full_repo_name, team_name)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+        statuses = [future.result() for future in futures]
+
+        print_status_table(statuses)
+        write_status_report(statuses, bundle, report_path)
+    finally:
+        if instrumentation is not None:
+            remove_transport_hook(instrumentation)
+        if response_cache is not None:
+            set_response_cache(None)
+            response_cache.print_stats()
+            response_cache.backend.close()
+    report_from_env(instrumentation)
+    return statuses
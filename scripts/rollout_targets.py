@@ -0,0 +1,97 @@
+import csv
+import json
+from typing import Dict, Iterator, Optional, Tuple
+
+from github import GithubException
+
+# Target lists in these formats are read from a file instead of being taken literally
+TARGET_FILE_EXTENSIONS = (".csv", ".jsonl")
+ORG_QUERY_PREFIX = "org:"
+
+
+def qualify_repository(repo_name: str, org_name: str) -> str:
+    """Prefix a bare repository name with the organization."""
+    repo_name = repo_name.strip()
+    return repo_name if "/" in repo_name else f"{org_name}/{repo_name}"
+
+
+def iter_targets_from_file(path: str, org_name: str, default_team_name: str) -> Iterator[Tuple[str, str]]:
+    """Stream (full repository name, team name) pairs from a CSV or JSONL file, one line at a time.
+
+    CSV files need a header with a repository column and may have a team_name column.
+    JSONL files hold one {"repository": ..., "team_name": ...} object per line.
+    Blank lines and lines starting with # are skipped, and a missing team uses the default.
+    JSONL lines that are not a JSON object are skipped with a warning, like entries without a repository.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = _iter_jsonl_objects(f, path)
+        else:
+            rows = csv.DictReader(line for line in f if line.strip() and not line.lstrip().startswith("#"))
+            if rows.fieldnames is None or "repository" not in rows.fieldnames:
+                raise ValueError(f"{path} needs a header row with a repository column")
+
+        for line_number, row in enumerate(rows, 1):
+            repo_name = (row.get("repository") or "").strip()
+            if not repo_name:
+                print(f"Warning: Skipping entry {line_number} of {path} without a repository")
+                continue
+            team_name = (row.get("team_name") or "").strip() or default_team_name
+            yield qualify_repository(repo_name, org_name), team_name
+
+
+def _iter_jsonl_objects(lines, path: str) -> Iterator[Dict]:
+    """Yield the JSON object of each line, warning about and skipping lines that hold anything else."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            print(f"Warning: Skipping line {line_number} of {path}, not valid JSON: {str(e)}")
+            continue
+        if not isinstance(row, dict):
+            print(f"Warning: Skipping line {line_number} of {path}, not a JSON object")
+            continue
+        yield row
+
+
+def parse_org_query(query: str) -> Dict[str, Optional[str]]:
+    """Parse "org:topic=NAME,team=SLUG" into its filters; "org:*" selects every repository."""
+    filters: Dict[str, Optional[str]] = {"topic": None, "team": None}
+    for part in query[len(ORG_QUERY_PREFIX) :].split(","):
+        part = part.strip()
+        if not part or part == "*":
+            continue
+        key, _, value = part.partition("=")
+        if key.strip() not in filters or not value.strip():
+            raise ValueError(f"Unknown repository filter '{part}', expected topic=NAME or team=SLUG")
+        filters[key.strip()] = value.strip()
+    return filters
+
+
+def iter_org_repositories(
+    g, org_name: str, default_team_name: str, topic: Optional[str] = None, team: Optional[str] = None
+) -> Iterator[Tuple[str, str]]:
+    """Stream the organization's repositories page by page, optionally only those of a team or with a topic.
+
+    Archived repositories are skipped, since nothing can be pushed to them.
+    """
+    org = g.get_organization(org_name)
+    if team:
+        try:
+            repos = org.get_team_by_slug(team).get_repos()
+        except GithubException as e:
+            raise ValueError(f"Could not read the repositories of team {team}: {str(e)}") from e
+    else:
+        repos = org.get_repos()
+
+    for repo in repos:
+        if repo.archived:
+            print(f"Skipping archived repository {repo.full_name}")
+            continue
+        # Topics come with the listing, so filtering costs no extra requests
+        if topic and topic not in (repo.topics or []):
+            continue
+        yield repo.full_name, default_team_name
+
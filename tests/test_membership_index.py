@@ -0,0 +1,112 @@
+import time
+
+from membership_index import MembershipIndex
+
+
+def build_index():
+    """platform has the direct member lead and two child teams; web is a child of frontend."""
+    index = MembershipIndex()
+    index.replace_teams(
+        "org",
+        [
+            {"slug": "platform", "id": 1, "parent": None, "direct": ["lead"]},
+            {"slug": "frontend", "id": 2, "parent": "platform", "direct": ["fe"]},
+            {"slug": "web", "id": 3, "parent": "frontend", "direct": ["webdev"]},
+            {"slug": "backend", "id": 4, "parent": "platform", "direct": ["be"]},
+        ],
+    )
+    return index
+
+
+def membership(action, login, team_id, slug):
+    return {"action": action, "scope": "team", "member": {"login": login}, "team": {"id": team_id, "slug": slug}}
+
+
+def test_build_includes_child_team_members():
+    index = build_index()
+    assert sorted(index.get_members("platform")) == ["be", "fe", "lead", "webdev"]
+    assert sorted(index.get_members("frontend")) == ["fe", "webdev"]
+    assert index.teams_of("webdev") == ["frontend", "platform", "web"]
+    assert index.is_complete()
+
+
+def test_member_added_to_child_team_reaches_ancestors():
+    index = build_index()
+    assert index.apply_webhook("membership", membership("added", "new", 3, "web"))
+    assert index.is_member("new", "web")
+    assert index.is_member("new", "frontend")
+    assert index.is_member("new", "platform")
+    assert not index.is_member("new", "backend")
+
+
+def test_member_removed_from_child_team_stays_in_parent_when_direct():
+    index = build_index()
+    index.apply_webhook("membership", membership("added", "lead", 3, "web"))
+    assert index.apply_webhook("membership", membership("removed", "lead", 3, "web"))
+    assert not index.is_member("lead", "web")
+    assert not index.is_member("lead", "frontend")
+    # Still a direct member of platform
+    assert index.is_member("lead", "platform")
+
+
+def test_renamed_team_keeps_members_and_children():
+    index = build_index()
+    payload = {"action": "edited", "team": {"id": 2, "slug": "ui", "parent": {"slug": "platform"}}, "changes": {}}
+    assert index.apply_webhook("team", payload)
+    assert index.get_members("frontend") is None
+    assert sorted(index.get_members("ui")) == ["fe", "webdev"]
+    # The child team now points at the new slug, so its changes still reach the renamed team
+    index.apply_webhook("membership", membership("added", "new", 3, "web"))
+    assert index.is_member("new", "ui")
+
+
+def test_deleted_team_is_removed_from_ancestors():
+    index = build_index()
+    assert index.apply_webhook("team", {"action": "deleted", "team": {"id": 2, "slug": "frontend"}})
+    assert index.get_members("frontend") is None
+    assert sorted(index.get_members("platform")) == ["be", "lead"]
+    # Its former child team still exists, without a parent
+    assert index.get_members("web") == ["webdev"]
+
+
+def test_parent_change_moves_members_between_ancestors():
+    index = build_index()
+    payload = {
+        "action": "edited",
+        "team": {"id": 3, "slug": "web", "parent": {"slug": "backend"}},
+        "changes": {"parent": {"from": {"slug": "frontend"}}},
+    }
+    assert index.apply_webhook("team", payload)
+    assert sorted(index.get_members("frontend")) == ["fe"]
+    assert sorted(index.get_members("backend")) == ["be", "webdev"]
+    assert "webdev" in index.get_members("platform")
+
+
+def test_member_removed_from_organization_leaves_every_team():
+    index = build_index()
+    payload = {"action": "member_removed", "membership": {"user": {"login": "webdev"}}}
+    assert index.apply_webhook("organization", payload)
+    assert index.teams_of("webdev") == []
+    assert "webdev" not in index.get_members("platform")
+
+
+def test_unknown_events_leave_the_index_alone():
+    index = build_index()
+    assert not index.apply_webhook("membership", membership("added", "new", 99, "unknown"))
+    assert not index.apply_webhook("team", {"action": "added_to_repository", "team": {"id": 1, "slug": "platform"}})
+
+
+def test_refreshed_direct_members_update_ancestors():
+    index = build_index()
+    index.refresh_team("web", ["webdev", "intern"], direct=True)
+    assert index.is_member("intern", "frontend")
+    assert index.is_member("intern", "platform")
+
+
+def test_stale_teams():
+    index = build_index()
+    index.set_members("rest-only", ["someone"])
+    index._teams["rest-only"]["fetched_at"] = time.time() - index.ttl - 1
+    index._teams["web"]["fetched_at"] = time.time() - index.ttl - 1
+    assert index.stale_teams() == {"web": True, "rest-only": False}
+    assert index.is_member("someone", "rest-only") is None
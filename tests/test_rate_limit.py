@@ -0,0 +1,136 @@
+import pytest
+
+from rate_limit import (
+    BACKOFF_BASE_SECONDS,
+    CircuitBreaker,
+    CircuitOpenError,
+    RequestGovernor,
+    is_idempotent,
+    is_rate_limited,
+    is_transient,
+)
+
+API = "https://api.github.com"
+
+
+@pytest.mark.parametrize(
+    "verb, path, body",
+    [
+        ("GET", "/repos/o/r/pulls/1", None),
+        ("PUT", "/repos/o/r/contents/f", None),
+        ("DELETE", "/repos/o/r/git/refs/heads/b", None),
+        ("POST", "/repos/o/r/statuses/0123abcd", None),
+        ("POST", "/repos/o/r/pulls/7/requested_reviewers", None),
+        ("POST", "/repos/o/r/issues/7/assignees", None),
+        ("POST", "/repos/o/r/actions/variables", None),
+        ("PATCH", "/repos/o/r/actions/variables/TEAM_NAME", None),
+        ("POST", "/repos/o/r/git/trees", None),
+        ("PATCH", "/repos/o/r/git/refs/heads/b", None),
+        ("POST", "/graphql", b'{"query": "query { viewer { login } }"}'),
+    ],
+)
+def test_idempotent_requests(verb, path, body):
+    assert is_idempotent(verb, API + path, body)
+
+
+@pytest.mark.parametrize(
+    "verb, path, body",
+    [
+        ("POST", "/repos/o/r/pulls", None),
+        ("POST", "/repos/o/r/git/refs", None),
+        ("POST", "/repos/o/r/issues/7/comments", None),
+        ("PATCH", "/repos/o/r/pulls/7", None),
+        ("POST", "/graphql", b'{"query": "mutation { addComment }"}'),
+    ],
+)
+def test_non_idempotent_requests(verb, path, body):
+    assert not is_idempotent(verb, API + path, body)
+
+
+def test_rate_limit_classification():
+    assert is_rate_limited(429, {})
+    assert is_rate_limited(403, {"retry-after": "30"})
+    assert is_rate_limited(403, {"x-ratelimit-remaining": "0"})
+    assert is_rate_limited(403, {}, b'{"message": "You have exceeded a secondary rate limit."}')
+    assert is_rate_limited(403, {}, {"documentation_url": "https://docs.github.com/rest#secondary-rate-limits"})
+    assert not is_rate_limited(403, {"x-ratelimit-remaining": "4000"}, {"message": "Resource not accessible"})
+    assert not is_rate_limited(404, {"retry-after": "30"})
+
+
+def test_transient_classification():
+    assert is_transient(502, {})
+    assert is_transient(403, {"Retry-After": "1"})
+    assert is_transient(403, {"X-RateLimit-Remaining": "12"}, {"message": "secondary rate limit"})
+    assert not is_transient(403, {"X-RateLimit-Remaining": "12"}, {"message": "Must have admin rights"})
+    assert not is_transient(422, {})
+
+
+def quiet_governor(**kwargs):
+    governor = RequestGovernor(**kwargs)
+    governor._pause = lambda seconds: None
+    return governor
+
+
+def test_rate_limited_requests_are_retried_whatever_the_verb():
+    delay = quiet_governor().retry_delay("POST", API + "/repos/o/r/pulls", 429, {}, 0)
+    assert delay is not None and delay <= BACKOFF_BASE_SECONDS
+
+
+def test_server_errors_are_only_retried_when_idempotent():
+    governor = quiet_governor()
+    assert governor.retry_delay("GET", API + "/repos/o/r", 502, {}, 0) is not None
+    assert governor.retry_delay("POST", API + "/repos/o/r/pulls", 502, {}, 0) is None
+    assert governor.retry_delay("POST", API + "/repos/o/r/pulls", None, {}, 0) is None
+
+
+def test_attempts_are_limited():
+    governor = quiet_governor(max_attempts=2)
+    assert governor.retry_delay("GET", API + "/repos/o/r", 502, {}, 0) is not None
+    assert governor.retry_delay("GET", API + "/repos/o/r", 502, {}, 1) is None
+
+
+def test_secondary_limit_without_headers_is_retried():
+    governor = quiet_governor()
+    body = b'{"message": "You have exceeded a secondary rate limit"}'
+    assert governor.retry_delay("POST", API + "/repos/o/r/pulls", 403, {}, 0, None, body) is not None
+    assert governor.retry_delay("POST", API + "/repos/o/r/pulls", 403, {}, 0, None, b'{"message": "Forbidden"}') is None
+
+
+def test_breaker_opens_at_threshold_and_probes_after_cooldown():
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record(False)
+    breaker.check()
+    breaker.record(False)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record(True)
+    breaker.check()
+
+
+def test_breaker_does_not_latch_on_unreported_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record(False)
+    breaker.check()
+    # The first probe never reported back, but it expires after the cooldown
+    breaker.check()
+
+
+def test_released_probe_lets_another_through():
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record(False)
+    breaker._opened_at -= 61
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.release()
+    breaker.check()
+
+
+def test_rate_limited_response_releases_probe():
+    governor = quiet_governor()
+    governor.breaker = CircuitBreaker(threshold=1, cooldown=60)
+    governor.breaker.record(False)
+    governor.breaker._opened_at -= 61
+    governor.breaker.check()
+    governor.after_response("GET", API + "/repos/o/r", 429, {})
+    governor.breaker.check()
@@ -0,0 +1,99 @@
+from review_config import BranchMatcher, ReviewTally
+
+
+def matched_pattern(branch_configs, branch_name):
+    rule = BranchMatcher(branch_configs).match(branch_name)
+    return rule.pattern if rule is not None else None
+
+
+def test_exact_name_beats_patterns():
+    configs = {"*": {}, "release/*": {}, "release/1.0": {}}
+    assert matched_pattern(configs, "release/1.0") == "release/1.0"
+
+
+def test_longest_prefix_wins():
+    configs = {"*": {}, "feature/*": {}, "feature/team-a/*": {}}
+    assert matched_pattern(configs, "feature/team-a/login") == "feature/team-a/*"
+    assert matched_pattern(configs, "feature/other") == "feature/*"
+    assert matched_pattern(configs, "main") == "*"
+
+
+def test_more_literal_wildcard_pattern_beats_prefix():
+    configs = {"release/*": {}, "release/*-hotfix": {}}
+    assert matched_pattern(configs, "release/2.1-hotfix") == "release/*-hotfix"
+    assert matched_pattern(configs, "release/2.1") == "release/*"
+
+
+def test_fewer_wildcards_break_specificity_ties():
+    configs = {"a*b*c": {}, "ab*c": {}}
+    assert matched_pattern(configs, "abxc") == "ab*c"
+
+
+def test_excluded_branch_falls_through_to_next_prefix():
+    configs = {"*": {}, "feature/*": {"exclude": ["feature/legacy"]}}
+    assert matched_pattern(configs, "feature/legacy") == "*"
+    assert matched_pattern(configs, "feature/new") == "feature/*"
+
+
+def test_excluded_branch_falls_through_from_wildcard_pattern():
+    configs = {"release/*": {}, "release/*-rc": {"exclude": ["release/1-rc"]}}
+    assert matched_pattern(configs, "release/1-rc") == "release/*"
+    assert matched_pattern(configs, "release/2-rc") == "release/*-rc"
+
+
+def test_no_match():
+    assert matched_pattern({"main": {}, "release/*": {}}, "feature/x") is None
+
+
+def count(tally, reviews):
+    """Feed (login, state) reviews newest first like the engines do, stopping once satisfied."""
+    read = 0
+    for login, state in reviews:
+        read += 1
+        if tally.observe(login, state):
+            tally.add_approver(login, [])
+            if tally.satisfied:
+                break
+    return read
+
+
+def test_only_latest_opinion_counts():
+    tally = ReviewTally(1, [])
+    # Newest first: alice's later change request withdraws her earlier approval
+    count(tally, [("alice", "CHANGES_REQUESTED"), ("alice", "APPROVED")])
+    assert tally.approvals == {}
+    assert not tally.satisfied
+
+
+def test_comments_do_not_withdraw_approvals():
+    tally = ReviewTally(1, [])
+    count(tally, [("alice", "COMMENTED"), ("alice", "APPROVED")])
+    assert list(tally.approvals) == ["alice"]
+
+
+def test_dismissed_review_is_latest_opinion():
+    tally = ReviewTally(1, [])
+    count(tally, [("alice", "DISMISSED"), ("alice", "APPROVED"), (None, "APPROVED")])
+    assert tally.approvals == {}
+
+
+def test_stops_once_requirements_are_met():
+    tally = ReviewTally(2, [])
+    reviews = [("alice", "APPROVED"), ("bob", "APPROVED"), ("carol", "APPROVED"), ("dave", "APPROVED")]
+    assert count(tally, reviews) == 2
+    assert tally.satisfied
+
+
+def test_required_teams_must_be_covered():
+    tally = ReviewTally(1, ["platform", "security"])
+    assert tally.observe("alice", "APPROVED")
+    tally.add_approver("alice", ["platform"])
+    assert not tally.satisfied
+    assert tally.unsatisfied_team_slugs() == ["security"]
+    assert tally.observe("bob", "APPROVED")
+    tally.add_approver("bob", ["security"])
+    assert tally.satisfied
+
+
+def test_nothing_required_is_satisfied_at_once():
+    assert ReviewTally(0, []).satisfied